@@ -0,0 +1,160 @@
+"""
+请求级计算上下文（共享记忆化）
+
+组合报告端点在一个请求内依次生成多个版块，各版块内部会以相同参数反复调用
+T2 / T3 / 上限 / 补贴等计算函数。用 @request_memoized 标注的函数在
+calculation_context() 内按参数缓存结果，版块之间共享；上下文之外行为不变。
+
+上下文同时统计每个函数的调用次数、实际计算次数与缓存命中次数，
+memoize=False 时只计数不缓存，可用来对比冗余调用。
+"""
+
+import copy
+import inspect
+import contextvars
+import numpy as np
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Any, Optional
+
+
+_context: contextvars.ContextVar = contextvars.ContextVar('calculation_context', default=None)
+
+
+class CalculationContext:
+    """单个请求的计算缓存与调用统计"""
+
+    def __init__(self, memoize: bool = True):
+        from api.policy_registry import current_parameter_set
+
+        self.memoize = memoize
+        # 缓存只在创建时的政策参数集下有效
+        self.parameter_set = current_parameter_set()
+        self.cache: Dict[tuple, Any] = {}
+        self.calls: Counter = Counter()
+        self.computed: Counter = Counter()
+        self.unique: Dict[str, set] = {}
+
+    def lookup(self, name: str, key: tuple):
+        self.calls[name] += 1
+        self.unique.setdefault(name, set()).add(key)
+        if self.memoize and key in self.cache:
+            return True, self.cache[key]
+        return False, None
+
+    def store(self, name: str, key: tuple, value):
+        self.computed[name] += 1
+        if self.memoize:
+            self.cache[key] = value
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        返回:
+            {
+                'functions': {name: {'calls', 'computed', 'cacheHits', 'redundant'}},
+                'totalCalls', 'totalComputed', 'redundantComputations'
+            }
+        其中 redundant = 实际计算次数 - 不同参数组合数（记忆化时为0）
+        """
+        functions = {}
+        for name, calls in sorted(self.calls.items()):
+            computed = self.computed.get(name, 0)
+            functions[name] = {
+                'calls': calls,
+                'computed': computed,
+                'cacheHits': calls - computed,
+                'redundant': computed - len(self.unique.get(name, ()))
+            }
+        return {
+            'functions': functions,
+            'totalCalls': sum(self.calls.values()),
+            'totalComputed': sum(self.computed.values()),
+            'redundantComputations': sum(f['redundant'] for f in functions.values())
+        }
+
+
+def current_context() -> Optional[CalculationContext]:
+    return _context.get()
+
+
+@contextmanager
+def calculation_context(memoize: bool = True):
+    """
+    在代码块内共享计算结果
+
+    示例:
+        with calculation_context() as ctx:
+            report = build_path_a_report(params)
+            print(ctx.stats()['redundantComputations'])
+    """
+    ctx = CalculationContext(memoize=memoize)
+    token = _context.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _context.reset(token)
+
+
+def _freeze_arg(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze_arg(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_freeze_arg(v) for v in value)
+    return value
+
+
+_ATOMIC_TYPES = frozenset({str, int, float, bool, type(None), np.float64, np.int64, np.bool_})
+
+
+def _copy_result(value):
+    """缓存结果的深拷贝：递归复制 dict / list / ndarray，不可变值直接共享（比 copy.deepcopy 快数倍）"""
+    kind = type(value)
+    if kind in _ATOMIC_TYPES:
+        return value
+    if kind is dict:
+        return {k: v if type(v) in _ATOMIC_TYPES else _copy_result(v) for k, v in value.items()}
+    if kind is list:
+        return [v if type(v) in _ATOMIC_TYPES else _copy_result(v) for v in value]
+    if kind is np.ndarray:
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def request_memoized(func):
+    """
+    计算函数的请求级记忆化装饰器
+
+    - 无活动上下文、参数不可哈希（如 NumPy 数组）或政策参数集已切换时直接计算
+    - 结果返回深拷贝，调用方修改任意层级的字段（含嵌套列表/字典）都不会污染缓存
+    """
+    name = f'{func.__module__.rsplit(".", 1)[-1]}.{func.__name__}'
+    signature = inspect.signature(func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        ctx = _context.get()
+        if ctx is None:
+            return func(*args, **kwargs)
+
+        from api.policy_registry import current_parameter_set
+        if current_parameter_set() is not ctx.parameter_set:
+            return func(*args, **kwargs)
+
+        # 位置参数与关键字参数统一按签名绑定，避免同一调用产生不同的键
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (name, tuple(_freeze_arg(v) for v in bound.arguments.values()))
+        try:
+            hash(key)
+        except TypeError:
+            return func(*args, **kwargs)
+
+        hit, value = ctx.lookup(name, key)
+        if not hit:
+            value = func(*args, **kwargs)
+            ctx.store(name, key, value)
+        return _copy_result(value)
+
+    wrapper.uncached = func
+    return wrapper
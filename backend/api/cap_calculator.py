@@ -11,16 +11,50 @@ C_final(w, t₂) = min(C_dynamic, C_fixed_effective)
 - C_fixed_smooth(t₂)：S形平滑函数，节点12k→24k→48k→72k
 - τ(w)：高收入递减因子，拐点200k
 """
+import sys
+import os
 import math
 from typing import Optional
 
+import numpy as np
+from scipy.special import expit, logit
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.policy_registry import current_parameter_set
+from api.calc_context import request_memoized
+
+
+# 公式5-5默认参数（运行时以政策参数注册表中的当前参数集为准）
+CAP_DEFAULTS = {
+    'nodes': (12000.0, 24000.0, 48000.0, 72000.0),
+    'thresholds': (0.03, 0.05, 0.10),
+    'k': 20.0,
+    'tau_min': 0.5,
+    'w0_pivot': 200000.0,
+    'b_width': 100000.0,
+    'cap_ratio': 0.08
+}
+
+
+def resolved_cap_params() -> dict:
+    """当前参数集的公式5-5参数；循环内反复调用数组函数时先解析一次再以关键字参数传入"""
+    return _cap_params()
+
+
+# 交叉点求根：T2搜索区间（%）与二分迭代次数（区间宽度缩小 2^-60，达到浮点精度）
+T2_BOUNDS = (0.0, 45.0)
+BISECT_ITERATIONS = 60
+
 
 def _sigma(x: float) -> float:
     """
     Logistic σ函数（S型平滑函数）
     σ(x) = 1 / (1 + e^(-x))
     
-    用于平滑过渡，避免阶梯突变
+    用于平滑过渡，避免阶梯突变（标量版本；数组计算使用 scipy.special.expit）
     """
     try:
         return 1.0 / (1.0 + math.exp(-x))
@@ -28,6 +62,45 @@ def _sigma(x: float) -> float:
         return 0.0 if x < 0 else 1.0
 
 
+def _cap_params(**overrides) -> dict:
+    """公式5-5参数：未指定（None）的取当前参数集；全部指定时不再查询注册表"""
+    if all(overrides.get(key) is not None for key in CAP_DEFAULTS):
+        return {key: overrides[key] for key in CAP_DEFAULTS}
+    cap = current_parameter_set().cap
+    return {key: cap[key] if overrides.get(key) is None else overrides[key] for key in CAP_DEFAULTS}
+
+
+def _fixed_cap_smooth_scalar(t2: float, p: dict) -> float:
+    """单个T2的平滑固定上限（p 为已解析的公式5-5参数）"""
+    base, n2, n3, n4 = p['nodes']
+    t = float(t2) / 100.0
+    val = float(base)
+    for delta, thr in zip((n2 - base, n3 - n2, n4 - n3), p['thresholds']):
+        val += delta * _sigma(float(p['k']) * (t - float(thr)))
+    return max(0.0, val)
+
+
+def _tau_scalar(wage: float, p: dict) -> float:
+    """单个年薪的高收入递减因子（p 为已解析的公式5-5参数）"""
+    x = (float(wage) - float(p['w0_pivot'])) / float(p['b_width'])
+    return float(p['tau_min']) + (1.0 - float(p['tau_min'])) * (1.0 - _sigma(x))
+
+
+def _cap_components_scalar(annual_salary: float, t2_rate: float, p: dict) -> dict:
+    """cap_components 的标量版本（纯 Python 算术，单值调用不经过 0 维数组）"""
+    dynamic = float(p['cap_ratio']) * float(annual_salary)
+    fixed_raw = _fixed_cap_smooth_scalar(t2_rate, p)
+    tau = _tau_scalar(annual_salary, p)
+    fixed_effective = fixed_raw * tau
+    return {
+        'dynamic': dynamic,
+        'fixed_raw': fixed_raw,
+        'tau': tau,
+        'fixed_effective': fixed_effective,
+        'cap': min(dynamic, fixed_effective)
+    }
+
+
 def dynamic_cap_from_wage(wage: float, cap_ratio: float = 0.08) -> float:
     """
     动态上限：C_dynamic = cap_ratio × wage
@@ -44,11 +117,36 @@ def dynamic_cap_from_wage(wage: float, cap_ratio: float = 0.08) -> float:
     return float(cap_ratio) * float(wage)
 
 
+def _fixed_cap_smooth_array(t2_rate, params: dict) -> np.ndarray:
+    base, n2, n3, n4 = params['nodes']
+    t = np.asarray(t2_rate, dtype=float) / 100.0  # 转换为小数形式（10% → 0.10）
+    
+    val = np.full(t.shape, float(base))
+    for delta, thr in zip((n2 - base, n3 - n2, n4 - n3), params['thresholds']):
+        val = val + delta * expit(float(params['k']) * (t - float(thr)))
+    return np.maximum(0.0, val)
+
+
+def fixed_cap_smooth_array(t2_rate, nodes: tuple = None, thresholds: tuple = None, k: float = None) -> np.ndarray:
+    """fixed_cap_smooth 的数组版本（t2_rate 为百分比，可为数组）"""
+    return _fixed_cap_smooth_array(t2_rate, _cap_params(nodes=nodes, thresholds=thresholds, k=k))
+
+
+def _tau_of_wage_array(wage, params: dict) -> np.ndarray:
+    x = (np.asarray(wage, dtype=float) - float(params['w0_pivot'])) / float(params['b_width'])
+    return float(params['tau_min']) + (1.0 - float(params['tau_min'])) * (1.0 - expit(x))
+
+
+def tau_of_wage_array(wage, tau_min: float = None, w0_pivot: float = None, b_width: float = None) -> np.ndarray:
+    """tau_of_wage 的数组版本"""
+    return _tau_of_wage_array(wage, _cap_params(tau_min=tau_min, w0_pivot=w0_pivot, b_width=b_width))
+
+
 def fixed_cap_smooth(
     t2: float,
-    nodes: tuple = (12000.0, 24000.0, 48000.0, 72000.0),
-    thresholds: tuple = (0.03, 0.05, 0.10),
-    k: float = 20.0
+    nodes: tuple = None,
+    thresholds: tuple = None,
+    k: float = None
 ) -> float:
     """
     分层固定上限的平滑函数（S形连续过渡）
@@ -66,26 +164,19 @@ def fixed_cap_smooth(
         nodes: 四个固定节点 (12k, 24k, 48k, 72k)
         thresholds: 三个转折点t2值 (3%, 5%, 10%)
         k: S型函数斜率（默认20，平滑过渡）
+        （未指定的参数取当前参数集）
         
     Returns:
         平滑固定上限金额
     """
-    base, n2, n3, n4 = nodes
-    deltas = (n2 - base, n3 - n2, n4 - n3)
-    t = float(t2) / 100.0  # 转换为小数形式（10% → 0.10）
-    
-    val = base
-    for delta, thr in zip(deltas, thresholds):
-        val += delta * _sigma(float(k) * (t - float(thr)))
-    
-    return max(0.0, val)
+    return _fixed_cap_smooth_scalar(t2, _cap_params(nodes=nodes, thresholds=thresholds, k=k))
 
 
 def tau_of_wage(
     wage: float,
-    tau_min: float = 0.5,
-    w0_pivot: float = 200000.0,
-    b_width: float = 100000.0
+    tau_min: float = None,
+    w0_pivot: float = None,
+    b_width: float = None
 ) -> float:
     """
     高收入递减因子 τ(w)（公式5-6）
@@ -103,15 +194,42 @@ def tau_of_wage(
         tau_min: 最低折扣（0~1），默认0.5表示最多递减50%
         w0_pivot: 收入递减起点（元），默认200,000元
         b_width: 递减平滑宽度（元），默认100,000元
+        （未指定的参数取当前参数集）
         
     Returns:
         递减因子（0~1之间）
     """
-    w = float(wage)
-    x = (w - float(w0_pivot)) / float(b_width)
-    return float(tau_min) + (1.0 - float(tau_min)) * (1.0 - _sigma(x))
+    return _tau_scalar(wage, _cap_params(tau_min=tau_min, w0_pivot=w0_pivot, b_width=b_width))
+
+
+def cap_components(annual_salary, t2_rate, **params) -> dict:
+    """
+    混合动态上限各分量（数组，未舍入）
+    
+    Args:
+        annual_salary: 年薪（标量或数组）
+        t2_rate: T2平均节税率 (%)（标量或数组）
+        **params: 公式5-5参数覆盖（nodes / thresholds / k / tau_min / w0_pivot / b_width / cap_ratio）
+        
+    Returns:
+        {'dynamic', 'fixed_raw', 'tau', 'fixed_effective', 'cap'}
+    """
+    p = _cap_params(**params)
+    w = np.asarray(annual_salary, dtype=float)
+    dynamic = p['cap_ratio'] * w
+    fixed_raw = _fixed_cap_smooth_array(t2_rate, p)
+    tau = _tau_of_wage_array(w, p)
+    fixed_effective = fixed_raw * tau
+    return {
+        'dynamic': dynamic,
+        'fixed_raw': fixed_raw,
+        'tau': tau,
+        'fixed_effective': fixed_effective,
+        'cap': np.minimum(dynamic, fixed_effective)
+    }
 
 
+@request_memoized
 def calculate_contribution_cap(annual_salary: float, t2_rate: Optional[float] = None) -> dict:
     """
     计算个性化缴费上限（混合动态上限模型，公式5-5）
@@ -133,43 +251,39 @@ def calculate_contribution_cap(annual_salary: float, t2_rate: Optional[float] =
     Returns:
         dict: 上限详细信息
     """
+    # 参数集只解析一次，各分量共用
+    cap = _cap_params()
+    
     # 如果缺失t2，保守使用纯动态上限
     if t2_rate is None:
-        dynamic_cap = dynamic_cap_from_wage(annual_salary, cap_ratio=0.08)
+        dynamic_cap = dynamic_cap_from_wage(annual_salary, cap_ratio=cap['cap_ratio'])
         return {
             'cap': round(dynamic_cap, 0),
             'strategy': 'dynamic_8p (fallback)',
-            'formula': f"Cap = {annual_salary:,.0f} × 8% = {dynamic_cap:,.0f}元（无T2数据，使用保守策略）",
+            'formula': f"Cap = {annual_salary:,.0f} × {cap['cap_ratio']:.0%} = {dynamic_cap:,.0f}元（无T2数据，使用保守策略）",
             'details': {
                 'reason': '缺失T2，回退到纯动态比例',
                 'dynamicCap': round(dynamic_cap, 0)
             }
         }
     
-    # 1. 计算动态上限（公式5-3）
-    dynamic_cap = dynamic_cap_from_wage(annual_salary, cap_ratio=0.08)
-    
-    # 2. 计算平滑固定上限（S形函数）
-    fixed_raw = fixed_cap_smooth(
-        t2_rate,
-        nodes=(12000.0, 24000.0, 48000.0, 72000.0),
-        thresholds=(0.03, 0.05, 0.10),
-        k=20.0
-    )
-    
-    # 3. 计算高收入递减因子（公式5-6）
-    tau = tau_of_wage(
-        annual_salary,
-        tau_min=0.5,
-        w0_pivot=200000.0,
-        b_width=100000.0
-    )
-    
-    # 4. 计算有效固定上限
-    fixed_effective = fixed_raw * tau
+    # 动态上限（公式5-3）、平滑固定上限（S形函数）、高收入递减因子（公式5-6）一次计算
+    return format_cap_result(annual_salary, t2_rate, _cap_components_scalar(annual_salary, t2_rate, cap))
+
+
+def format_cap_result(annual_salary: float, t2_rate: float, components) -> dict:
+    """
+    由上限各分量（cap_components 的单个元素）生成 calculate_contribution_cap 的返回格式
+
+    画像索引保存各分量，查表时用同一函数还原，结果与实时计算一致。
+    """
+    dynamic_cap = float(components['dynamic'])
+    fixed_raw = float(components['fixed_raw'])
+    tau = float(components['tau'])
+    fixed_effective = float(components['fixed_effective'])
     
-    # 5. 取两者最小值（公式5-5核心）
-    final_cap = min(dynamic_cap, fixed_effective)
+    # 取两者最小值（公式5-5核心）
+    final_cap = float(components['cap'])
     
     return {
         'cap': round(final_cap, 0),
@@ -188,6 +302,127 @@ def calculate_contribution_cap(annual_salary: float, t2_rate: Optional[float] =
     }
 
 
+def calculate_cap_array(
+    annual_salary,
+    t2_rate=None,
+    nodes: tuple = None,
+    thresholds: tuple = None,
+    k: float = None,
+    tau_min: float = None,
+    w0_pivot: float = None,
+    b_width: float = None,
+    cap_ratio: float = None
+):
+    """
+    向量化的混合动态上限（公式5-5，与 calculate_contribution_cap 的 cap 一致，未舍入）
+    
+    Args:
+        annual_salary: 年薪（标量或数组）
+        t2_rate: T2平均节税率 (%)（标量或数组），为None时回退到纯动态比例
+        nodes / thresholds / k: 平滑固定上限参数，同 fixed_cap_smooth
+        tau_min / w0_pivot / b_width: 高收入递减参数，同 tau_of_wage
+        cap_ratio: 动态上限比例
+        （未指定的参数取当前参数集）
+        
+    Returns:
+        上限数组（元）
+    """
+    if t2_rate is None:
+        ratio = current_parameter_set().cap['cap_ratio'] if cap_ratio is None else cap_ratio
+        return ratio * np.asarray(annual_salary, dtype=float)
+    return cap_components(
+        annual_salary, t2_rate, nodes=nodes, thresholds=thresholds, k=k,
+        tau_min=tau_min, w0_pivot=w0_pivot, b_width=b_width, cap_ratio=cap_ratio
+    )['cap']
+
+
+# ==================== 反向查询 ====================
+
+def _bisect(f, lo, hi, iterations: int = BISECT_ITERATIONS) -> np.ndarray:
+    """
+    逐元素二分求 f(x) = 0 的根（f(lo) 与 f(hi) 异号，f 可向量化）
+    
+    不满足异号条件的元素返回 NaN。
+    """
+    lo, hi = np.broadcast_arrays(np.asarray(lo, dtype=float), np.asarray(hi, dtype=float))
+    lo, hi = lo.copy(), hi.copy()
+    f_lo = f(lo)
+    bracketed = np.sign(f_lo) * np.sign(f(hi)) <= 0
+    for _ in range(iterations):
+        mid = (lo + hi) / 2
+        f_mid = f(mid)
+        left = np.sign(f_mid) == np.sign(f_lo)
+        lo = np.where(left, mid, lo)
+        f_lo = np.where(left, f_mid, f_lo)
+        hi = np.where(left, hi, mid)
+    return np.where(bracketed, (lo + hi) / 2, np.nan)
+
+
+def salary_range_for_cap(cap_level, t2_rate, **params):
+    """
+    给定T2下上限 ≥ cap_level 的年薪区间 [w_low, w_high]
+    
+    动态上限随工资递增、有效固定上限随工资递减，上限对工资单峰，满足条件的工资为一个区间：
+    - w_low = cap_level / cap_ratio（动态通道）
+    - w_high 由 C_fixed(t₂) × τ(w) = cap_level 解析求得（τ 为 logistic，可直接取 logit）；
+      cap_level ≤ C_fixed × τ_min 时为 inf
+    区间为空（cap_level 超过该T2下的最高上限）时两端均为 NaN。参数可为数组（广播）。
+    
+    Returns:
+        (w_low, w_high)
+    """
+    p = _cap_params(**params)
+    level = np.asarray(cap_level, dtype=float)
+    fixed_raw = _fixed_cap_smooth_array(t2_rate, p)
+    tau_min = float(p['tau_min'])
+    
+    w_low = level / p['cap_ratio']
+    
+    # τ(w) = q  ⇔  σ((w - w0)/b) = (1 - q)/(1 - τ_min)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        q = level / fixed_raw
+        w_high = p['w0_pivot'] + p['b_width'] * logit((1 - q) / (1 - tau_min))
+    w_high = np.where(q <= tau_min, np.inf, w_high)
+    
+    feasible = (q < 1) & (w_low <= w_high)
+    return np.where(feasible, w_low, np.nan), np.where(feasible, w_high, np.nan)
+
+
+def crossover_wage(t2_rate, **params) -> np.ndarray:
+    """
+    给定T2下动态上限与有效固定上限相等的年薪（上限最高点；低于该工资走动态通道）
+    
+    0.08w - C_fixed(t₂)τ(w) 对 w 单调递增，在 [0, C_fixed/cap_ratio] 上二分求根。
+    """
+    p = _cap_params(**params)
+    fixed_raw = _fixed_cap_smooth_array(t2_rate, p)
+    
+    def gap(w):
+        tau = _tau_of_wage_array(w, p)
+        return p['cap_ratio'] * w - fixed_raw * tau
+    
+    return _bisect(gap, np.zeros_like(fixed_raw), fixed_raw / p['cap_ratio'])
+
+
+def crossover_t2(annual_salary, t2_bounds: tuple = T2_BOUNDS, **params) -> np.ndarray:
+    """
+    给定年薪下有效固定上限等于动态上限时的T2（%）
+    
+    T2 高于该值时走动态通道。C_fixed 对 T2 单调递增，在 t2_bounds 内二分求根；
+    区间内不相交（始终动态或始终固定）时返回 NaN。
+    """
+    p = _cap_params(**params)
+    w = np.asarray(annual_salary, dtype=float)
+    dynamic = p['cap_ratio'] * w
+    tau = _tau_of_wage_array(w, p)
+    
+    def gap(t2):
+        return _fixed_cap_smooth_array(t2, p) * tau - dynamic
+    
+    lo, hi = t2_bounds
+    return _bisect(gap, np.full(w.shape, float(lo)), np.full(w.shape, float(hi)))
+
+
 # 测试函数
 if __name__ == '__main__':
     print("="*80)
@@ -256,3 +491,25 @@ if __name__ == '__main__':
     print(f"  最终上限: min({result['details']['dynamicCap']:,.0f}, {result['details']['fixedEffective']:,.0f}) = ¥{result['cap']:,.0f}")
     print(f"  选用通道: {result['details']['usedChannel']}")
 
+    
+    print("\n" + "="*80)
+    print("反向查询")
+    print("="*80)
+    
+    # 上限档位 × T2 的年薪区间（一次广播计算）
+    levels = np.array([12000, 24000, 30000, 36000])
+    t2_grid = np.array([5.0, 10.0, 20.0])
+    w_low, w_high = salary_range_for_cap(levels[:, None], t2_grid[None, :])
+    print("\n4. 上限 ≥ X 的年薪区间:")
+    for i, level in enumerate(levels):
+        cells = '  '.join(
+            f"T2={t2:>4.1f}%: " + ('无' if np.isnan(w_low[i, j]) else f"¥{w_low[i, j]:,.0f} ~ ¥{w_high[i, j]:,.0f}")
+            for j, t2 in enumerate(t2_grid)
+        )
+        print(f"   X=¥{level:,}: {cells}")
+    
+    print("\n5. 动态/固定通道交叉点:")
+    for t2, wage in zip(t2_grid, crossover_wage(t2_grid)):
+        print(f"   T2={t2:4.1f}%: 年薪¥{wage:,.0f} 处交叉")
+    for salary, t2 in zip([60000, 120000, 300000], crossover_t2([60000, 120000, 300000])):
+        print(f"   年薪¥{salary:,}: " + ('T2区间内不交叉' if np.isnan(t2) else f"T2={t2:.2f}% 处交叉"))
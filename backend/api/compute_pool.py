@@ -0,0 +1,262 @@
+"""
+CPU 密集端点的进程池（带准入控制）
+
+对比场景、5档方案等端点是纯 Python 计算，持有 GIL；在线程里并发执行只会互相排队。
+政策情景分析单次计算可达数秒，放在请求线程里会长时间占住 web worker。
+这里把它们派发到常驻的进程池：
+- 工作进程启动时预先导入计算模块并加载政策参数注册表（内置 + 校准文件）
+- 请求固定的政策参数集随任务传入，工作进程内以同一版本计算
+- 排队（已提交、尚未开始计算）的任务超过 COMPUTE_QUEUE_LIMIT 时直接拒绝，
+  由调用方返回 429 + Retry-After，突发流量下延迟保持可预期
+- 分别记录排队等待时间与计算时间
+
+环境变量：
+- COMPUTE_POOL_WORKERS: 每个 web worker 的进程数（默认 CPU 核数 ÷ WEB_CONCURRENCY，至少 1；
+                        0 表示不使用进程池，在请求线程内计算）
+- COMPUTE_QUEUE_LIMIT:  允许排队的任务数（默认 进程数 × 4）
+- WEB_CONCURRENCY:      web worker 数（gunicorn.conf.py 按 -w 设置），各 web worker 的进程池分摊 CPU 核数
+
+进程池在 gunicorn worker 加载应用后预热（gunicorn.conf.py 的 post_worker_init），
+ASGI 模式在 lifespan 启动时预热；其余情况在首次使用时创建。
+"""
+
+import os
+import sys
+import math
+import time
+import threading
+import multiprocessing
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.policy_registry import (
+    get_registry, current_parameter_set, use_parameter_set, parameter_set_from_document
+)
+from api.metrics import COMPUTE_QUEUE_WAIT, COMPUTE_DURATION, COMPUTE_REJECTED, COMPUTE_BACKLOG
+
+
+# 工作进程预先导入的计算模块
+PRELOAD_MODULES = [
+    'api.policy_registry',
+    'api.contribution_suggestions',
+    'api.lifecycle_visualization',
+    'api.policy_whatif',
+]
+
+
+class ComputePoolSaturated(Exception):
+    """排队任务已达上限；retry_after 为建议的重试等待秒数"""
+
+    def __init__(self, backlog: int, retry_after: int):
+        super().__init__(f'计算队列已满（排队 {backlog} 个任务），请 {retry_after} 秒后重试')
+        self.backlog = backlog
+        self.retry_after = retry_after
+
+
+@dataclass
+class ComputeTiming:
+    """单个任务的耗时（秒）：queue_wait 为提交到开始计算，compute 为工作进程内计算"""
+    queue_wait: float
+    compute: float
+
+    def server_timing(self) -> str:
+        """Server-Timing 响应头"""
+        return f'queue;dur={self.queue_wait * 1000:.1f}, compute;dur={self.compute * 1000:.1f}'
+
+
+# ==================== 工作进程 ====================
+
+_worker_policies: Dict[str, Any] = {}
+
+
+def _init_worker():
+    """工作进程初始化：导入计算模块、加载政策参数注册表"""
+    import importlib
+    for module in PRELOAD_MODULES:
+        importlib.import_module(module)
+    get_registry()
+
+
+def _resolve_policy(tag: str, document: Dict[str, Any]):
+    """按 tag 查找参数集；工作进程的注册表中没有时（如主进程热加载了新版本）按内容重建"""
+    param_set = _worker_policies.get(tag)
+    if param_set is None:
+        try:
+            param_set = get_registry().resolve(tag)
+        except KeyError:
+            param_set = parameter_set_from_document(document, document['name'], document['source'])
+        _worker_policies[tag] = param_set
+    return param_set
+
+
+def _execute(func: Callable, args: tuple, kwargs: dict, policy: Tuple[str, Dict[str, Any]]):
+    """在工作进程中执行任务，返回 (结果, 开始时刻(time.time), 计算耗时)"""
+    started_at = time.time()
+    start = time.perf_counter()
+    with use_parameter_set(_resolve_policy(*policy)):
+        result = func(*args, **kwargs)
+    return result, started_at, time.perf_counter() - start
+
+
+def _noop():
+    return os.getpid()
+
+
+# ==================== 主进程 ====================
+
+class ComputePool:
+    """
+    带准入控制的进程池
+
+    示例:
+        result, timing = pool.run('comparison-scenarios', generate_comparison_scenarios, params)
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._mean_compute = 0.05  # 计算耗时的指数移动平均（秒），用于估算 Retry-After
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _mp_context(self):
+        # forkserver：工作进程由干净的服务进程派生（不继承请求线程的锁），并共享预导入的模块
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(PRELOAD_MODULES)
+            return context
+        return multiprocessing.get_context('spawn')
+
+    def start(self) -> 'ComputePool':
+        """创建进程池并等待所有工作进程就绪（预热）"""
+        if not self.enabled:
+            return self
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=self._mp_context(), initializer=_init_worker
+                )
+                executor = self._executor
+            else:
+                return self
+        for future in [executor.submit(_noop) for _ in range(self.workers)]:
+            future.result()
+        return self
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def backlog(self) -> int:
+        """已提交但尚未开始计算的任务数（估计值）"""
+        return max(0, self._outstanding - self.workers)
+
+    def retry_after(self) -> int:
+        """按当前排队长度与平均计算耗时估算的重试等待秒数（至少1秒）"""
+        return max(1, math.ceil(self._mean_compute * (self.backlog() + 1) / max(self.workers, 1)))
+
+    def _admit(self, endpoint: str):
+        with self._lock:
+            if self._outstanding >= self.workers + self.queue_limit:
+                COMPUTE_REJECTED.inc(endpoint=endpoint)
+                raise ComputePoolSaturated(self.backlog(), self.retry_after())
+            self._outstanding += 1
+        COMPUTE_BACKLOG.inc()
+
+    def _release(self):
+        with self._lock:
+            self._outstanding -= 1
+        COMPUTE_BACKLOG.dec()
+
+    def run(self, endpoint: str, func: Callable, *args, **kwargs) -> Tuple[Any, ComputeTiming]:
+        """
+        在进程池中执行 func(*args, **kwargs)，使用当前上下文的政策参数集
+
+        func 与参数须可 pickle（模块级函数）。进程池关闭时在当前线程内执行。
+        排队已满时抛出 ComputePoolSaturated。
+        """
+        if not self.enabled:
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            timing = ComputeTiming(queue_wait=0.0, compute=time.perf_counter() - start)
+            COMPUTE_DURATION.observe(timing.compute, endpoint=endpoint)
+            return result, timing
+
+        param_set = current_parameter_set()
+        policy = (param_set.tag, param_set.to_dict())
+
+        self._admit(endpoint)
+        executor = None
+        try:
+            executor = self._executor or self.start()._executor
+            submitted_at = time.time()
+            result, started_at, compute = executor.submit(_execute, func, args, kwargs, policy).result()
+        except BrokenProcessPool:
+            # 工作进程异常退出：丢弃进程池，下次调用时重建
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            self._release()
+
+        timing = ComputeTiming(queue_wait=max(0.0, started_at - submitted_at), compute=compute)
+        self._mean_compute = 0.8 * self._mean_compute + 0.2 * compute
+        COMPUTE_QUEUE_WAIT.observe(timing.queue_wait, endpoint=endpoint)
+        COMPUTE_DURATION.observe(timing.compute, endpoint=endpoint)
+        return result, timing
+
+
+def default_pool_workers() -> int:
+    """未设置 COMPUTE_POOL_WORKERS 时的进程数：CPU 核数按 web worker 数均分，避免 worker × 核数 的超额订阅"""
+    web_workers = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+    return max(1, (os.cpu_count() or 1) // web_workers)
+
+
+def create_compute_pool() -> ComputePool:
+    """按环境变量创建进程池（不立即启动，首次使用或调用 start() 时创建工作进程）"""
+    workers = int(os.getenv('COMPUTE_POOL_WORKERS') or default_pool_workers())
+    queue_limit = int(os.getenv('COMPUTE_QUEUE_LIMIT', workers * 4))
+    return ComputePool(workers=workers, queue_limit=queue_limit)
+
+
+if __name__ == '__main__':
+    from concurrent.futures import ThreadPoolExecutor
+    from api.lifecycle_visualization import generate_comparison_scenarios
+
+    params = {'age': 30, 'annualSalary': 150000, 'contributionAmount': 9500,
+              't2': 1.4, 't3': 1.2, 'wageGrowthRate': 3.9}
+    pool = ComputePool(workers=2, queue_limit=2).start()
+
+    result, timing = pool.run('demo', generate_comparison_scenarios, params)
+    print(f"单个任务: {len(result['scenarios'])} 个场景，{timing.server_timing()}")
+
+    def burst(_):
+        try:
+            return pool.run('demo', generate_comparison_scenarios, params)[1]
+        except ComputePoolSaturated as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=16) as threads:
+        outcomes = list(threads.map(burst, range(16)))
+    rejected = [o for o in outcomes if isinstance(o, ComputePoolSaturated)]
+    accepted = [o for o in outcomes if isinstance(o, ComputeTiming)]
+    print(f"突发16个请求（2进程，排队上限2）: 接受 {len(accepted)}，拒绝 {len(rejected)}"
+          + (f"，Retry-After={rejected[0].retry_after}s" if rejected else ''))
+    if accepted:
+        print(f"最长排队 {max(t.queue_wait for t in accepted) * 1000:.1f}ms，"
+              f"平均计算 {sum(t.compute for t in accepted) / len(accepted) * 1000:.1f}ms")
+    pool.shutdown()
@@ -8,9 +8,11 @@ import numpy as np
 try:
     from .t2_calculator import calculate_t2_for_contribution
     from .cap_calculator import calculate_contribution_cap
+    from .npv_kernel import npv_kernel, match_taper_subsidy
 except ImportError:
     from t2_calculator import calculate_t2_for_contribution
     from cap_calculator import calculate_contribution_cap
+    from npv_kernel import npv_kernel, match_taper_subsidy
 
 
 def calculate_subsidy(contribution, annual_salary):
@@ -31,21 +33,7 @@ def calculate_subsidy(contribution, annual_salary):
     Returns:
         float: 补贴金额
     """
-    base_subsidy = 150
-    
-    if annual_salary <= 40000:
-        match_rate = 0.30
-    elif annual_salary <= 100000:
-        # 线性递减: y = 0.30 - (0.24 * (x - 40000) / 60000)
-        taper = (annual_salary - 40000) / 60000
-        match_rate = 0.30 - (0.24 * taper)
-    else:
-        match_rate = 0.06
-    
-    match_subsidy = contribution * match_rate
-    total_subsidy = base_subsidy + match_subsidy
-    
-    return round(total_subsidy, 2)
+    return round(float(match_taper_subsidy(annual_salary, contribution)), 2)
 
 
 def calculate_tax_save(contribution, t2):
@@ -62,7 +50,43 @@ def calculate_tax_save(contribution, t2):
     return round(contribution * (t2 / 100), 2)
 
 
-def optimize_contribution(age, annual_salary, t2, t3, wage_growth_rate):
+def contribution_candidates(annual_salary, t2):
+    """
+    个性化上限与候选缴费额表（只依赖年薪与T2，可预计算，见 api/profile_index.py）
+    
+    Args:
+        annual_salary: 年薪
+        t2: T2节税率 (%)（用于上限计算）
+        
+    Returns:
+        dict: {'capResult', 'personalCap', 'candidates', 'realT2', 'taxSaving'}
+    """
+    # **核心改进1**: 计算个性化缴费上限（混合动态模型）
+    cap_result = calculate_contribution_cap(annual_salary, t2)
+    personal_cap = min(cap_result['cap'], 12000)  # 当前系统最高12000元
+    
+    # **核心改进2**: 计算每个候选缴费额对应的真实T2
+    candidates = candidate_amounts(personal_cap)
+    t2_results = [calculate_t2_for_contribution(annual_salary, contrib) for contrib in candidates]
+    return {
+        'capResult': cap_result,
+        'personalCap': personal_cap,
+        'candidates': candidates,
+        'realT2': np.array([t2_result['t2'] for t2_result in t2_results]),
+        'taxSaving': [t2_result['taxSaving'] for t2_result in t2_results]
+    }
+
+
+def candidate_amounts(personal_cap):
+    """缴费额候选范围（500到个性化上限，步长500；上限不是500的倍数时加入上限值）"""
+    max_candidate = int(min(personal_cap, 12000))
+    candidates = np.arange(500, max_candidate + 1, 500)
+    if max_candidate not in candidates and max_candidate >= 500:
+        candidates = np.append(candidates, max_candidate)
+    return candidates
+
+
+def optimize_contribution(age, annual_salary, t2, t3, wage_growth_rate, table=None):
     """
     优化推荐缴费额 - 返回3个推荐方案（整合混合动态上限）
     
@@ -78,78 +102,50 @@ def optimize_contribution(age, annual_salary, t2, t3, wage_growth_rate):
         t2: T2节税率 (%)（用于上限计算）
         t3: T3领取期税率 (%)
         wage_growth_rate: 工资增长率 (%)
+        table: 可选，预计算的 contribution_candidates(annual_salary, t2) 结果
         
     Returns:
         dict: 包含3个推荐方案的优化结果
     """
-    # **核心改进1**: 计算个性化缴费上限（混合动态模型）
-    cap_result = calculate_contribution_cap(annual_salary, t2)
-    personal_cap = min(cap_result['cap'], 12000)  # 当前系统最高12000元
+    if table is None:
+        table = contribution_candidates(annual_salary, t2)
+    cap_result = table['capResult']
+    personal_cap = table['personalCap']
+    candidates = table['candidates']
+    real_t2 = table['realT2']
     
-    # 缴费额候选范围（500到个性化上限，步长500）
-    max_candidate = int(min(personal_cap, 12000))
-    candidates = np.arange(500, max_candidate + 1, 500)
+    # 全部候选方案一次性计算全生命周期NPV（与 calculate_npv 同一口径：工资增长、3%贴现、账户1.75%累积）
+    n = 60 - age  # 缴费年限
+    components = npv_kernel(
+        annual_salary, candidates, n, t3 / 100, real_t2 / 100,
+        wage_growth=wage_growth_rate / 100, subsidy_rule='match_taper'
+    )
+    npv_values = components.npv
     
-    # 如果上限不是500的倍数，添加上限值
-    if max_candidate not in candidates and max_candidate >= 500:
-        candidates = np.append(candidates, max_candidate)
+    # 检查是否在补贴递减区间（避免过度缴费）
+    if 40000 < annual_salary <= 100000:
+        # 在递减区间，适当降低高缴费额的评分
+        npv_values = np.where(candidates > 10000, npv_values * 0.95, npv_values)
     
-    # 存储所有候选方案
-    all_scenarios = []
+    # 按NPV（两位小数）降序取前3个最优方案（稳定排序，与逐个构造后排序一致）
+    rounded_npv = [round(float(value), 2) for value in npv_values]
+    top_indices = sorted(range(len(candidates)), key=lambda idx: rounded_npv[idx], reverse=True)[:3]
     
-    # 遍历所有候选缴费额
-    for contrib in candidates:
-        # 计算年度补贴
-        subsidy = calculate_subsidy(contrib, annual_salary)
-        
-        # **核心改进2**: 计算此缴费额对应的真实T2
-        t2_result = calculate_t2_for_contribution(annual_salary, contrib)
-        real_t2 = t2_result['t2']
-        
-        # 计算年度税收节省（使用真实T2）
-        tax_save = calculate_tax_save(contrib, real_t2)
-        
-        # 估算T3税负（假设账户余额按1.75%增长）
-        n = 60 - age  # 缴费年限
-        r = 0.0175    # 账户收益率
-        
-        # 账户余额估算（简化为等额缴费）
-        account_balance = contrib * ((1 + r) ** n - 1) / r
-        
-        # 领取期总税负估算（20年领取期）
-        withdrawal_years = 20
-        annual_withdrawal = account_balance / withdrawal_years
-        annual_t3_tax = annual_withdrawal * (t3 / 100)
-        total_t3_tax = annual_t3_tax * withdrawal_years
-        
-        # 贴现到现在（简化处理）
-        discount_rate = 0.03
-        discounted_t3_tax = total_t3_tax / ((1 + discount_rate) ** n)
-        
-        # 计算NPV（30年缴费期 + 贴现后的T3税负）
-        npv_contribution = (subsidy + tax_save) * n - discounted_t3_tax
-        
-        # 检查是否在补贴递减区间（避免过度缴费）
-        if 40000 < annual_salary <= 100000:
-            # 在递减区间，适当降低高缴费额的评分
-            if contrib > 10000:
-                npv_contribution *= 0.95
-        
-        # 存储此方案
-        all_scenarios.append({
+    # 方案明细（补贴、节税为首年金额）
+    top_scenarios = []  # **改为3个方案**
+    for idx in top_indices:
+        contrib = candidates[idx]
+        top_scenarios.append({
             'contribution': int(contrib),
-            'subsidy': round(subsidy, 2),
-            'taxSave': round(tax_save, 2),
-            'npv': round(npv_contribution, 2),
-            'accountBalance': round(account_balance, 2),
-            'predictedT2': round(real_t2, 2),  # 真实T2
-            'taxSaving': t2_result['taxSaving']
+            'subsidy': calculate_subsidy(contrib, annual_salary),
+            'taxSave': calculate_tax_save(contrib, float(real_t2[idx])),
+            'npv': rounded_npv[idx],
+            'totalSubsidy': round(float(components.total_subsidy[idx]), 2),
+            'accountBalance': round(float(components.final_balance[idx]), 2),
+            'predictedT2': round(float(real_t2[idx]), 2),  # 真实T2
+            'taxSaving': table['taxSaving'][idx]
         })
     
-    # 按NPV排序，获取前3个最优方案
-    all_scenarios.sort(key=lambda x: x['npv'], reverse=True)
-    top_scenarios = all_scenarios[:3]  # **改为3个方案**
-    
     # **核心改进3**: 为每个方案生成详细推荐理由
     for idx, scenario in enumerate(top_scenarios):
         contrib = scenario['contribution']
@@ -163,7 +159,7 @@ def optimize_contribution(age, annual_salary, t2, t3, wage_growth_rate):
             # 方案1: NPV最大化
             reasons.append(f"🏆 NPV最大化：全生命周期净收益¥{npv:,.0f}元，为所有方案中最高")
             reasons.append(f"💰 高节税效率：T2节税率{pred_t2:.1f}%，年省税¥{scenario['taxSave']:,.0f}元")
-            reasons.append(f"🎁 补贴奖励：每年获补贴¥{subsidy:,.0f}元，{60-age}年累计¥{subsidy*(60-age):,.0f}元")
+            reasons.append(f"🎁 补贴奖励：首年补贴¥{subsidy:,.0f}元，{60-age}年累计¥{scenario['totalSubsidy']:,.0f}元（随工资增长逐年计算）")
             reasons.append(f"✅ 在您的个性化上限¥{personal_cap:,.0f}元内，合规安全")
         elif idx == 1:
             # 方案2: 平衡方案
@@ -5,18 +5,127 @@
 """
 import sys
 import os
-from typing import Dict, List, Any
+import numpy as np
+from typing import Dict, List, Any, Optional
 
 # 添加父目录到路径以支持独立测试
 if __name__ == '__main__':
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from api.subsidy_calculator import calculate_subsidy
-from api.t2_calculator import calculate_t2_for_contribution
+from api.npv_kernel import npv_kernel
 from api.policy_utils import calculate_t3
 from api.cap_calculator import calculate_contribution_cap
 
 
+# 5档方案定义：档位按个性化上限的比例取缴费额
+TIERS = [
+    {
+        'tier': 'conservative',
+        'name': '保守型',
+        'icon': '🛡️',
+        'fraction': 0.30,
+        'characteristics': [
+            '低风险、低收益',
+            '资金灵活性高',
+            '适合收入不稳定者'
+        ],
+        'suitable_for': '初入职场、收入波动大、对养老金第三支柱不太了解的人群',
+        'risk_level': 'low'
+    },
+    {
+        'tier': 'stable',
+        'name': '稳健型',
+        'icon': '📊',
+        'fraction': 0.50,
+        'characteristics': [
+            '中低风险、稳定收益',
+            '平衡补贴与税优',
+            '适合普通工薪族'
+        ],
+        'suitable_for': '收入稳定、追求长期稳健增值、对风险偏保守的中产阶层',
+        'risk_level': 'low-medium'
+    },
+    {
+        'tier': 'balanced',
+        'name': '均衡型',
+        'icon': '⚖️',
+        'fraction': 0.70,
+        'characteristics': [
+            '中等风险、较高收益',
+            '充分利用补贴和税优',
+            '风险收益最优平衡'
+        ],
+        'suitable_for': '【推荐】大多数参与者的最佳选择，收入中等偏上、追求性价比',
+        'risk_level': 'medium',
+        'recommended': True
+    },
+    {
+        'tier': 'aggressive',
+        'name': '积极型',
+        'icon': '📈',
+        'fraction': 0.85,
+        'characteristics': [
+            '中高风险、高收益',
+            '最大化税收优惠',
+            '适合高收入群体'
+        ],
+        'suitable_for': '高收入、税率高、追求最大节税效果、资金充裕的人群',
+        'risk_level': 'medium-high'
+    },
+    {
+        'tier': 'maximum',
+        'name': '激进型',
+        'icon': '🚀',
+        'fraction': 0.95,
+        'characteristics': [
+            '高风险、最高收益',
+            '接近上限边界',
+            '资金锁定度高'
+        ],
+        'suitable_for': '超高收入、追求极致节税、退休储蓄意识强、资金非常充裕者',
+        'risk_level': 'high'
+    }
+]
+
+# 连续响应曲线（前端滑块）的最大取点数
+MAX_CURVE_POINTS = 1001
+
+
+def calculate_npv_tiers(
+    annual_contributions,
+    annual_salary: float,
+    t2_rate: float,
+    t3_rate: float,
+    current_age: int,
+    wage_growth_rate: float = 3.5,
+    discount_rate: float = 3.0
+) -> Dict[str, Any]:
+    """
+    多个缴费额的NPV（缴费额 × 年份一次数组计算，工资增长路径只计算一次）
+    
+    三段式补贴、账户按1.75%累积；参数含义同 calculate_npv_simple。
+    
+    Returns:
+        与 calculate_npv_simple 同名的字段，值为按缴费额排列的数组（未舍入）
+    """
+    years_to_retirement = max(0, 60 - current_age)
+    components = npv_kernel(
+        annual_salary, annual_contributions, years_to_retirement,
+        t3_rate / 100, t2_rate / 100, wage_growth=wage_growth_rate / 100,
+        subsidy_rule='tiered', discount_rate=discount_rate / 100
+    )
+    
+    return {
+        'contribution_phase_npv': components.contribution_pv,
+        'withdrawal_phase_npv': -components.t3_tax_pv,
+        'total_npv': components.npv,
+        'total_contribution': components.total_contribution,
+        'total_subsidy': components.total_subsidy,
+        'total_tax_save': components.total_tax_save,
+        'years_to_retirement': years_to_retirement
+    }
+
+
 def calculate_npv_simple(
     annual_contribution: float,
     annual_salary: float,
@@ -27,7 +136,7 @@ def calculate_npv_simple(
     discount_rate: float = 3.0
 ) -> Dict[str, float]:
     """
-    简化NPV计算（用于快速方案对比）
+    NPV计算（用于快速方案对比，三段式补贴、账户按1.75%累积）
     
     Args:
         annual_contribution: 年缴费额
@@ -48,65 +157,51 @@ def calculate_npv_simple(
             'total_tax_save': 累计税收节约
         }
     """
-    # 缴费期: current_age -> 60岁
-    years_to_retirement = max(0, 60 - current_age)
-    
-    total_contribution = 0
-    total_subsidy = 0
-    total_tax_save = 0
-    contribution_npv = 0
-    
-    salary = annual_salary
-    for year in range(years_to_retirement):
-        # 计算当年补贴
-        subsidy_result = calculate_subsidy(salary, annual_contribution)
-        subsidy = subsidy_result['subsidy']
-        
-        # 计算当年税收节约
-        tax_save = annual_contribution * (t2_rate / 100)
-        
-        # 折现到当前
-        discount_factor = (1 + discount_rate/100) ** year
-        contribution_npv += (subsidy + tax_save) / discount_factor
-        
-        total_contribution += annual_contribution
-        total_subsidy += subsidy
-        total_tax_save += tax_save
-        
-        # 工资增长
-        salary *= (1 + wage_growth_rate/100)
-    
-    # 领取期: 60岁 -> 80岁
-    withdrawal_years = 20
-    total_accumulated = total_contribution  # 简化:忽略投资收益
-    
-    annual_withdrawal = total_accumulated / withdrawal_years
-    withdrawal_tax_per_year = annual_withdrawal * (t3_rate / 100)
-    
-    withdrawal_npv = 0
-    for year in range(withdrawal_years):
-        discount_factor = (1 + discount_rate/100) ** (years_to_retirement + year)
-        withdrawal_npv -= withdrawal_tax_per_year / discount_factor
-    
-    total_npv = contribution_npv + withdrawal_npv
-    
+    table = calculate_npv_tiers(
+        [annual_contribution], annual_salary, t2_rate, t3_rate,
+        current_age, wage_growth_rate, discount_rate
+    )
+    return _tier_npv(table, 0)
+
+
+def _tier_npv(table: Dict[str, Any], idx: int) -> Dict[str, float]:
+    """取 calculate_npv_tiers 结果中的一档（两位小数）"""
     return {
-        'contribution_phase_npv': round(contribution_npv, 2),
-        'withdrawal_phase_npv': round(withdrawal_npv, 2),
-        'total_npv': round(total_npv, 2),
-        'total_contribution': round(total_contribution, 2),
-        'total_subsidy': round(total_subsidy, 2),
-        'total_tax_save': round(total_tax_save, 2),
-        'years_to_retirement': years_to_retirement
+        'contribution_phase_npv': round(float(table['contribution_phase_npv'][idx]), 2),
+        'withdrawal_phase_npv': round(float(table['withdrawal_phase_npv'][idx]), 2),
+        'total_npv': round(float(table['total_npv'][idx]), 2),
+        'total_contribution': round(float(table['total_contribution'][idx]), 2),
+        'total_subsidy': round(float(table['total_subsidy'][idx]), 2),
+        'total_tax_save': round(float(table['total_tax_save'][idx]), 2),
+        'years_to_retirement': table['years_to_retirement']
     }
 
 
+def parse_tier_fractions(fractions) -> Optional[List[float]]:
+    """
+    校验请求中的上限比例列表（0~1，最多 MAX_CURVE_POINTS 个）；未提供时返回 None
+
+    参数不合法时抛出 ValueError。
+    """
+    if fractions is None:
+        return None
+    if not isinstance(fractions, (list, tuple)) or not fractions:
+        raise ValueError('fractions 必须是非空数组')
+    if len(fractions) > MAX_CURVE_POINTS:
+        raise ValueError(f'fractions 最多 {MAX_CURVE_POINTS} 个')
+    values = [float(f) for f in fractions]
+    if any(not 0 <= f <= 1 for f in values):
+        raise ValueError('fractions 取值必须在 [0, 1] 之间')
+    return values
+
+
 def generate_5tier_suggestions(
     current_salary: float,
     current_age: int,
     current_contribution: float = None,
     t2_rate: float = None,
-    wage_growth_rate: float = 3.5
+    wage_growth_rate: float = 3.5,
+    fractions: List[float] = None
 ) -> Dict[str, Any]:
     """
     生成5档缴费方案建议
@@ -117,12 +212,14 @@ def generate_5tier_suggestions(
         current_contribution: 当前缴费额（可选）
         t2_rate: 当前T2税率（可选）
         wage_growth_rate: 工资增长率预测
+        fractions: 可选，任意上限比例（0~1）；提供时附加连续响应曲线 curve
         
     Returns:
         {
             'tiers': [5档方案列表],
             'recommended': 推荐档位,
-            'comparison': 对比分析
+            'comparison': 对比分析,
+            'curve': 按 fractions 排列的缴费额与NPV数组（仅在提供 fractions 时）
         }
     """
     # 计算缴费上限
@@ -141,127 +238,37 @@ def generate_5tier_suggestions(
     max_cap = cap_result['cap']
     
     # 计算T3（估算）
-    t3_result = calculate_t3(t2_rate, current_salary, current_age)
+    t3_result = calculate_t3(t2_rate, current_salary, current_age, lean=True)
     t3_rate = t3_result['t3']
     
-    # 定义5档方案
-    tiers = []
-    
-    # 1. 保守型 (Conservative) - 30%上限
-    conservative_amount = max_cap * 0.30  # 移除固定6000上限，使用动态上限
-    conservative_npv = calculate_npv_simple(
-        conservative_amount, current_salary, t2_rate, t3_rate,
-        current_age, wage_growth_rate
-    )
-    tiers.append({
-        'tier': 'conservative',
-        'name': '保守型',
-        'icon': '🛡️',
-        'contribution': round(conservative_amount, 0),
-        'cap_utilization': round((conservative_amount / max_cap) * 100, 1),
-        'npv': conservative_npv,
-        'characteristics': [
-            '低风险、低收益',
-            '资金灵活性高',
-            '适合收入不稳定者'
-        ],
-        'suitable_for': '初入职场、收入波动大、对养老金第三支柱不太了解的人群',
-        'risk_level': 'low',
-        'annual_benefit': round(conservative_npv['total_npv'] / conservative_npv['years_to_retirement'], 0) if conservative_npv['years_to_retirement'] > 0 else 0
-    })
-    
-    # 2. 稳健型 (Stable) - 50%上限
-    stable_amount = max_cap * 0.50  # 移除固定8000上限，使用动态上限
-    stable_npv = calculate_npv_simple(
-        stable_amount, current_salary, t2_rate, t3_rate,
+    # 5档与曲线取点一次计算：缴费额 = 上限 × 比例（移除固定金额上限，使用动态上限）
+    tier_fractions = np.array([definition['fraction'] for definition in TIERS])
+    all_fractions = np.concatenate([tier_fractions, fractions or []])
+    amounts = max_cap * all_fractions
+    table = calculate_npv_tiers(
+        amounts, current_salary, t2_rate, t3_rate,
         current_age, wage_growth_rate
     )
-    tiers.append({
-        'tier': 'stable',
-        'name': '稳健型',
-        'icon': '📊',
-        'contribution': round(stable_amount, 0),
-        'cap_utilization': round((stable_amount / max_cap) * 100, 1),
-        'npv': stable_npv,
-        'characteristics': [
-            '中低风险、稳定收益',
-            '平衡补贴与税优',
-            '适合普通工薪族'
-        ],
-        'suitable_for': '收入稳定、追求长期稳健增值、对风险偏保守的中产阶层',
-        'risk_level': 'low-medium',
-        'annual_benefit': round(stable_npv['total_npv'] / stable_npv['years_to_retirement'], 0) if stable_npv['years_to_retirement'] > 0 else 0
-    })
     
-    # 3. 均衡型 (Balanced) - 70%上限 (推荐)
-    balanced_amount = max_cap * 0.70  # 移除固定9500上限，使用动态上限
-    balanced_npv = calculate_npv_simple(
-        balanced_amount, current_salary, t2_rate, t3_rate,
-        current_age, wage_growth_rate
-    )
-    tiers.append({
-        'tier': 'balanced',
-        'name': '均衡型',
-        'icon': '⚖️',
-        'contribution': round(balanced_amount, 0),
-        'cap_utilization': round((balanced_amount / max_cap) * 100, 1),
-        'npv': balanced_npv,
-        'characteristics': [
-            '中等风险、较高收益',
-            '充分利用补贴和税优',
-            '风险收益最优平衡'
-        ],
-        'suitable_for': '【推荐】大多数参与者的最佳选择，收入中等偏上、追求性价比',
-        'risk_level': 'medium',
-        'annual_benefit': round(balanced_npv['total_npv'] / balanced_npv['years_to_retirement'], 0) if balanced_npv['years_to_retirement'] > 0 else 0,
-        'recommended': True
-    })
-    
-    # 4. 积极型 (Aggressive) - 85%上限
-    aggressive_amount = max_cap * 0.85  # 移除固定11000上限，使用动态上限
-    aggressive_npv = calculate_npv_simple(
-        aggressive_amount, current_salary, t2_rate, t3_rate,
-        current_age, wage_growth_rate
-    )
-    tiers.append({
-        'tier': 'aggressive',
-        'name': '积极型',
-        'icon': '📈',
-        'contribution': round(aggressive_amount, 0),
-        'cap_utilization': round((aggressive_amount / max_cap) * 100, 1),
-        'npv': aggressive_npv,
-        'characteristics': [
-            '中高风险、高收益',
-            '最大化税收优惠',
-            '适合高收入群体'
-        ],
-        'suitable_for': '高收入、税率高、追求最大节税效果、资金充裕的人群',
-        'risk_level': 'medium-high',
-        'annual_benefit': round(aggressive_npv['total_npv'] / aggressive_npv['years_to_retirement'], 0) if aggressive_npv['years_to_retirement'] > 0 else 0
-    })
-    
-    # 5. 激进型 (Maximum) - 95%上限
-    maximum_amount = max_cap * 0.95  # 已经使用动态上限的95%
-    maximum_npv = calculate_npv_simple(
-        maximum_amount, current_salary, t2_rate, t3_rate,
-        current_age, wage_growth_rate
-    )
-    tiers.append({
-        'tier': 'maximum',
-        'name': '激进型',
-        'icon': '🚀',
-        'contribution': round(maximum_amount, 0),
-        'cap_utilization': round((maximum_amount / max_cap) * 100, 1),
-        'npv': maximum_npv,
-        'characteristics': [
-            '高风险、最高收益',
-            '接近上限边界',
-            '资金锁定度高'
-        ],
-        'suitable_for': '超高收入、追求极致节税、退休储蓄意识强、资金非常充裕者',
-        'risk_level': 'high',
-        'annual_benefit': round(maximum_npv['total_npv'] / maximum_npv['years_to_retirement'], 0) if maximum_npv['years_to_retirement'] > 0 else 0
-    })
+    tiers = []
+    for idx, definition in enumerate(TIERS):
+        amount = amounts[idx]
+        tier_npv = _tier_npv(table, idx)
+        tier = {
+            'tier': definition['tier'],
+            'name': definition['name'],
+            'icon': definition['icon'],
+            'contribution': round(float(amount), 0),
+            'cap_utilization': round(float(amount / max_cap) * 100, 1),
+            'npv': tier_npv,
+            'characteristics': list(definition['characteristics']),
+            'suitable_for': definition['suitable_for'],
+            'risk_level': definition['risk_level'],
+            'annual_benefit': round(tier_npv['total_npv'] / tier_npv['years_to_retirement'], 0) if tier_npv['years_to_retirement'] > 0 else 0
+        }
+        if definition.get('recommended'):
+            tier['recommended'] = True
+        tiers.append(tier)
     
     # 对比分析
     npv_values = [tier['npv']['total_npv'] for tier in tiers]
@@ -298,7 +305,7 @@ def generate_5tier_suggestions(
         tier['annualBenefit'] = tier.get('annual_benefit', 0)
         tier['suitableFor'] = tier.get('suitable_for', '')
     
-    return {
+    result = {
         'tiers': tiers,
         'recommended': 'balanced',  # 默认推荐均衡型
         'comparison': comparison,
@@ -311,6 +318,20 @@ def generate_5tier_suggestions(
             'wage_growth_rate': wage_growth_rate
         }
     }
+    
+    if fractions:
+        curve = slice(len(TIERS), None)
+        result['curve'] = {
+            'fractions': all_fractions[curve],
+            'contributions': np.round(amounts[curve], 2),
+            'totalNpv': np.round(table['total_npv'][curve], 2),
+            'contributionPhaseNpv': np.round(table['contribution_phase_npv'][curve], 2),
+            'withdrawalPhaseNpv': np.round(table['withdrawal_phase_npv'][curve], 2),
+            'totalSubsidy': np.round(table['total_subsidy'][curve], 2),
+            'totalTaxSave': np.round(table['total_tax_save'][curve], 2)
+        }
+    
+    return result
 
 
 # 测试函数
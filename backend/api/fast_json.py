@@ -0,0 +1,189 @@
+"""
+响应序列化：NumPy 友好的快速 JSON、可选 MessagePack 与压缩
+
+生命周期 / 对比场景 / 敏感性分析等端点返回大量逐年数组。计算模块直接返回
+np.round 后的 NumPy 数组，这里负责把它们高效写出：
+
+- FastJSONProvider: 替换 Flask 默认 JSON 提供器；安装了 orjson 时走 orjson
+  （原生序列化 NumPy 数组），否则用标准库 json 并把数组转成列表
+- 客户端 Accept 声明 application/msgpack 且安装了 msgpack 时输出 MessagePack
+- compress_response: 按 Accept-Encoding 对较大的响应做 brotli（已安装时）或 gzip 压缩
+
+orjson / msgpack / brotli 均为可选依赖，缺失时自动退回标准实现。
+"""
+
+import os
+import gzip
+import json
+import dataclasses
+import numpy as np
+from typing import Any, Optional
+
+from flask import request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# 小于该字节数的响应不压缩（压缩收益抵不过 CPU 开销）
+COMPRESS_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESS_MIN_BYTES', 1024))
+COMPRESSIBLE_TYPES = (JSON_MIMETYPE,) + MSGPACK_MIMETYPES
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # 动态内容取中等质量，压缩率与速度折中
+
+
+def _numpy_default(obj):
+    """标准库 json / msgpack 的回退序列化：NumPy 数组转列表、NumPy 标量转 Python 数值"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def negotiated_format() -> str:
+    """根据 Accept 头选择响应格式：'msgpack'（需安装 msgpack）或 'json'"""
+    if not MSGPACK_AVAILABLE or not has_request_context():
+        return 'json'
+    best = request.accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES)
+    return 'msgpack' if best in MSGPACK_MIMETYPES else 'json'
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    支持 NumPy 的 JSON 提供器
+
+    dumps 不带额外参数时使用 orjson（键排序与 Flask 默认一致）；
+    带参数（indent、ensure_ascii 等）或 orjson 不可用/失败时回退到标准库 json。
+    """
+
+    ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+                      if ORJSON_AVAILABLE else 0)
+
+    @staticmethod
+    def default(obj):
+        try:
+            return _numpy_default(obj)
+        except TypeError:
+            return DefaultJSONProvider.default(obj)
+
+    def dumps_bytes(self, obj: Any, indent: bool = False) -> bytes:
+        if ORJSON_AVAILABLE:
+            option = self.ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+            try:
+                return orjson.dumps(obj, default=self.default, option=option)
+            except TypeError:
+                # 超出64位的整数等 orjson 不支持的值
+                pass
+        kwargs = {'indent': 2} if indent else {'separators': (',', ':')}
+        return json.dumps(obj, default=self.default, sort_keys=self.sort_keys,
+                          ensure_ascii=self.ensure_ascii, **kwargs).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if ORJSON_AVAILABLE and not kwargs:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self.ORJSON_OPTIONS).decode('utf-8')
+            except TypeError:
+                pass
+        kwargs.setdefault('default', self.default)
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if negotiated_format() == 'msgpack':
+            body = msgpack.packb(obj, default=_numpy_default, use_bin_type=True)
+            response = self._app.response_class(body, mimetype=MSGPACK_MIMETYPES[0])
+        else:
+            indent = (self.compact is None and self._app.debug) or self.compact is False
+            body = self.dumps_bytes(obj, indent=indent) + b'\n'
+            response = self._app.response_class(body, mimetype=self.mimetype)
+
+        if MSGPACK_AVAILABLE:
+            response.vary.add('Accept')
+        return response
+
+
+def _choose_encoding() -> Optional[str]:
+    candidates = ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+    return request.accept_encodings.best_match(candidates)
+
+
+def compress_response(response):
+    """
+    按 Accept-Encoding 压缩响应体（after_request 钩子调用）
+
+    跳过：流式响应、非 200、已编码、非 JSON/MessagePack 及小于 COMPRESS_MIN_BYTES 的响应。
+    压缩后强 ETag 改为弱 ETag（同一资源的不同编码表示）。
+    """
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_TYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+if __name__ == '__main__':
+    from flask import Flask
+
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    payload = {
+        'years': np.arange(2024, 2054),
+        'balances': np.round(np.cumsum(np.full(30, 9500.0)) * 1.0175, 2),
+        'summary': {'npv': np.float64(12345.678), 'years': np.int64(30)}
+    }
+
+    print(f"orjson: {ORJSON_AVAILABLE}，msgpack: {MSGPACK_AVAILABLE}，brotli: {BROTLI_AVAILABLE}")
+    print(app.json.dumps(payload)[:120] + '...')
+
+    @app.route('/demo')
+    def demo():
+        return payload
+
+    app.after_request(compress_response)
+    client = app.test_client()
+    plain = client.get('/demo')
+    packed = client.get('/demo', headers={'Accept-Encoding': 'gzip, br'})
+    print(f"未压缩: {len(plain.data)} 字节，{packed.headers.get('Content-Encoding')}: {len(packed.data)} 字节")
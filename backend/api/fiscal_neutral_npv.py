@@ -3,9 +3,17 @@
 确保推荐方案在财政上可持续（政府支出 ≈ 政府收入）
 """
 
+import sys
+import os
 from typing import Dict, List, Any
 import numpy as np
 
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.npv_kernel import npv_kernel, RETIREMENT_AGE
+
 
 def calculate_government_cash_flow(params: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -27,63 +35,16 @@ def calculate_government_cash_flow(params: Dict[str, Any]) -> Dict[str, Any]:
         'isFiscalNeutral': bool       # 是否财政中性
     }
     """
-    age = params['age']
-    salary = params['annualSalary']
-    contribution = params['contributionAmount']
-    t2 = params['t2'] / 100
-    t3 = params['t3'] / 100
-    wage_growth = params['wageGrowthRate'] / 100
-    
-    # 常量
-    retirement_age = 60
-    contribution_years = retirement_age - age
-    withdrawal_years = 20
-    discount_rate = 0.03  # 政府贴现率3%
-    subsidy_alpha1 = 0.24
-    subsidy_alpha2 = 50
-    
-    # ==================== 计算政府成本 ====================
-    total_subsidy_pv = 0  # 补贴现值
-    total_tax_loss_pv = 0  # 税收损失现值
-    
-    for year in range(contribution_years):
-        current_salary = salary * ((1 + wage_growth) ** year)
-        current_contribution = min(contribution, 12000, current_salary * 0.12)
-        
-        # 补贴
-        subsidy = subsidy_alpha1 * current_contribution + subsidy_alpha2
-        subsidy_pv = subsidy / ((1 + discount_rate) ** year)
-        total_subsidy_pv += subsidy_pv
-        
-        # 税收损失（缴费期）
-        marginal_rate = _calculate_marginal_rate(current_salary)
-        tax_loss = current_contribution * marginal_rate
-        tax_loss_pv = tax_loss / ((1 + discount_rate) ** year)
-        total_tax_loss_pv += tax_loss_pv
-    
+    components = _fiscal_components(
+        params['age'], params['annualSalary'], params['contributionAmount'],
+        params['t3'] / 100, params['wageGrowthRate'] / 100
+    )
+    
+    # 政府成本 = 补贴现值 + 税收损失现值（缴费期）；政府收入 = 领取期T3税收现值
+    total_subsidy_pv = float(components.subsidy_pv)
+    total_tax_loss_pv = float(components.tax_save_pv)
+    total_t3_tax_pv = float(components.t3_tax_pv)
     government_cost = total_subsidy_pv + total_tax_loss_pv
-    
-    # ==================== 计算政府收入 ====================
-    # 计算退休账户余额
-    account_balance = 0
-    investment_return = 0.0175
-    
-    for year in range(contribution_years):
-        current_salary = salary * ((1 + wage_growth) ** year)
-        current_contribution = min(contribution, 12000, current_salary * 0.12)
-        account_balance = account_balance * (1 + investment_return) + current_contribution
-    
-    # 领取期税收（现值）
-    annual_withdrawal = account_balance / withdrawal_years
-    total_t3_tax_pv = 0
-    
-    for year in range(withdrawal_years):
-        t3_tax = annual_withdrawal * t3
-        # 贴现到当前
-        years_from_now = contribution_years + year
-        t3_tax_pv = t3_tax / ((1 + discount_rate) ** years_from_now)
-        total_t3_tax_pv += t3_tax_pv
-    
     government_revenue = total_t3_tax_pv
     
     # ==================== 财政平衡分析 ====================
@@ -116,36 +77,28 @@ def optimize_fiscal_neutral_contribution(params: Dict[str, Any]) -> Dict[str, An
     t3_base = params.get('t3', 1.2)
     wage_growth = params['wageGrowthRate']
     
+    # 搜索最优缴费额（500 ~ 12000，步长500），全部候选一次计算
+    contributions = np.arange(500, 12500, 500)
+    # 重新计算T3（因为缴费额变化会影响T3）
+    t3 = np.array([_estimate_t3(t2, salary, contribution) for contribution in contributions])
+    components = _fiscal_components(age, salary, contributions, t3 / 100, wage_growth / 100)
+    
+    # 用户NPV与政府现金流互为镜像：用户所得补贴、节税即政府成本，用户T3税负即政府收入
+    user_npv = components.npv
+    government_cost = components.contribution_pv
+    fiscal_balance = components.t3_tax_pv - government_cost
+    
     best_contribution = 0
     best_user_npv = -float('inf')
     best_fiscal_balance = 0
     
-    # 搜索最优缴费额（500 ~ 12000，步长500）
-    for contribution in range(500, 12500, 500):
-        # 重新计算T3（因为缴费额变化会影响T3）
-        t3 = _estimate_t3(t2, salary, contribution)
-        
-        test_params = {
-            'age': age,
-            'annualSalary': salary,
-            'contributionAmount': contribution,
-            't2': t2,
-            't3': t3,
-            'wageGrowthRate': wage_growth
-        }
-        
-        # 计算政府现金流
-        fiscal = calculate_government_cash_flow(test_params)
-        
-        # 计算用户NPV
-        user_npv = _calculate_user_npv(test_params)
-        
+    for idx, contribution in enumerate(contributions.tolist()):
         # 检查财政约束：收支差不超过成本的20%
-        if abs(fiscal['fiscalBalance']) < fiscal['governmentCost'] * 0.2:
-            if user_npv > best_user_npv:
-                best_user_npv = user_npv
+        if abs(fiscal_balance[idx]) < government_cost[idx] * 0.2:
+            if user_npv[idx] > best_user_npv:
+                best_user_npv = float(user_npv[idx])
                 best_contribution = contribution
-                best_fiscal_balance = fiscal['fiscalBalance']
+                best_fiscal_balance = float(fiscal_balance[idx])
     
     # 如果没有找到满足约束的方案，选择财政平衡最好的
     if best_contribution == 0:
@@ -167,24 +120,30 @@ def simulate_population_impact(population_params: List[Dict[str, Any]]) -> Dict[
     
     用于政策制定者评估不同补贴系数下的财政压力
     """
-    total_government_cost = 0
-    total_government_revenue = 0
     total_participants = len(population_params)
     
-    risk_distribution = {'low': 0, 'medium': 0, 'high': 0}
-    
-    for user_params in population_params:
-        fiscal = calculate_government_cash_flow(user_params)
-        total_government_cost += fiscal['governmentCost']
-        total_government_revenue += fiscal['governmentRevenue']
-        
-        # 风险分类
-        if fiscal['fiscalBalance'] < -5000:
-            risk_distribution['high'] += 1
-        elif fiscal['fiscalBalance'] < 0:
-            risk_distribution['medium'] += 1
-        else:
-            risk_distribution['low'] += 1
+    # 全部参与者一次计算（缴费年限不同由内核按各自年限截断）
+    columns = {
+        key: np.array([user_params[key] for user_params in population_params], dtype=float)
+        for key in ('age', 'annualSalary', 'contributionAmount', 't3', 'wageGrowthRate')
+    }
+    components = _fiscal_components(
+        columns['age'], columns['annualSalary'], columns['contributionAmount'],
+        columns['t3'] / 100, columns['wageGrowthRate'] / 100
+    )
+    government_cost = np.round(components.contribution_pv, 2)
+    government_revenue = np.round(components.t3_tax_pv, 2)
+    fiscal_balance = np.round(components.t3_tax_pv - components.contribution_pv, 2)
+    
+    total_government_cost = float(government_cost.sum())
+    total_government_revenue = float(government_revenue.sum())
+    
+    # 风险分类
+    risk_distribution = {
+        'low': int(np.sum(fiscal_balance >= 0)),
+        'medium': int(np.sum((fiscal_balance < 0) & (fiscal_balance >= -5000))),
+        'high': int(np.sum(fiscal_balance < -5000))
+    }
     
     aggregate_balance = total_government_revenue - total_government_cost
     
@@ -201,22 +160,17 @@ def simulate_population_impact(population_params: List[Dict[str, Any]]) -> Dict[
     }
 
 
-def _calculate_marginal_rate(annual_salary: float) -> float:
-    """计算边际税率"""
-    brackets = [
-        (36000, 0.03),
-        (144000, 0.10),
-        (300000, 0.20),
-        (420000, 0.25),
-        (660000, 0.30),
-        (960000, 0.35),
-        (float('inf'), 0.45)
-    ]
-    
-    for threshold, rate in brackets:
-        if annual_salary <= threshold:
-            return rate
-    return 0.45
+def _fiscal_components(age, salary, contribution, t3, wage_growth):
+    """
+    财政口径的NPV内核调用（比率为小数，参数可为数组）
+
+    线性补贴、边际税率节税，当年缴费不超过12000元与工资的12%，政府贴现率3%
+    """
+    return npv_kernel(
+        salary, contribution, RETIREMENT_AGE - np.asarray(age), t3,
+        wage_growth=wage_growth, subsidy_rule='linear', tax_rule='marginal',
+        annual_cap=12000, salary_cap_ratio=0.12
+    )
 
 
 def _estimate_t3(t2: float, salary: float, contribution: float) -> float:
@@ -230,27 +184,6 @@ def _estimate_t3(t2: float, salary: float, contribution: float) -> float:
     return min(14, max(0.5, t3))  # 限制在0.5%-14%
 
 
-def _calculate_user_npv(params: Dict[str, Any]) -> float:
-    """计算用户NPV（简化版）"""
-    contribution = params['contributionAmount']
-    t2 = params['t2'] / 100
-    t3 = params['t3'] / 100
-    years = 60 - params['age']
-    
-    # 补贴
-    subsidy = 0.24 * contribution + 50
-    
-    # 税收节省
-    marginal_rate = _calculate_marginal_rate(params['annualSalary'])
-    tax_saving = contribution * marginal_rate
-    
-    # 领取期税负（简化）
-    withdrawal_tax = contribution * t3 * 20  # 领取20年
-    
-    npv = (subsidy + tax_saving) * years - withdrawal_tax
-    return npv
-
-
 def _assess_sustainability(balance: float, cost: float) -> str:
     """评估财政可持续性"""
     if cost == 0:
@@ -0,0 +1,193 @@
+"""
+T2 / 上限 / T3 自洽求解
+
+各量之间存在循环依赖：
+- 个性化上限依赖 T2（公式5-5）
+- T2 依赖实际缴费额（T2 = 节税额 / 缴费额）
+- 实际缴费额 = min(意愿缴费额, 上限)
+- T3 依赖 T2
+
+原来各处以不同方式截断这一循环（先用意愿缴费额估计 T2 再求上限、或固定按 ¥12,000 计算 T2），
+得到的 T2 / 上限 / 缴费额彼此不一致。这里迭代 缴费额 → T2 → 上限 → 缴费额 到不动点，
+T3 不参与反馈，只在收敛后计算一次。全部运算对用户维向量化。
+
+收敛性：累进税制下 T2 随缴费额递减、上限随 T2 递增，因此 f(C) = min(D, cap(T2(C))) 对 C 单调不增，
+不动点唯一，且每次评估给出包含不动点的区间 [min(C, f(C)), max(C, f(C))]。
+直接迭代出现振荡（步长未减半）时改取区间中点，保证收敛。
+"""
+
+import sys
+import os
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Callable, Dict
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.t2_calculator import calculate_t2_array
+from api.cap_calculator import calculate_cap_array, resolved_cap_params
+from api.policy_utils import calculate_t3_array
+from api.calc_context import request_memoized
+
+
+STATUTORY_CONTRIBUTION = 12000   # 现行政策年缴费上限（元）
+DEFAULT_TOLERANCE = 0.01         # 收敛容差：|f(C) - C|（元）
+MAX_ITERATIONS = 100
+
+
+def _default_t2(annual_salary, contribution):
+    return calculate_t2_array(annual_salary, contribution)[0]
+
+
+def _default_cap(annual_salary, t2):
+    return calculate_cap_array(annual_salary, t2)
+
+
+def _default_t3(t2, annual_salary, age):
+    return calculate_t3_array(t2, annual_salary, age)
+
+
+@dataclass
+class FixedPointResult:
+    """
+    solve_fixed_point 的结果（未舍入，形状为输入广播后的形状）
+
+    contribution / t2 / cap 彼此一致：t2 = T2(contribution)，cap = cap(t2)，contribution = min(意愿缴费额, cap)
+    （误差不超过容差）；t3 = T3(t2)。
+    """
+    contribution: np.ndarray
+    t2: np.ndarray
+    cap: np.ndarray
+    t3: np.ndarray
+    residual: np.ndarray      # 各用户最终的 |f(C) - C|
+    iterations: np.ndarray    # 各用户收敛所用的评估次数
+    converged: np.ndarray
+
+    def diagnostics(self) -> Dict[str, Any]:
+        """收敛诊断汇总"""
+        return {
+            'converged': bool(self.converged.all()),
+            'unconverged': int((~self.converged).sum()),
+            'iterations': int(self.iterations.max()) if self.iterations.size else 0,
+            'meanIterations': round(float(self.iterations.mean()), 2) if self.iterations.size else 0.0,
+            'maxResidual': float(self.residual.max()) if self.residual.size else 0.0
+        }
+
+
+def solve_fixed_point(
+    annual_salary,
+    desired_contribution,
+    age=None,
+    t2_fn: Callable = _default_t2,
+    cap_fn: Callable = _default_cap,
+    t3_fn: Callable = _default_t3,
+    tol: float = DEFAULT_TOLERANCE,
+    max_iterations: int = MAX_ITERATIONS
+) -> FixedPointResult:
+    """
+    求解自洽的 缴费额 / T2 / 上限 / T3
+
+    Args:
+        annual_salary: 年薪（标量或数组）
+        desired_contribution: 意愿缴费额（标量或数组，与年薪广播）
+        age: 年龄（传给 t3_fn，可为 None）
+        t2_fn: (年薪, 缴费额) -> T2，默认 calculate_t2_array（%）
+        cap_fn: (年薪, T2) -> 上限，默认混合动态上限 calculate_cap_array
+        t3_fn: (T2, 年薪, 年龄) -> T3，默认 calculate_t3_array（%）
+        tol: 收敛容差（元）
+        max_iterations: 最大评估次数
+
+    Returns:
+        FixedPointResult
+    """
+    salary, desired = np.broadcast_arrays(
+        np.asarray(annual_salary, dtype=float), np.asarray(desired_contribution, dtype=float)
+    )
+    desired = np.maximum(desired, 0.0)
+
+    if cap_fn is _default_cap:
+        # 上限参数在整个求解中只解析一次，迭代内不再查询参数注册表
+        cap_params = resolved_cap_params()
+        cap_fn = lambda w, t2: calculate_cap_array(w, t2, **cap_params)
+
+    contribution = desired.copy()
+    lo = np.zeros_like(desired)
+    hi = desired.copy()
+    previous_step = np.full(desired.shape, np.inf)
+    iterations = np.zeros(desired.shape, dtype=int)
+    converged = np.zeros(desired.shape, dtype=bool)
+
+    for _ in range(max_iterations):
+        t2 = np.asarray(t2_fn(salary, contribution), dtype=float)
+        cap = np.asarray(cap_fn(salary, t2), dtype=float)
+        mapped = np.minimum(desired, cap)
+        residual = np.abs(mapped - contribution)
+
+        iterations = np.where(converged, iterations, iterations + 1)
+        converged = converged | (residual <= tol)
+        if converged.all():
+            break
+
+        # 不动点位于 C 与 f(C) 之间
+        lo = np.maximum(lo, np.minimum(contribution, mapped))
+        hi = np.minimum(hi, np.maximum(contribution, mapped))
+        # 直接迭代步长未减半（振荡）时取区间中点
+        step = np.where(residual <= previous_step / 2, mapped, (lo + hi) / 2)
+        contribution = np.where(converged, contribution, step)
+        previous_step = np.where(converged, previous_step, residual)
+    else:
+        # 未全部收敛：按最后一步的缴费额重新评估，保证返回的 T2 / 上限与缴费额对应
+        t2 = np.asarray(t2_fn(salary, contribution), dtype=float)
+        cap = np.asarray(cap_fn(salary, t2), dtype=float)
+        residual = np.abs(np.minimum(desired, cap) - contribution)
+
+    return FixedPointResult(
+        contribution=contribution,
+        t2=t2,
+        cap=cap,
+        t3=np.asarray(t3_fn(t2, salary, age), dtype=float),
+        residual=residual,
+        iterations=iterations,
+        converged=converged
+    )
+
+
+@request_memoized
+def solve_consistent_profile(annual_salary, desired_contribution=STATUTORY_CONTRIBUTION, age=None) -> Dict[str, Any]:
+    """
+    单个用户的自洽 缴费额 / T2 / 上限 / T3（百分比口径，舍入后用于响应）
+
+    Returns:
+        {'contribution', 't2', 'cap', 't3', 'convergence': {...}}
+    """
+    result = solve_fixed_point(annual_salary, desired_contribution, age)
+    return {
+        'contribution': round(float(result.contribution), 2),
+        't2': round(float(result.t2), 2),
+        'cap': round(float(result.cap), 0),
+        't3': round(float(result.t3), 2),
+        'convergence': result.diagnostics()
+    }
+
+
+if __name__ == '__main__':
+    import time
+
+    print("单个用户（意愿缴费 ¥12,000）:")
+    for salary in [60000, 150000, 300000, 600000]:
+        profile = solve_consistent_profile(salary, age=35)
+        print(f"  年薪¥{salary:>7,}: 缴费¥{profile['contribution']:>9,.2f}  T2={profile['t2']:5.2f}%  "
+              f"上限¥{profile['cap']:>7,.0f}  T3={profile['t3']:5.2f}%  "
+              f"迭代{profile['convergence']['iterations']}次")
+
+    rng = np.random.default_rng(42)
+    n = 1_000_000
+    salaries = np.clip(rng.lognormal(np.log(80000), 0.7, n), 20000, 2000000)
+    desired = salaries * rng.uniform(0.02, 0.15, n)
+    ages = rng.integers(22, 60, n)
+    start = time.perf_counter()
+    result = solve_fixed_point(salaries, desired, ages)
+    elapsed = time.perf_counter() - start
+    print(f"\n{n:,} 人: {elapsed:.2f}s，收敛诊断 {result.diagnostics()}")
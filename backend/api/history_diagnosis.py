@@ -13,6 +13,7 @@ from api.t2_calculator import calculate_t2, get_marginal_tax_rate, calculate_t2_
 from api.t3_calculator import calculate_t3
 from api.subsidy_calculator import calculate_subsidy  # 使用正确的补贴计算器
 from api.cap_calculator import calculate_contribution_cap  # 动态上限计算器
+from api.fixed_point_solver import solve_fixed_point
 
 
 def diagnose_history(history_data, age):
@@ -39,22 +40,20 @@ def diagnose_history(history_data, age):
     
     # ==================== 数据验证和清洗（使用动态上限） ====================
     
+    # 各年缴费额 / T2 / 动态上限自洽求解（所有年份一次向量化计算）
+    consistent = solve_fixed_point(
+        [record['salary'] for record in sorted_data],
+        [record['contribution'] for record in sorted_data]
+    )
+    
     cap_warnings = []  # 存储上限警告
-    for record in sorted_data:
+    for record, cap in zip(sorted_data, consistent.cap):
         salary = record['salary']
         contribution = record['contribution']
         year = record['year']
         
-        # 先计算该年的T2（用于确定动态上限）
-        temp_t2_result = calculate_t2_for_contribution(salary, contribution)
-        temp_t2 = temp_t2_result['t2']
-        
-        # 计算该年薪和T2对应的动态上限
-        cap_result = calculate_contribution_cap(
-            annual_salary=salary,
-            t2_rate=temp_t2
-        )
-        dynamic_cap = cap_result['cap']  # 修复字段名：使用'cap'而非'recommended_cap'
+        # 该年薪与自洽T2对应的动态上限
+        dynamic_cap = round(float(cap), 0)
         
         # 检查是否超出动态上限
         if contribution > dynamic_cap:
@@ -105,7 +104,7 @@ def diagnose_history(history_data, age):
     subsidy_by_year = []
     for record in sorted_data:
         # 调用正确的补贴计算器（参数顺序：salary, contribution）
-        subsidy_result = calculate_subsidy(record['salary'], record['contribution'])
+        subsidy_result = calculate_subsidy(record['salary'], record['contribution'], include_breakdown=False)
         subsidy_amount = subsidy_result['subsidy']
         total_subsidy += subsidy_amount
         subsidy_by_year.append({
@@ -278,7 +277,7 @@ def diagnose_history(history_data, age):
         recommended_amount = int(cap_result_for_recommend['cap'])
     
     # 优化策略下的年度收益（假设采纳推荐缴费额）
-    optimized_subsidy_result = calculate_subsidy(avg_salary, recommended_amount)
+    optimized_subsidy_result = calculate_subsidy(avg_salary, recommended_amount, include_breakdown=False)
     optimized_subsidy = optimized_subsidy_result['subsidy']
     optimized_tax_save = recommended_amount * (cumulative_t2 / 100)
     optimized_annual_benefit = optimized_subsidy + optimized_tax_save
@@ -3,31 +3,49 @@
 生成缴费期（30年）和领取期（20年）的详细数据用于ECharts可视化
 """
 
+import sys
+import os
 import numpy as np
 from typing import Dict, List, Any
 
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.calc_context import request_memoized
+from api.npv_kernel import npv_kernel, TAX_BRACKETS, RETIREMENT_AGE, WITHDRAWAL_YEARS, ACCOUNT_RETURN_RATE
+from api.return_process import (
+    ReturnProcess, parse_return_process, simulate_balances, percentile_bands, describe_process
+)
+
 
 def calculate_marginal_tax_rate(annual_salary: float) -> float:
     """
     根据年薪计算边际税率（中国个税税率表）
     """
-    # 中国个税税率表（年度）
-    brackets = [
-        (36000, 0.03),
-        (144000, 0.10),
-        (300000, 0.20),
-        (420000, 0.25),
-        (660000, 0.30),
-        (960000, 0.35),
-        (float('inf'), 0.45)
-    ]
-    
-    for threshold, rate in brackets:
+    for threshold, rate in TAX_BRACKETS:
         if annual_salary <= threshold:
             return rate
     return 0.45
 
 
+def round_cents(values: np.ndarray) -> np.ndarray:
+    """
+    批量保留两位小数，结果与逐个 round(x, 2) 完全一致
+    
+    np.round 先乘 100 再舍入，恰为半分的金额（如 4000 元连缴三年的 12211.225）
+    会因缩放误差与 round() 差一分；只对这类接近半分的少数元素回退到 round()。
+    """
+    values = np.asarray(values, dtype=float)
+    scaled = values * 100
+    rounded = np.floor(scaled + 0.5) / 100
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(v, 2) for v in values[near_tie].tolist()]
+    return rounded
+
+
+@request_memoized
 def generate_lifecycle_data(params: Dict[str, Any]) -> Dict[str, Any]:
     """
     生成全生命周期可视化数据
@@ -39,12 +57,14 @@ def generate_lifecycle_data(params: Dict[str, Any]) -> Dict[str, Any]:
     - t2: T2节税率（%）
     - t3: T3领取期税率（%）
     - wageGrowthRate: 工资增长率（%）
+    - returnProcess: 可选，随机收益过程（见 api.return_process）
     
     返回:
     {
         'contributionPhase': {...},  # 缴费期数据（30年）
         'withdrawalPhase': {...},     # 领取期数据（20年）
-        'summary': {...}               # 汇总统计
+        'summary': {...},              # 汇总统计
+        'stochastic': {...}            # 仅在提供 returnProcess 时：余额与NPV分位带
     }
     """
     age = params['age']
@@ -53,99 +73,76 @@ def generate_lifecycle_data(params: Dict[str, Any]) -> Dict[str, Any]:
     t2 = params['t2'] / 100  # 转换为小数
     t3 = params['t3'] / 100
     wage_growth = params['wageGrowthRate'] / 100
+    return_process = parse_return_process(params.get('returnProcess'))
     
     # 常量
-    retirement_age = 60
-    investment_return = 0.0175  # 1.75%
-    subsidy_alpha1 = 0.24
-    subsidy_alpha2 = 50
+    retirement_age = RETIREMENT_AGE
     
     # 缴费期年限
     contribution_years = retirement_age - age
     
     # ==================== 缴费期数据（30年） ====================
-    contribution_phase = {
-        'years': [],
-        'ages': [],
-        'salaries': [],
-        'contributions': [],
-        'taxSavings': [],
-        'subsidies': [],
-        'accountBalance': [],
-        'cumulativeBenefit': []
-    }
-    
-    account_balance = 0
-    cumulative_benefit = 0
+    # 统一NPV内核给出逐年数组（线性补贴 S = α1×C + α2，边际税率节税 ΔT = C×边际税率，
+    # 当年缴费不超过12000元与工资的12%，账户按1.75%累积），批量取两位小数，由 JSON 提供器直接序列化
+    components = npv_kernel(
+        salary, contribution, contribution_years, t3, wage_growth=wage_growth,
+        subsidy_rule='linear', tax_rule='marginal', annual_cap=12000, salary_cap_ratio=0.12,
+        return_rate=ACCOUNT_RETURN_RATE
+    )
+    year_index = np.arange(max(contribution_years, 0))
+    salaries = components.salaries
+    contributions = components.contributions
+    tax_savings = components.tax_savings
+    subsidies = components.subsidies
+    account_balance = components.balances
     
-    for year in range(contribution_years):
-        current_age = age + year
-        current_salary = salary * ((1 + wage_growth) ** year)
-        
-        # 计算当年缴费额（可以根据收入动态调整）
-        current_contribution = min(contribution, 12000, current_salary * 0.12)
-        
-        # 计算税收节省：ΔT = 缴费额 × 边际税率
-        marginal_rate = calculate_marginal_tax_rate(current_salary)
-        tax_saving = current_contribution * marginal_rate
-        
-        # 计算补贴：S = α1 × 缴费额 + α2
-        subsidy = subsidy_alpha1 * current_contribution + subsidy_alpha2
-        
-        # 账户余额增长：本金 + 投资收益
-        account_balance = account_balance * (1 + investment_return) + current_contribution
-        
+    contribution_phase = {
+        'years': 2024 + year_index,
+        'ages': age + year_index,
+        'salaries': round_cents(salaries),
+        'contributions': round_cents(contributions),
+        'taxSavings': round_cents(tax_savings),
+        'subsidies': round_cents(subsidies),
+        'accountBalance': round_cents(account_balance),
         # 累计收益 = 税收节省 + 补贴
-        cumulative_benefit += (tax_saving + subsidy)
-        
-        contribution_phase['years'].append(2024 + year)
-        contribution_phase['ages'].append(current_age)
-        contribution_phase['salaries'].append(round(current_salary, 2))
-        contribution_phase['contributions'].append(round(current_contribution, 2))
-        contribution_phase['taxSavings'].append(round(tax_saving, 2))
-        contribution_phase['subsidies'].append(round(subsidy, 2))
-        contribution_phase['accountBalance'].append(round(account_balance, 2))
-        contribution_phase['cumulativeBenefit'].append(round(cumulative_benefit, 2))
+        'cumulativeBenefit': round_cents(np.cumsum(tax_savings + subsidies))
+    }
     
     # ==================== 领取期数据（20年） ====================
-    withdrawal_years = 20
-    withdrawal_phase = {
-        'years': [],
-        'ages': [],
-        'withdrawalAmounts': [],
-        'taxes': [],
-        'netIncome': [],
-        'accountBalance': []
-    }
+    withdrawal_years = WITHDRAWAL_YEARS
+    withdrawal_index = np.arange(withdrawal_years)
     
     # 计算年度领取金额（账户余额/20年）
-    annual_withdrawal = account_balance / withdrawal_years
+    final_balance = float(account_balance[-1]) if contribution_years > 0 else 0.0
+    annual_withdrawal = final_balance / withdrawal_years
     
-    for year in range(withdrawal_years):
-        current_age = retirement_age + year
-        
-        # 计算领取税：领取额 × T3税率
-        withdrawal_tax = annual_withdrawal * t3
-        net_income = annual_withdrawal - withdrawal_tax
-        
-        # 账户余额递减
-        account_balance -= annual_withdrawal
-        
-        withdrawal_phase['years'].append(2024 + contribution_years + year)
-        withdrawal_phase['ages'].append(current_age)
-        withdrawal_phase['withdrawalAmounts'].append(round(annual_withdrawal, 2))
-        withdrawal_phase['taxes'].append(round(withdrawal_tax, 2))
-        withdrawal_phase['netIncome'].append(round(net_income, 2))
-        withdrawal_phase['accountBalance'].append(round(max(0, account_balance), 2))
+    # 领取税：领取额 × T3税率
+    withdrawal_tax = annual_withdrawal * t3
+    net_income = annual_withdrawal - withdrawal_tax
+    
+    # 账户余额逐年递减（cumsum 顺序累加，与逐年相减一致）
+    decrements = np.full(withdrawal_years, -annual_withdrawal)
+    decrements[0] += final_balance
+    remaining_balance = np.cumsum(decrements)
+    
+    withdrawal_phase = {
+        'years': 2024 + contribution_years + withdrawal_index,
+        'ages': retirement_age + withdrawal_index,
+        'withdrawalAmounts': np.full(withdrawal_years, round(annual_withdrawal, 2)),
+        'taxes': np.full(withdrawal_years, round(withdrawal_tax, 2)),
+        'netIncome': np.full(withdrawal_years, round(net_income, 2)),
+        'accountBalance': round_cents(np.maximum(0, remaining_balance))
+    }
     
     # ==================== 汇总统计 ====================
-    total_contribution = sum(contribution_phase['contributions'])
-    total_tax_savings = sum(contribution_phase['taxSavings'])
-    total_subsidies = sum(contribution_phase['subsidies'])
-    total_withdrawal_tax = sum(withdrawal_phase['taxes'])
+    # 按年顺序累加（与逐年列表求和一致）
+    total_contribution = sum(contribution_phase['contributions'].tolist())
+    total_tax_savings = sum(contribution_phase['taxSavings'].tolist())
+    total_subsidies = sum(contribution_phase['subsidies'].tolist())
+    total_withdrawal_tax = sum(withdrawal_phase['taxes'].tolist())
     
-    final_account = contribution_phase['accountBalance'][-1] if contribution_phase['accountBalance'] else 0
-    total_net_income = sum(withdrawal_phase['netIncome'])
+    final_account = float(contribution_phase['accountBalance'][-1]) if contribution_years > 0 else 0
+    total_net_income = sum(withdrawal_phase['netIncome'].tolist())
     
     # NPV计算
     npv = total_tax_savings + total_subsidies - total_withdrawal_tax
@@ -171,12 +168,42 @@ def generate_lifecycle_data(params: Dict[str, Any]) -> Dict[str, Any]:
         }
     }
     
-    return {
+    result = {
         'contributionPhase': contribution_phase,
         'withdrawalPhase': withdrawal_phase,
         'summary': summary,
         'success': True
     }
+    if return_process is not None:
+        result['stochastic'] = simulate_lifecycle_bands(
+            return_process, contributions, total_tax_savings + total_subsidies, t3, withdrawal_years
+        )
+    return result
+
+
+def simulate_lifecycle_bands(process: ReturnProcess, contributions: np.ndarray, benefits: float,
+                             t3: float, withdrawal_years: int) -> Dict[str, Any]:
+    """
+    随机收益下的账户余额与NPV分位带
+
+    口径与确定性结果一致：领取期按期末余额/领取年限等额领取（余额线性递减），
+    NPV = 税收节省 + 补贴 - 领取税（领取税合计 = 期末余额 × T3）。
+    """
+    balances = simulate_balances(contributions, process.sample(len(contributions)))
+    final_balance = balances[:, -1] if balances.shape[1] else np.zeros(process.paths)
+    remaining = final_balance[:, None] * (1 - np.arange(1, withdrawal_years + 1) / withdrawal_years)
+    npv = benefits - final_balance * t3
+
+    return {
+        'returnProcess': describe_process(process),
+        'contributionPhase': {'accountBalance': percentile_bands(balances)},
+        'withdrawalPhase': {
+            'accountBalance': percentile_bands(np.maximum(0, remaining)),
+            'withdrawalAmounts': percentile_bands(final_balance / withdrawal_years)
+        },
+        'finalAccountBalance': percentile_bands(final_balance),
+        'npv': percentile_bands(npv)
+    }
 
 
 def generate_comparison_scenarios(base_params: Dict[str, Any]) -> Dict[str, Any]:
@@ -236,19 +263,21 @@ def calculate_sensitivity_analysis(base_params: Dict[str, Any]) -> Dict[str, Any
     }
     
     # 1. 工资增长率敏感性
-    for g in np.linspace(2, 6, 9):
+    wage_growth_grid = np.linspace(2, 6, 9)
+    sensitivity_data['wageGrowth']['x'] = np.round(wage_growth_grid, 1)
+    for g in wage_growth_grid:
         params = base_params.copy()
         params['wageGrowthRate'] = g
         result = generate_lifecycle_data(params)
-        sensitivity_data['wageGrowth']['x'].append(round(g, 1))
         sensitivity_data['wageGrowth']['y'].append(result['summary']['overall']['npv'])
     
     # 2. T3税率敏感性
-    for t3 in np.linspace(0.5, 3, 9):
+    t3_grid = np.linspace(0.5, 3, 9)
+    sensitivity_data['t3Rate']['x'] = np.round(t3_grid, 1)
+    for t3 in t3_grid:
         params = base_params.copy()
         params['t3'] = t3
         result = generate_lifecycle_data(params)
-        sensitivity_data['t3Rate']['x'].append(round(t3, 1))
         sensitivity_data['t3Rate']['y'].append(result['summary']['overall']['npv'])
     
     return {
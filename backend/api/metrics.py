@@ -0,0 +1,222 @@
+"""
+请求延迟与计算阶段埋点（Prometheus 文本格式）
+
+提供无第三方依赖的 Counter / Gauge / Histogram，以及：
+- HTTP 层：按路由记录请求延迟、请求/响应体大小、错误数、并发请求数
+- 计算阶段：stage_timer 记录端点内部各计算阶段耗时
+render_metrics() 输出 Prometheus text exposition format (0.0.4)，供 /metrics 抓取。
+"""
+
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Sequence
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple:
+        return tuple(str(labels.get(n, '')) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items
+        ]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        bounds = [*self.buckets, float('inf')]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表（按注册顺序输出）"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+REQUEST_LATENCY = REGISTRY.register(Histogram(
+    'aippof_http_request_duration_seconds', 'HTTP request latency by route',
+    ('route', 'method', 'status')
+))
+REQUEST_SIZE = REGISTRY.register(Histogram(
+    'aippof_http_request_size_bytes', 'HTTP request body size by route',
+    ('route', 'method'), buckets=SIZE_BUCKETS
+))
+RESPONSE_SIZE = REGISTRY.register(Histogram(
+    'aippof_http_response_size_bytes', 'HTTP response body size by route',
+    ('route', 'method'), buckets=SIZE_BUCKETS
+))
+REQUEST_ERRORS = REGISTRY.register(Counter(
+    'aippof_http_request_errors_total', 'HTTP responses with status >= 400 by route',
+    ('route', 'method', 'status')
+))
+REQUESTS_IN_FLIGHT = REGISTRY.register(Gauge(
+    'aippof_http_requests_in_flight', 'HTTP requests currently being served'
+))
+RESPONSE_CACHE_EVENTS = REGISTRY.register(Counter(
+    'aippof_response_cache_total', 'Response cache lookups by route and result (hit/miss/not_modified)',
+    ('route', 'result')
+))
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    'aippof_stage_duration_seconds', 'Calculator stage latency inside endpoints',
+    ('endpoint', 'stage')
+))
+COMPUTE_QUEUE_WAIT = REGISTRY.register(Histogram(
+    'aippof_compute_queue_wait_seconds', 'Time offloaded tasks wait for a compute pool worker',
+    ('endpoint',)
+))
+COMPUTE_DURATION = REGISTRY.register(Histogram(
+    'aippof_compute_duration_seconds', 'Compute time of offloaded tasks inside pool workers',
+    ('endpoint',)
+))
+COMPUTE_REJECTED = REGISTRY.register(Counter(
+    'aippof_compute_rejected_total', 'Offloaded tasks rejected by compute pool admission control',
+    ('endpoint',)
+))
+COMPUTE_BACKLOG = REGISTRY.register(Gauge(
+    'aippof_compute_backlog', 'Offloaded tasks submitted to the compute pool and not yet finished'
+))
+
+
+def observe_request(route: str, method: str, status: int, duration: float,
+                    request_bytes: int = None, response_bytes: int = None):
+    """记录一次HTTP请求（由 main.py 的请求钩子调用）"""
+    REQUEST_LATENCY.observe(duration, route=route, method=method, status=status)
+    if request_bytes is not None:
+        REQUEST_SIZE.observe(request_bytes, route=route, method=method)
+    if response_bytes is not None:
+        RESPONSE_SIZE.observe(response_bytes, route=route, method=method)
+    if status >= 400:
+        REQUEST_ERRORS.inc(route=route, method=method, status=status)
+
+
+@contextmanager
+def stage_timer(endpoint: str, stage: str):
+    """
+    计算阶段计时
+
+    示例:
+        with stage_timer('optimize-contribution', 't2'):
+            t2_result = calculate_t2(...)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint, stage=stage)
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+if __name__ == '__main__':
+    for i in range(5):
+        with stage_timer('demo', 'sleep'):
+            time.sleep(0.002 * i)
+    observe_request('/api/demo', 'POST', 200, 0.012, 120, 2048)
+    observe_request('/api/demo', 'POST', 500, 0.3, 90, 40)
+    print(render_metrics())
@@ -2,10 +2,19 @@
 NPV净现值计算模块
 计算公式: NPV = Σ(补贴S + 税收节省ΔT1) - 领取期税负T3
 """
+import sys
+import os
 import numpy as np
 
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.npv_kernel import npv_kernel, WITHDRAWAL_YEARS, ACCOUNT_RETURN_RATE, DISCOUNT_RATE
+from api.return_process import simulate_balances, percentile_bands, describe_process
+
 
-def calculate_npv(age, annual_salary, contribution_amount, t2, t3, wage_growth_rate):
+def calculate_npv(age, annual_salary, contribution_amount, t2, t3, wage_growth_rate, return_process=None):
     """
     计算全生命周期净现值NPV
     
@@ -21,116 +30,48 @@ def calculate_npv(age, annual_salary, contribution_amount, t2, t3, wage_growth_r
         t2: T2节税率 (%)
         t3: T3领取期税率 (%)
         wage_growth_rate: 工资增长率 (%)
+        return_process: 可选，ReturnProcess 随机收益过程；提供时附加 stochastic 分位带
         
     Returns:
         dict: NPV计算结果
     """
     # 基本参数
-    contribution_years = 60 - age  # 缴费年限
-    withdrawal_years = 20          # 领取年限（假设60-80岁）
-    account_return_rate = 0.0175   # 账户收益率 1.75%
-    discount_rate = 0.03           # 贴现率 3%
-    
-    # ==================== 缴费期计算 ====================
-    
-    total_subsidy = 0
-    total_tax_save = 0
-    contribution_phase_npv = 0
-    
-    current_salary = annual_salary
-    
-    for year in range(contribution_years):
-        # 计算当年补贴
-        if current_salary <= 40000:
-            match_rate = 0.30
-        elif current_salary <= 100000:
-            taper = (current_salary - 40000) / 60000
-            match_rate = 0.30 - (0.24 * taper)
-        else:
-            match_rate = 0.06
-        
-        annual_subsidy = 150 + contribution_amount * match_rate
-        
-        # 计算当年税收节省
-        annual_tax_save = contribution_amount * (t2 / 100)
-        
-        # 当年总收益
-        annual_benefit = annual_subsidy + annual_tax_save
-        
-        # 贴现到现在
-        present_value = annual_benefit / ((1 + discount_rate) ** year)
-        contribution_phase_npv += present_value
-        
-        # 累计总额
-        total_subsidy += annual_subsidy
-        total_tax_save += annual_tax_save
-        
-        # 更新下一年工资
-        current_salary *= (1 + wage_growth_rate / 100)
+    contribution_years = max(0, 60 - age)  # 缴费年限（60岁以后为0）
+    withdrawal_years = WITHDRAWAL_YEARS  # 领取年限（假设60-80岁）
+    account_return_rate = ACCOUNT_RETURN_RATE  # 账户收益率 1.75%
+    discount_rate = DISCOUNT_RATE  # 贴现率 3%
     
-    # ==================== 账户余额计算 ====================
-    
-    # 假设等额缴费，计算60岁时账户余额
-    # FV = C * [(1+r)^n - 1] / r
-    account_balance = contribution_amount * (((1 + account_return_rate) ** contribution_years - 1) / account_return_rate)
-    
-    # ==================== 领取期计算 ====================
+    # ==================== 缴费期 / 领取期（统一NPV内核） ====================
+    # 与固定4000元缴费的对比方案在同一次计算中完成
+    comparison_contribution = 4000
+    components = npv_kernel(
+        annual_salary, [contribution_amount, comparison_contribution], contribution_years,
+        t3 / 100, t2 / 100, wage_growth=wage_growth_rate / 100, subsidy_rule='match_taper'
+    )
     
-    # 每年领取金额（平均分配）
-    annual_withdrawal = account_balance / withdrawal_years
+    total_subsidy = float(components.total_subsidy[0])
+    total_tax_save = float(components.total_tax_save[0])
+    contribution_phase_npv = float(components.contribution_pv[0])
     
-    # 每年T3税负
-    annual_t3_tax = annual_withdrawal * (t3 / 100)
+    # 60岁时账户余额与每年领取金额（平均分配）
+    account_balance = float(components.final_balance[0])
+    annual_withdrawal = float(components.annual_withdrawal[0])
     
-    # 总T3税负
-    total_t3_tax = 0
-    for year in range(withdrawal_years):
-        # 贴现到现在（从第contribution_years年开始）
-        present_value = annual_t3_tax / ((1 + discount_rate) ** (contribution_years + year))
-        total_t3_tax += present_value
+    # 领取期T3税负现值
+    total_t3_tax = float(components.t3_tax_pv[0])
     
     # ==================== 计算NPV ====================
     
     npv = contribution_phase_npv - total_t3_tax
     
-    # ==================== 对比维持现状（0缴费或固定4000元） ====================
+    # ==================== 对比维持现状（固定4000元） ====================
     
-    # 计算固定4000元缴费的NPV作为对比
-    comparison_contribution = 4000
-    comparison_npv = 0
-    comparison_salary = annual_salary
-    
-    for year in range(contribution_years):
-        if comparison_salary <= 40000:
-            match_rate = 0.30
-        elif comparison_salary <= 100000:
-            taper = (comparison_salary - 40000) / 60000
-            match_rate = 0.30 - (0.24 * taper)
-        else:
-            match_rate = 0.06
-        
-        comp_subsidy = 150 + comparison_contribution * match_rate
-        comp_tax_save = comparison_contribution * (t2 / 100)
-        comp_benefit = comp_subsidy + comp_tax_save
-        
-        comparison_npv += comp_benefit / ((1 + discount_rate) ** year)
-        comparison_salary *= (1 + wage_growth_rate / 100)
-    
-    # 对比方案的T3税负
-    comp_balance = comparison_contribution * (((1 + account_return_rate) ** contribution_years - 1) / account_return_rate)
-    comp_withdrawal = comp_balance / withdrawal_years
-    comp_t3_tax = 0
-    
-    for year in range(withdrawal_years):
-        annual_comp_tax = comp_withdrawal * (t3 / 100)
-        comp_t3_tax += annual_comp_tax / ((1 + discount_rate) ** (contribution_years + year))
-    
-    comparison_npv -= comp_t3_tax
+    comparison_npv = float(components.npv[1])
     
     # NPV差异
     npv_advantage = npv - comparison_npv
     
-    return {
+    result = {
         'npv': round(npv, 2),
         'totalSubsidy': round(total_subsidy, 2),
         'totalTaxSave': round(total_tax_save, 2),
@@ -155,6 +96,25 @@ def calculate_npv(age, annual_salary, contribution_amount, t2, t3, wage_growth_r
             'discountRate': discount_rate * 100
         }
     }
+    
+    # ==================== 随机收益（可选） ====================
+    
+    if return_process is not None:
+        # 等额缴费逐路径累积（与年金终值公式同一口径），领取期税负按各路径余额重算
+        balances = simulate_balances(np.full(contribution_years, float(contribution_amount)),
+                                     return_process.sample(contribution_years))
+        final_balance = balances[:, -1] if contribution_years > 0 else np.zeros(return_process.paths)
+        t3_discount = float(components.withdrawal_annuity)
+        npv_paths = contribution_phase_npv - final_balance / withdrawal_years * (t3 / 100) * t3_discount
+        
+        result['stochastic'] = {
+            'returnProcess': describe_process(return_process),
+            'accountBalancePath': percentile_bands(balances),
+            'accountBalance': percentile_bands(final_balance),
+            'npv': percentile_bands(npv_paths)
+        }
+    
+    return result
 
 
 # 测试函数
@@ -192,3 +152,10 @@ if __name__ == '__main__':
     print(f"  对比方案NPV: ¥{result['comparison']['comparisonNPV']:,.2f}")
     print(f"  NPV优势: ¥{result['comparison']['npvAdvantage']:,.2f}")
     print(f"  提升比例: {result['comparison']['percentageGain']}%")
+    
+    from api.return_process import parse_return_process
+    process = parse_return_process({'model': 'lognormal', 'mean': 1.75, 'volatility': 4.0})
+    stochastic = calculate_npv(**test_case, return_process=process)['stochastic']
+    print(f"\n随机收益（{process.paths} 条路径，波动率 4%）:")
+    for key in ('p5', 'p50', 'p95'):
+        print(f"  {key.upper()}: 60岁余额 ¥{stochastic['accountBalance'][key]:,.2f}，NPV ¥{stochastic['npv'][key]:,.2f}")
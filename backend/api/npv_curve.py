@@ -0,0 +1,167 @@
+"""
+缴费额 → NPV 连续响应曲线
+
+固定用户（年薪、年龄、T2、T3、工资增长率）时，缴费期各年的补贴、节税与账户余额
+都是缴费额 C 的分段线性函数：
+- 三段式补贴在 C̅₁、C̅₂ 处改变斜率（拐点），在最低缴费门槛 c_min 处由 0 跳变（间断点）
+- 节税 C×T2、账户余额与领取期T3税负对 C 线性
+
+因此只需在区间端点、拐点及间断点左极限处调用一次 NPV 内核，
+整条曲线在任意分辨率上由线性插值精确得到，各段斜率即边际NPV（每多缴1元的NPV）。
+T2 在曲线上视为常数（与 /api/calculate-npv 一致）。
+"""
+
+import sys
+import os
+import numpy as np
+from typing import Any, Dict, List, Tuple
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.npv_kernel import npv_kernel, SUBSIDY_RULES
+from api.policy_registry import current_parameter_set
+from api.cap_calculator import calculate_contribution_cap
+
+
+DEFAULT_POINTS = 201
+MAX_POINTS = 5001
+DEFAULT_SUBSIDY_RULE = 'tiered'
+
+
+def subsidy_breakpoints(subsidy_rule: str) -> Tuple[List[Tuple[float, str]], List[Tuple[float, str]]]:
+    """
+    补贴规则对缴费额的拐点与间断点
+
+    返回:
+        (kinks, jumps)，均为 [(缴费额, 名称)]
+    """
+    if subsidy_rule != 'tiered':
+        # match_taper / linear 对缴费额线性
+        return [], []
+    params = current_parameter_set().subsidy_params
+    kinks = [(params.c_bar_1, 'c_bar_1'), (params.c_bar_2, 'c_bar_2')]
+    jumps = [(params.c_min, 'c_min')] if params.default_enroll else []
+    return kinks, jumps
+
+
+def calculate_npv_curve(
+    annual_salary: float,
+    age: int,
+    t2: float,
+    t3: float,
+    wage_growth_rate: float = 3.5,
+    cap: float = None,
+    points: int = DEFAULT_POINTS,
+    subsidy_rule: str = DEFAULT_SUBSIDY_RULE
+) -> Dict[str, Any]:
+    """
+    计算 [0, 个性化上限] 上的 NPV / 补贴 / 节税 / T3税负曲线
+
+    Args:
+        annual_salary: 当前年薪
+        age: 当前年龄
+        t2: T2节税率 (%)
+        t3: T3领取期税率 (%)
+        wage_growth_rate: 工资增长率 (%)
+        cap: 曲线右端点；默认取混合动态上限（公式5-5）
+        points: 等距取点数（2 ~ MAX_POINTS），拐点另行加入
+        subsidy_rule: 补贴规则（tiered / match_taper / linear）
+
+    Returns:
+        {
+            'contributions': 缴费额数组（等距点并入拐点，升序）,
+            'npv' / 'subsidyPV' / 'taxSavingPV' / 't3TaxPV': 对应现值数组,
+            'kinks': [{'contribution', 'type', 'name', 'npv', ...}]（端点、拐点、间断点）,
+            'segments': [{'from', 'to', 'marginalNPV'}]（各线性段每多缴1元的NPV）,
+            'cap': 右端点,
+            'parameters': 输入参数
+        }
+    """
+    if subsidy_rule not in SUBSIDY_RULES:
+        raise ValueError(f'subsidyRule 必须是 {" / ".join(SUBSIDY_RULES)} 之一')
+    points = int(points)
+    if not 2 <= points <= MAX_POINTS:
+        raise ValueError(f'points 必须在 2 ~ {MAX_POINTS} 之间')
+    if cap is None:
+        cap = calculate_contribution_cap(annual_salary, t2)['cap']
+    cap = float(cap)
+    if cap <= 0:
+        raise ValueError('cap 必须大于 0')
+
+    kinks, jumps = subsidy_breakpoints(subsidy_rule)
+    kinks = [(c, name) for c, name in kinks if 0 < c < cap]
+    jumps = [(c, name) for c, name in jumps if 0 < c <= cap]
+
+    # 节点：端点、拐点、间断点及其左极限（np.interp 在相邻节点间线性插值）
+    nodes = sorted({0.0, cap, *(c for c, _ in kinks), *(c for c, _ in jumps),
+                    *(np.nextafter(c, -np.inf) for c, _ in jumps)})
+    nodes = np.array(nodes)
+    components = npv_kernel(
+        annual_salary, nodes, 60 - age, t3 / 100, t2 / 100,
+        wage_growth=wage_growth_rate / 100, subsidy_rule=subsidy_rule
+    )
+    node_values = {
+        'npv': components.npv,
+        'subsidyPV': components.subsidy_pv,
+        'taxSavingPV': components.tax_save_pv,
+        't3TaxPV': components.t3_tax_pv
+    }
+
+    contributions = np.union1d(np.linspace(0.0, cap, points), [c for c, _ in kinks + jumps])
+    curves = {key: np.round(np.interp(contributions, nodes, values), 2) for key, values in node_values.items()}
+
+    def node_npv(c):
+        return round(float(node_values['npv'][np.searchsorted(nodes, c)]), 2)
+
+    kink_list = [{'contribution': 0.0, 'type': 'start', 'name': 'zero', 'npv': node_npv(0.0)}]
+    kink_list += [{'contribution': c, 'type': 'kink', 'name': name, 'npv': node_npv(c)} for c, name in kinks]
+    kink_list += [{'contribution': c, 'type': 'jump', 'name': name,
+                   'npvBefore': node_npv(np.nextafter(c, -np.inf)), 'npv': node_npv(c)} for c, name in jumps]
+    kink_list.append({'contribution': cap, 'type': 'cap', 'name': 'cap', 'npv': node_npv(cap)})
+    kink_list.sort(key=lambda k: (k['contribution'], k['type'] != 'cap'))
+
+    # 各线性段斜率（跳过间断点左极限与间断点之间的零宽区间）
+    segments = []
+    for left, right, v_left, v_right in zip(nodes[:-1], nodes[1:], node_values['npv'][:-1], node_values['npv'][1:]):
+        if right - left < 1e-6:
+            continue
+        segments.append({
+            'from': round(float(left), 2),
+            'to': round(float(right), 2),
+            'marginalNPV': round(float((v_right - v_left) / (right - left)), 6)
+        })
+
+    return {
+        'contributions': np.round(contributions, 2),
+        **curves,
+        'kinks': kink_list,
+        'segments': segments,
+        'cap': round(cap, 2),
+        'parameters': {
+            'annualSalary': annual_salary,
+            'age': age,
+            't2': t2,
+            't3': t3,
+            'wageGrowthRate': wage_growth_rate,
+            'subsidyRule': subsidy_rule,
+            'points': points
+        },
+        'success': True
+    }
+
+
+if __name__ == '__main__':
+    import time
+
+    start = time.perf_counter()
+    result = calculate_npv_curve(60000, 30, 3.0, 1.2, 4.0, points=1001)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"缴费额 → NPV 曲线：{len(result['contributions'])} 个点，上限 ¥{result['cap']:,.0f}，耗时 {elapsed:.1f}ms")
+    for kink in result['kinks']:
+        before = f"（左极限 ¥{kink['npvBefore']:,.2f}）" if 'npvBefore' in kink else ''
+        print(f"  {kink['type']:<6} {kink['name']:<8} C=¥{kink['contribution']:>9,.2f}  NPV ¥{kink['npv']:>10,.2f}{before}")
+    for segment in result['segments']:
+        print(f"  [{segment['from']:>9,.2f}, {segment['to']:>9,.2f}]  边际NPV {segment['marginalNPV']:.4f} 元/元")
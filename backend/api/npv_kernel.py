@@ -0,0 +1,273 @@
+"""
+统一NPV计算内核
+
+各端点（calculate_npv / 5档方案 / 推荐缴费额优化 / 财政中性分析 / 全周期可视化）
+共用同一套逐年现金流与现值计算，差异只体现在参数上：
+- subsidy_rule: 补贴规则（match_taper 收入递减配比 / tiered 三段式 / linear 线性）
+- tax_rule:     缴费期节税口径（t2 平均节税率 / marginal 边际税率表）
+- 账户收益率、贴现率、领取年限、缴费上限
+
+所有输入按 NumPy 广播规则组合（用户 × 缴费额 × ...），逐年维度在最后一轴；
+缴费年限也可以是数组，超出各自年限的年份按零现金流处理。
+
+约定（与 calculate_npv 一致）：
+- 第 t 年（t = 0..years-1）缴费、补贴与节税按 (1+d)^-t 贴现
+- 账户余额 B_t = B_{t-1}·(1+r) + C_t，退休时余额按领取年限等额领取
+- 领取期第 k 年的T3税负按 (1+d)^-(years+k) 贴现
+- NPV = 补贴现值 + 节税现值 - T3税负现值
+- 缴费年限为负（年龄超过60岁）时按 0 处理：没有缴费期现金流，余额与T3税负为 0，NPV = 0。
+  原先各模块的年金终值公式在负年限下给出负余额（T3税负为负、NPV 为正），这一点与原实现不同。
+"""
+
+import sys
+import os
+import numpy as np
+from dataclasses import dataclass
+from scipy.signal import lfilter
+from typing import Callable, Union
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.policy_registry import current_parameter_set
+from api.subsidy_calculator import calculate_subsidy_array
+
+
+RETIREMENT_AGE = 60
+WITHDRAWAL_YEARS = 20
+ACCOUNT_RETURN_RATE = 0.0175  # 账户收益率 1.75%
+DISCOUNT_RATE = 0.03          # 贴现率 3%
+
+# 收入递减配比补贴：150 + C × 配比率（≤4万 30%，4万~10万线性递减至 6%，>10万 6%）
+MATCH_BASE = 150
+MATCH_RATE_HIGH = 0.30
+MATCH_RATE_LOW = 0.06
+MATCH_W_LOW = 40000
+MATCH_W_HIGH = 100000
+
+# 中国个税税率表（年度）：(年薪上限, 边际税率)
+TAX_BRACKETS = [
+    (36000, 0.03),
+    (144000, 0.10),
+    (300000, 0.20),
+    (420000, 0.25),
+    (660000, 0.30),
+    (960000, 0.35),
+    (float('inf'), 0.45)
+]
+
+
+def marginal_tax_rates(annual_salaries: np.ndarray) -> np.ndarray:
+    """按税率表逐元素取边际税率"""
+    thresholds = np.array([threshold for threshold, _ in TAX_BRACKETS])
+    rates = np.array([rate for _, rate in TAX_BRACKETS])
+    return rates[np.searchsorted(thresholds, annual_salaries, side='left')]
+
+
+# ==================== 补贴规则 ====================
+
+def match_taper_subsidy(salaries: np.ndarray, contributions: np.ndarray) -> np.ndarray:
+    """收入递减配比补贴（NPV计算与推荐缴费额优化使用）"""
+    salaries = np.asarray(salaries, dtype=float)
+    taper = (salaries - MATCH_W_LOW) / (MATCH_W_HIGH - MATCH_W_LOW)
+    match_rate = np.where(
+        salaries <= MATCH_W_LOW, MATCH_RATE_HIGH,
+        np.where(salaries <= MATCH_W_HIGH, MATCH_RATE_HIGH - (MATCH_RATE_HIGH - MATCH_RATE_LOW) * taper,
+                 MATCH_RATE_LOW)
+    )
+    return MATCH_BASE + contributions * match_rate
+
+
+def tiered_subsidy(salaries: np.ndarray, contributions: np.ndarray) -> np.ndarray:
+    """当前政策参数集的三段式补贴（公式5-12，含收入递减与最低缴费门槛）"""
+    return calculate_subsidy_array(salaries, contributions)
+
+
+def linear_subsidy(salaries: np.ndarray, contributions: np.ndarray) -> np.ndarray:
+    """当前政策参数集的线性补贴 S = α×C + base（全周期可视化与财政分析使用）"""
+    params = current_parameter_set().linear_subsidy
+    return params['alpha'] * contributions + params['base']
+
+
+SUBSIDY_RULES = {
+    'match_taper': match_taper_subsidy,
+    'tiered': tiered_subsidy,
+    'linear': linear_subsidy
+}
+
+TAX_RULES = ('t2', 'marginal')
+
+
+@dataclass
+class NPVComponents:
+    """
+    npv_kernel 的计算结果（未舍入）
+
+    逐年数组形状为 (..., years)，其余为 (...)，前导维由输入广播得到。
+    """
+    salaries: np.ndarray
+    contributions: np.ndarray
+    subsidies: np.ndarray
+    tax_savings: np.ndarray
+    balances: np.ndarray
+    final_balance: np.ndarray
+    annual_withdrawal: np.ndarray
+    annual_t3_tax: np.ndarray
+    withdrawal_annuity: np.ndarray  # 领取期每年 1 元折现到第0年的合计
+    subsidy_pv: np.ndarray
+    tax_save_pv: np.ndarray
+    t3_tax_pv: np.ndarray
+
+    @property
+    def contribution_pv(self) -> np.ndarray:
+        """缴费期收益现值（补贴 + 节税）"""
+        return self.subsidy_pv + self.tax_save_pv
+
+    @property
+    def npv(self) -> np.ndarray:
+        return self.subsidy_pv + self.tax_save_pv - self.t3_tax_pv
+
+    @property
+    def total_contribution(self) -> np.ndarray:
+        return self.contributions.sum(axis=-1)
+
+    @property
+    def total_subsidy(self) -> np.ndarray:
+        return self.subsidies.sum(axis=-1)
+
+    @property
+    def total_tax_save(self) -> np.ndarray:
+        return self.tax_savings.sum(axis=-1)
+
+
+def growth_factors(wage_growth, years: int) -> np.ndarray:
+    """
+    工资增长因子 (1+g)^t，形状 (..., years)
+
+    标量增长率逐项用 ** 计算（np.power 与标量幂末位可能不同，影响分位舍入）。
+    """
+    if np.ndim(wage_growth) == 0:
+        return np.array([(1 + wage_growth) ** year for year in range(years)])
+    return np.power(1 + np.asarray(wage_growth, dtype=float)[..., None], np.arange(years))
+
+
+def npv_kernel(
+    salary,
+    contribution,
+    years,
+    t3,
+    t2=None,
+    wage_growth=0.0,
+    subsidy_rule: Union[str, Callable] = 'match_taper',
+    tax_rule: str = 't2',
+    annual_cap: float = None,
+    salary_cap_ratio: float = None,
+    return_rate: float = ACCOUNT_RETURN_RATE,
+    discount_rate: float = DISCOUNT_RATE,
+    withdrawal_years: int = WITHDRAWAL_YEARS
+) -> NPVComponents:
+    """
+    全生命周期NPV数组内核
+
+    参数（比率均为小数口径，除规则名外均可为数组）:
+        salary: 当前年薪
+        contribution: 年缴费额（每年相同，受上限约束）
+        years: 缴费年限（负数按0处理）
+        t3: 领取期税率
+        t2: 平均节税率（tax_rule='t2' 时必填）
+        wage_growth: 工资年增长率
+        subsidy_rule: SUBSIDY_RULES 中的名称，或 (salaries, contributions) -> subsidies 的函数
+        tax_rule: 't2' 节税 = C×T2；'marginal' 节税 = C×当年工资对应的边际税率
+        annual_cap / salary_cap_ratio: 当年缴费不超过 annual_cap 与工资×salary_cap_ratio
+        return_rate: 账户收益率（标量）
+        discount_rate: 贴现率（标量）
+        withdrawal_years: 领取年限
+
+    返回:
+        NPVComponents（逐年现金流、账户余额与各分量现值）
+    """
+    if tax_rule not in TAX_RULES:
+        raise ValueError(f'tax_rule 必须是 {" / ".join(TAX_RULES)} 之一')
+    if tax_rule == 't2' and t2 is None:
+        raise ValueError("tax_rule='t2' 需要提供 t2")
+    subsidy_fn = SUBSIDY_RULES[subsidy_rule] if isinstance(subsidy_rule, str) else subsidy_rule
+
+    years = np.maximum(np.asarray(years, dtype=int), 0)
+    horizon = int(years.max()) if years.size else 0
+    year_index = np.arange(horizon)
+    active = year_index < years[..., None]
+
+    # 逐年工资与缴费额
+    salaries = np.asarray(salary, dtype=float)[..., None] * growth_factors(wage_growth, horizon)
+    contributions = np.asarray(contribution, dtype=float)[..., None]
+    if annual_cap is not None:
+        contributions = np.minimum(contributions, annual_cap)
+    if salary_cap_ratio is not None:
+        contributions = np.minimum(contributions, salaries * salary_cap_ratio)
+
+    # 补贴与节税
+    subsidies = subsidy_fn(salaries, contributions)
+    if tax_rule == 't2':
+        tax_savings = contributions * np.asarray(t2, dtype=float)[..., None]
+    else:
+        tax_savings = contributions * marginal_tax_rates(salaries)
+
+    # 超出各自缴费年限的年份不计现金流
+    contributions = np.where(active, contributions, 0.0)
+    subsidies = np.where(active, subsidies, 0.0)
+    tax_savings = np.where(active, tax_savings, 0.0)
+    shape = np.broadcast_shapes(contributions.shape, subsidies.shape, tax_savings.shape)
+    contributions = np.broadcast_to(contributions, shape)
+
+    # 账户余额：B_k = B_{k-1} × (1 + r) + C_k（一阶递推，lfilter 与逐年循环逐位一致）
+    balances = lfilter([1.0], [1.0, -(1 + return_rate)], contributions, axis=-1)
+    if horizon:
+        last = np.broadcast_to(np.maximum(years - 1, 0)[..., None], shape[:-1] + (1,))
+        final_balance = np.where(years > 0, np.take_along_axis(balances, last, axis=-1)[..., 0], 0.0)
+    else:
+        final_balance = np.zeros(shape[:-1])
+
+    # 领取期：等额领取，T3税负按领取年份贴现
+    annual_withdrawal = final_balance / withdrawal_years
+    annual_t3_tax = annual_withdrawal * np.asarray(t3, dtype=float)
+    withdrawal_annuity = ((1 + discount_rate) ** -years) * \
+        ((1 + discount_rate) ** -np.arange(withdrawal_years, dtype=float)).sum()
+
+    discount = (1 + discount_rate) ** -year_index.astype(float)
+    return NPVComponents(
+        salaries=salaries,
+        contributions=contributions,
+        subsidies=subsidies,
+        tax_savings=tax_savings,
+        balances=balances,
+        final_balance=final_balance,
+        annual_withdrawal=annual_withdrawal,
+        annual_t3_tax=annual_t3_tax,
+        withdrawal_annuity=withdrawal_annuity,
+        subsidy_pv=subsidies @ discount,
+        tax_save_pv=tax_savings @ discount,
+        t3_tax_pv=annual_t3_tax * withdrawal_annuity
+    )
+
+
+if __name__ == '__main__':
+    import time
+
+    # 单个用户：与 calculate_npv 示例相同
+    single = npv_kernel(150000, 9500, 30, 0.012, 0.014, wage_growth=0.039)
+    print(f"单个用户 NPV: ¥{float(single.npv):,.2f}（补贴 ¥{float(single.subsidy_pv):,.2f}，"
+          f"节税 ¥{float(single.tax_save_pv):,.2f}，T3 ¥{float(single.t3_tax_pv):,.2f}）")
+
+    # 人群 × 缴费额网格
+    rng = np.random.default_rng(42)
+    n = 20_000
+    salaries = rng.lognormal(np.log(80000), 0.6, n)[:, None]
+    ages = rng.integers(22, 60, n)[:, None]
+    levels = np.arange(1000, 12001, 1000)
+    start = time.perf_counter()
+    grid = npv_kernel(salaries, levels, 60 - ages, 0.02, subsidy_rule='tiered', tax_rule='marginal',
+                      wage_growth=0.035, annual_cap=12000, salary_cap_ratio=0.12)
+    elapsed = time.perf_counter() - start
+    best = levels[grid.npv.argmax(axis=1)]
+    print(f"{n:,} 人 × {levels.size} 档缴费额: {elapsed:.2f}s，NPV最优缴费额中位数 ¥{np.median(best):,.0f}")
@@ -0,0 +1,302 @@
+"""
+组合报告：一次请求生成 Path A / Path B 报告页的全部版块
+
+Path A 报告页原本依次调用 predict-wage-growth、optimize-contribution、
+5tier-suggestions、lifecycle-data、comparison-scenarios、risk-assessment；
+Path B 依次调用 diagnose-history、ai-suggestions，并另行计算累计T2与5档方案。
+每个端点都重新计算 T2 / T3 / 上限 / 补贴。这里在一个请求级计算上下文（calc_context）
+中按顺序生成各版块，重复的计算直接命中缓存；iter_* 逐个产出版块，便于流式返回。
+"""
+
+import sys
+import os
+import time
+from typing import Dict, Any, Iterator, Tuple
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.calc_context import calculation_context
+from api.metrics import stage_timer
+from api.wage_growth_prediction import predict_wage_growth, predict_wage_growth_async
+from api.fixed_point_solver import solve_consistent_profile, STATUTORY_CONTRIBUTION
+from api.profile_index import lookup_profile
+from api.contribution_optimizer import optimize_contribution
+from api.subsidy_calculator import calculate_subsidy, get_subsidy_tier_info
+from api.contribution_suggestions import generate_5tier_suggestions
+from api.lifecycle_visualization import generate_lifecycle_data, generate_comparison_scenarios
+from api.risk_monitoring import assess_t3_risk
+from api.history_diagnosis import diagnose_history
+from api.ai_diagnosis import generate_ai_suggestions
+from api.accumulated_t2_calculator import calculate_accumulated_t2
+
+
+PATH_A_SECTIONS = ('wageGrowth', 'optimization', 'fiveTier', 'lifecycle', 'comparison', 'risk')
+PATH_B_SECTIONS = ('diagnosis', 'aiSuggestions', 'accumulatedT2', 'fiveTier')
+
+
+def wage_growth_report(age, annual_salary, industry, job_level) -> Dict[str, Any]:
+    """工资增长率预测（predict-wage-growth 的响应格式）"""
+    result = predict_wage_growth(
+        age=age,
+        annual_salary=annual_salary,
+        industry=industry,
+        job_level=job_level
+    )
+    return _format_wage_growth(result)
+
+
+async def wage_growth_report_async(age, annual_salary, industry, job_level) -> Dict[str, Any]:
+    """wage_growth_report 的异步版本（ASGI 模式下等待上游模型时不占线程）"""
+    result = await predict_wage_growth_async(
+        age=age,
+        annual_salary=annual_salary,
+        industry=industry,
+        job_level=job_level
+    )
+    return _format_wage_growth(result)
+
+
+def _format_wage_growth(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'predicted_growth_rate': result['predictedGrowth'],
+        'confidence': result['confidence'],
+        'industry_average': result['industryAverage'],
+        'methodology': result['methodology'],
+        'factors': {
+            'base_growth': result['baseGrowth'],
+            'ai_adjusted_growth': result['aiAdjustedGrowth'],
+            'web_search_growth': result['webSearchGrowth']
+        },
+        'ai_insights': result['aiInsights'],
+        'web_sources': result['webSources'],
+        'details': result['details']
+    }
+
+
+def optimization_report(age, annual_salary, wage_growth_rate,
+                        endpoint: str = 'optimize-contribution') -> Dict[str, Any]:
+    """
+    推荐缴费方案（optimize-contribution 的响应格式）
+
+    T2 / 上限 / T3 由不动点求解器自洽求得，调用优化器后为每个方案补充精准补贴；
+    返回的 't3' 为小数形式（0.0021 表示 0.21%），'consistentProfile' 含自洽缴费额、上限与收敛诊断。
+    """
+    if age < 18 or age >= 60:
+        raise ValueError("年龄必须在18-59之间")
+    if annual_salary <= 0:
+        raise ValueError("年薪必须大于0")
+    if wage_growth_rate < 0:
+        raise ValueError("工资增长率不能为负")
+
+    # 1-2. 自洽求解 T2 / 上限 / T3（意愿缴费为现行上限¥12,000，受个性化上限约束）
+    #      年薪、年龄在预计算画像索引域内时直接查表（含候选缴费额表），否则实时计算
+    with stage_timer(endpoint, 'profile_lookup'):
+        indexed = lookup_profile(annual_salary, age)
+    if indexed is not None:
+        profile = indexed['profile']
+        table = indexed['table']
+    else:
+        with stage_timer(endpoint, 'fixed_point'):
+            profile = solve_consistent_profile(annual_salary, STATUTORY_CONTRIBUTION, age)
+        table = None
+    t2 = profile['t2']
+    # T3 为百分比数值（例如0.21表示0.21%），转换为小数形式（0.0021）以便前端使用
+    t3 = profile['t3'] / 100.0
+
+    # 3. 调用优化函数获取多方案
+    with stage_timer(endpoint, 'optimizer'):
+        optimization_result = optimize_contribution(
+            age=age,
+            annual_salary=annual_salary,
+            t2=t2,
+            t3=t3,
+            wage_growth_rate=wage_growth_rate,
+            table=table
+        )
+
+    # 4. 为每个方案添加T2和精准补贴计算
+    with stage_timer(endpoint, 'subsidy_enrichment'):
+        for scenario in optimization_result['scenarios']:
+            scenario['predictedT2'] = t2
+
+            # 计算精准补贴
+            subsidy_result = calculate_subsidy(
+                annual_salary=annual_salary,
+                contribution_amount=scenario['contribution']
+            )
+            scenario['subsidy'] = subsidy_result['subsidy']
+            scenario['subsidyRatio'] = subsidy_result['ratio']
+            scenario['subsidyTriggered'] = subsidy_result['triggered']
+            scenario['subsidyBreakdown'] = subsidy_result['breakdown']
+
+        # 5. 添加全局T2、T3和补贴档位信息到结果中
+        optimization_result['t2'] = t2
+        optimization_result['t3'] = t3
+        optimization_result['consistentProfile'] = profile
+        optimization_result['subsidyTierInfo'] = get_subsidy_tier_info(annual_salary)
+
+    return optimization_result
+
+
+def iter_path_a_report(data: Dict[str, Any], memoize: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    按 PATH_A_SECTIONS 顺序逐个生成 Path A 报告版块，最后产出 'meta'
+
+    参数:
+    - age, annualSalary: 必填
+    - wageGrowthRate: 工资增长率（%）；未提供时由 industry + jobLevel 预测
+    - currentContribution: 可选，5档方案的当前缴费
+    - contributionAmount: 可选，生命周期/风险版块使用的缴费额（默认推荐缴费额）
+
+    memoize=False 时各版块独立计算（只统计冗余调用，用于对照）
+
+    产出:
+        (section, payload)；'meta' 含 elapsedSeconds 与计算上下文统计 instrumentation
+    """
+    started = time.perf_counter()
+    age = data['age']
+    salary = data['annualSalary']
+    endpoint = 'path-a-report'
+
+    with calculation_context(memoize=memoize) as ctx:
+        if 'wageGrowthRate' in data:
+            growth_rate = data['wageGrowthRate']
+            yield 'wageGrowth', {'predicted_growth_rate': growth_rate, 'source': 'input'}
+        else:
+            with stage_timer(endpoint, 'wage_growth'):
+                growth = wage_growth_report(age, salary, data['industry'], data['jobLevel'])
+            growth_rate = growth['predicted_growth_rate']
+            yield 'wageGrowth', growth
+
+        optimization = optimization_report(age, salary, growth_rate, endpoint=endpoint)
+        yield 'optimization', optimization
+
+        with stage_timer(endpoint, 'five_tier'):
+            five_tier = generate_5tier_suggestions(
+                current_salary=salary,
+                current_age=age,
+                current_contribution=data.get('currentContribution'),
+                wage_growth_rate=growth_rate
+            )
+        yield 'fiveTier', five_tier
+
+        # 生命周期/对比/风险版块使用百分比形式的 T3
+        lifecycle_params = {
+            'age': age,
+            'annualSalary': salary,
+            'contributionAmount': data.get('contributionAmount', optimization['recommendedAmount']),
+            't2': optimization['t2'],
+            't3': optimization['t3'] * 100.0,
+            'wageGrowthRate': growth_rate
+        }
+        with stage_timer(endpoint, 'lifecycle'):
+            lifecycle = generate_lifecycle_data(dict(lifecycle_params))
+        yield 'lifecycle', lifecycle
+
+        with stage_timer(endpoint, 'comparison'):
+            comparison = generate_comparison_scenarios(dict(lifecycle_params))
+        yield 'comparison', comparison
+
+        with stage_timer(endpoint, 'risk'):
+            risk = assess_t3_risk(dict(lifecycle_params))
+        yield 'risk', risk
+
+        yield 'meta', {
+            'sections': list(PATH_A_SECTIONS),
+            'elapsedSeconds': round(time.perf_counter() - started, 4),
+            'instrumentation': ctx.stats()
+        }
+
+
+def build_path_a_report(data: Dict[str, Any], memoize: bool = True) -> Dict[str, Any]:
+    """一次性生成完整 Path A 报告"""
+    report = {'success': True}
+    report.update(iter_path_a_report(data, memoize=memoize))
+    return report
+
+
+def iter_path_b_report(data: Dict[str, Any], memoize: bool = True) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    按 PATH_B_SECTIONS 顺序逐个生成 Path B 报告版块，最后产出 'meta'
+
+    参数:
+    - historyData: 历史缴费记录 [{"year", "salary", "contribution"}, ...]
+    - age: 当前年龄
+    - discountRate: 可选，累计T2贴现率（默认1.75%）
+    - wageGrowthRate: 可选，5档方案的工资增长率（%，默认3.5）
+    - currentContribution: 可选，5档方案的当前缴费（默认最近一年缴费）
+
+    诊断结果直接传给AI建议（等同 ai-suggestions 的 diagnosisResult 用法），
+    上限与补贴的重复计算在计算上下文中共享。
+    """
+    started = time.perf_counter()
+    history = data['historyData']
+    age = data['age']
+    latest = max(history, key=lambda r: r['year'])
+    endpoint = 'path-b-report'
+
+    with calculation_context(memoize=memoize) as ctx:
+        with stage_timer(endpoint, 'diagnosis'):
+            diagnosis = diagnose_history(history_data=history, age=age)
+        yield 'diagnosis', diagnosis
+
+        with stage_timer(endpoint, 'ai_suggestions'):
+            suggestions = generate_ai_suggestions(diagnosis_result=diagnosis, current_age=age)
+        yield 'aiSuggestions', suggestions
+
+        with stage_timer(endpoint, 'accumulated_t2'):
+            accumulated = calculate_accumulated_t2(
+                history_records=history,
+                discount_rate=data.get('discountRate', 0.0175)
+            )
+        yield 'accumulatedT2', accumulated
+
+        with stage_timer(endpoint, 'five_tier'):
+            five_tier = generate_5tier_suggestions(
+                current_salary=latest['salary'],
+                current_age=age,
+                current_contribution=data.get('currentContribution', latest['contribution']),
+                wage_growth_rate=data.get('wageGrowthRate', 3.5)
+            )
+        yield 'fiveTier', five_tier
+
+        yield 'meta', {
+            'sections': list(PATH_B_SECTIONS),
+            'elapsedSeconds': round(time.perf_counter() - started, 4),
+            'instrumentation': ctx.stats()
+        }
+
+
+def build_path_b_report(data: Dict[str, Any], memoize: bool = True) -> Dict[str, Any]:
+    """一次性生成完整 Path B 报告"""
+    report = {'success': True}
+    report.update(iter_path_b_report(data, memoize=memoize))
+    return report
+
+
+def _print_instrumentation(label: str, report: Dict[str, Any]):
+    stats = report['meta']['instrumentation']
+    print(f"{label}: 耗时 {report['meta']['elapsedSeconds']}s，"
+          f"调用 {stats['totalCalls']} 次，实际计算 {stats['totalComputed']} 次，"
+          f"冗余计算 {stats['redundantComputations']} 次")
+    for name, item in stats['functions'].items():
+        print(f"    {name:<48} calls={item['calls']:<4} computed={item['computed']:<4} redundant={item['redundant']}")
+
+
+if __name__ == '__main__':
+    path_a = {'age': 30, 'annualSalary': 150000, 'industry': 'it', 'jobLevel': 'intermediate'}
+    path_b = {
+        'historyData': [
+            {'year': 2022, 'salary': 120000, 'contribution': 8000},
+            {'year': 2023, 'salary': 135000, 'contribution': 10000},
+            {'year': 2024, 'salary': 150000, 'contribution': 12000}
+        ],
+        'age': 35
+    }
+
+    for title, build, params in (('Path A', build_path_a_report, path_a), ('Path B', build_path_b_report, path_b)):
+        print(f"\n===== {title} =====")
+        _print_instrumentation('逐版块计算', build(params, memoize=False))
+        _print_instrumentation('共享上下文', build(params, memoize=True))
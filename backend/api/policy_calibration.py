@@ -0,0 +1,408 @@
+"""
+政策参数自动校准
+
+在蒙特卡洛人群上用 scipy.optimize 联合拟合三组政策参数：
+- t3:      双逻辑 T3 参数（L1, L2, L3, T2_mid, w_high, k1, k2）
+- cap:     混合动态上限的平滑节点与高收入递减（公式5-5）
+- subsidy: SubsidyParams 三段式补贴参数
+
+校准目标：
+- 财政中性：全生命周期 T3 税收现值 ≈ 补贴 + 节税支出现值（目标比率可调）
+- 覆盖率：获得补贴的人口比例达到目标
+
+目标函数在个体维度上向量化并分块计算；人群使用固定随机种子（公共随机数），
+同一参数向量的评估结果被缓存。结果写入 backend/params/ 下的版本化参数文件，
+policy_registry 将其注册为命名参数集（calibrated-vNNN），可热切换或按请求选用。
+"""
+
+import sys
+import os
+import json
+import time
+import hashlib
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence
+
+import numpy as np
+from scipy import optimize
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.t2_calculator import calculate_t2_array
+from api.policy_utils import CALIBRATED_PARAMS_DIR, latest_calibrated_params_path, calculate_t3_array
+from api.cap_calculator import calculate_cap_array
+from api.subsidy_calculator import subsidy_kernel
+from api.policy_registry import current_parameter_set
+from api.policy_whatif import (
+    DEFAULT_MEDIAN_INCOME, DEFAULT_INCOME_SIGMA, INCOME_FLOOR, INCOME_CEILING,
+    CONTRIBUTION_RATES, CONTRIBUTION_SHARES
+)
+
+
+RETIREMENT_AGE = 60
+WITHDRAWAL_YEARS = 20
+ACCOUNT_RETURN_RATE = 0.0175   # 账户收益率 1.75%
+DISCOUNT_RATE = 0.03           # 政府贴现率 3%（与 fiscal_neutral_npv 一致）
+AGE_RANGE = (25, 55)           # 模拟人群年龄范围（含）
+
+DEFAULT_POPULATION_SIZE = 200000
+CHUNK_SIZE = 250000
+DEFAULT_TARGETS = {
+    'fiscalBalanceRatio': 0.0,   # (T3税收现值 - 支出现值) / 支出现值
+    'coverage': 0.60             # 获得补贴的人口比例
+}
+DEFAULT_WEIGHTS = {
+    'fiscalBalanceRatio': 1.0,
+    'coverage': 1.0,
+    'regularization': 0.01       # 偏离初始参数的惩罚（归一化空间）
+}
+
+# (参数名, 下界, 上界)；初始值取现行默认参数
+PARAMETER_BOUNDS = {
+    't3': [
+        ('L1', 0.0, 0.03),
+        ('L2', 0.02, 0.20),
+        ('L3', 0.0, 0.10),
+        ('T2_mid', 0.03, 0.20),
+        ('w_high', 150000.0, 600000.0),
+        ('k1', 5.0, 60.0),
+        ('k2', 5.0, 60.0)
+    ],
+    'cap': [
+        ('node_1', 8000.0, 20000.0),
+        ('node_2', 12000.0, 40000.0),
+        ('node_3', 24000.0, 72000.0),
+        ('node_4', 36000.0, 100000.0),
+        ('tau_min', 0.2, 1.0),
+        ('w0_pivot', 100000.0, 400000.0)
+    ],
+    'subsidy': [
+        ('base_grant', 0.0, 400.0),
+        ('c_bar_1', 500.0, 4000.0),
+        ('c_bar_2', 3000.0, 12000.0),
+        ('alpha_1', 0.10, 0.80),
+        ('alpha_2', 0.05, 0.60),
+        ('alpha_3', 0.0, 0.20),
+        ('taper_w_low', 20000.0, 80000.0),
+        ('taper_w_high', 60000.0, 200000.0)
+    ]
+}
+
+
+def default_policy_params() -> Dict[str, Dict[str, float]]:
+    """当前参数集（校准初始点）；上限节点展开为 node_1..node_4 便于逐个优化"""
+    param_set = current_parameter_set()
+    cap = param_set.cap
+    return {
+        't3': {name: float(param_set.t3[name]) for name, _, _ in PARAMETER_BOUNDS['t3']},
+        'cap': {
+            **{f'node_{i + 1}': float(node) for i, node in enumerate(cap['nodes'])},
+            'tau_min': float(cap['tau_min']),
+            'w0_pivot': float(cap['w0_pivot'])
+        },
+        'subsidy': {
+            name: float(param_set.subsidy[name])
+            for name in ['c_min'] + [spec[0] for spec in PARAMETER_BOUNDS['subsidy']]
+        }
+    }
+
+
+def export_policy_params(params: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, Any]]:
+    """校准结果 → 注册表参数文件格式（上限节点合并为 nodes）"""
+    cap = params['cap']
+    return {
+        't3': dict(params['t3']),
+        'cap': {
+            'nodes': [cap[f'node_{i}'] for i in range(1, 5)],
+            'tau_min': cap['tau_min'],
+            'w0_pivot': cap['w0_pivot']
+        },
+        'subsidy': dict(params['subsidy'])
+    }
+
+
+def _annuity_factors(ages: np.ndarray):
+    """按年龄计算缴费期年金现值系数、账户终值系数、领取期年金现值系数（闭式解）"""
+    n = np.maximum(RETIREMENT_AGE - ages, 0).astype(float)
+    d = 1.0 / (1.0 + DISCOUNT_RATE)
+    r = ACCOUNT_RETURN_RATE
+    contribution_annuity = (1.0 - d ** n) / (1.0 - d)
+    accumulation = ((1.0 + r) ** n - 1.0) / r
+    withdrawal_annuity = d ** n * (1.0 - d ** WITHDRAWAL_YEARS) / (1.0 - d)
+    return contribution_annuity, accumulation, withdrawal_annuity
+
+
+class PolicyCalibrator:
+    """
+    蒙特卡洛政策校准器
+
+    人群在构造时一次生成（固定种子），目标函数对同一参数向量只计算一次。
+    """
+
+    def __init__(
+        self,
+        groups: Sequence[str] = ('t3', 'cap', 'subsidy'),
+        population_size: int = DEFAULT_POPULATION_SIZE,
+        targets: Dict[str, float] = None,
+        weights: Dict[str, float] = None,
+        initial: Dict[str, Dict[str, float]] = None,
+        seed: int = 42,
+        chunk_size: int = CHUNK_SIZE
+    ):
+        unknown = set(groups) - set(PARAMETER_BOUNDS)
+        if unknown:
+            raise ValueError(f'未知参数组: {", ".join(sorted(unknown))}')
+
+        self.groups = tuple(groups)
+        self.targets = {**DEFAULT_TARGETS, **(targets or {})}
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.base_params = default_policy_params()
+        for group, values in (initial or {}).items():
+            self.base_params[group].update(values)
+        self.chunk_size = int(chunk_size)
+        self.seed = seed
+
+        self._specs = [
+            (group, name, lower, upper)
+            for group in self.groups
+            for name, lower, upper in PARAMETER_BOUNDS[group]
+        ]
+        self._lower = np.array([spec[2] for spec in self._specs])
+        self._upper = np.array([spec[3] for spec in self._specs])
+        x0 = np.array([self.base_params[group][name] for group, name, _, _ in self._specs])
+        self.x0 = np.clip((x0 - self._lower) / (self._upper - self._lower), 0.0, 1.0)
+
+        self._cache: Dict[bytes, Dict[str, float]] = {}
+        self.cache_hits = 0
+        self.history: List[Dict[str, float]] = []
+
+        self._build_population(int(population_size))
+
+    def _build_population(self, size: int):
+        """生成对数正态收入 × 缴费行为 × 年龄的模拟人群，并预计算年金系数"""
+        rng = np.random.default_rng(self.seed)
+        incomes = rng.lognormal(mean=np.log(DEFAULT_MEDIAN_INCOME), sigma=DEFAULT_INCOME_SIGMA, size=size)
+        self.incomes = np.clip(incomes, INCOME_FLOOR, INCOME_CEILING)
+        rates = rng.choice(CONTRIBUTION_RATES, size=size, p=CONTRIBUTION_SHARES)
+        self.desired_contributions = self.incomes * rates
+        self.ages = rng.integers(AGE_RANGE[0], AGE_RANGE[1] + 1, size=size)
+        self.contribution_annuity, self.accumulation, self.withdrawal_annuity = _annuity_factors(self.ages)
+        # 上限使用的T2按意愿缴费估计（与 chapter6_simulation 一致），与被校准参数无关
+        self.t2_estimate, _ = calculate_t2_array(self.incomes, self.desired_contributions)
+
+    def decode(self, x: np.ndarray) -> Dict[str, Dict[str, float]]:
+        """归一化向量 → 分组参数（并修复节点单调、区间端点次序）"""
+        values = self._lower + np.clip(x, 0.0, 1.0) * (self._upper - self._lower)
+        params = {group: dict(self.base_params[group]) for group in self.base_params}
+        for (group, name, _, _), value in zip(self._specs, values):
+            params[group][name] = float(value)
+
+        cap = params['cap']
+        nodes = np.maximum.accumulate([cap['node_1'], cap['node_2'], cap['node_3'], cap['node_4']])
+        cap.update({f'node_{i + 1}': float(v) for i, v in enumerate(nodes)})
+
+        subsidy = params['subsidy']
+        subsidy['c_bar_2'] = max(subsidy['c_bar_2'], subsidy['c_bar_1'])
+        subsidy['taper_w_high'] = max(subsidy['taper_w_high'], subsidy['taper_w_low'] + 1000.0)
+        return params
+
+    def simulate(self, params: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+        """在人群上分块计算财政与覆盖指标"""
+        cap, subsidy_params = params['cap'], params['subsidy']
+        nodes = (cap['node_1'], cap['node_2'], cap['node_3'], cap['node_4'])
+
+        totals = np.zeros(5)   # 支出现值, 税收现值, 覆盖人数, 正NPV人数, 缴费总额
+        for start in range(0, self.incomes.size, self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            w = self.incomes[chunk]
+
+            cap_value = calculate_cap_array(
+                w, self.t2_estimate[chunk], nodes=nodes,
+                tau_min=cap['tau_min'], w0_pivot=cap['w0_pivot']
+            )
+            contribution = np.minimum(self.desired_contributions[chunk], cap_value)
+            t2, tax_saving = calculate_t2_array(w, contribution)
+            t3 = calculate_t3_array(t2, w, self.ages[chunk], params['t3'])
+            subsidy = subsidy_kernel(
+                w, contribution,
+                subsidy_params['base_grant'], subsidy_params['c_min'],
+                subsidy_params['c_bar_1'], subsidy_params['c_bar_2'],
+                subsidy_params['alpha_1'], subsidy_params['alpha_2'], subsidy_params['alpha_3'],
+                subsidy_params['taper_w_low'], subsidy_params['taper_w_high']
+            )['subsidy']
+
+            outlay_pv = (subsidy + tax_saving) * self.contribution_annuity[chunk]
+            balance = (contribution + subsidy) * self.accumulation[chunk]
+            revenue_pv = balance / WITHDRAWAL_YEARS * (t3 / 100.0) * self.withdrawal_annuity[chunk]
+
+            totals += (
+                outlay_pv.sum(),
+                revenue_pv.sum(),
+                np.count_nonzero(subsidy > 0),
+                np.count_nonzero(outlay_pv > revenue_pv),
+                contribution.sum()
+            )
+
+        outlay, revenue, covered, positive, contributions = totals
+        n = self.incomes.size
+        return {
+            'outlayPV': outlay,
+            'revenuePV': revenue,
+            'fiscalBalanceRatio': (revenue - outlay) / outlay if outlay > 0 else 0.0,
+            'coverage': covered / n,
+            'positiveNpvShare': positive / n,
+            'meanContribution': contributions / n
+        }
+
+    def objective(self, x: np.ndarray) -> float:
+        """加权平方偏差目标（带缓存）"""
+        key = np.round(np.asarray(x, dtype=float), 8).tobytes()
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached['loss']
+
+        metrics = self.simulate(self.decode(x))
+        loss = (
+            self.weights['fiscalBalanceRatio'] * (metrics['fiscalBalanceRatio'] - self.targets['fiscalBalanceRatio']) ** 2
+            + self.weights['coverage'] * (metrics['coverage'] - self.targets['coverage']) ** 2
+            + self.weights['regularization'] * float(np.mean((np.asarray(x) - self.x0) ** 2))
+        )
+        metrics['loss'] = loss
+        self._cache[key] = metrics
+        self.history.append(metrics)
+        return loss
+
+    def calibrate(self, method: str = 'Powell', max_evaluations: int = 400) -> Dict[str, Any]:
+        """
+        运行校准
+
+        参数:
+            method: 'Powell'（默认，有界无导数）、'L-BFGS-B' 或 'differential_evolution'
+            max_evaluations: 目标函数评估次数上限（近似）
+
+        返回:
+            {'params', 'metrics', 'initialMetrics', 'optimizer'}
+        """
+        start_time = time.perf_counter()
+        bounds = [(0.0, 1.0)] * self.x0.size
+        self.objective(self.x0)
+        initial_metrics = dict(self._cache[np.round(self.x0, 8).tobytes()])
+
+        if method == 'differential_evolution':
+            popsize = 8
+            result = optimize.differential_evolution(
+                self.objective, bounds, x0=self.x0, seed=self.seed, popsize=popsize, polish=False,
+                maxiter=max(1, max_evaluations // (popsize * self.x0.size)), tol=1e-6
+            )
+        elif method == 'L-BFGS-B':
+            result = optimize.minimize(
+                self.objective, self.x0, method='L-BFGS-B', bounds=bounds,
+                options={'maxfun': max_evaluations, 'eps': 1e-3}
+            )
+        else:
+            result = optimize.minimize(
+                self.objective, self.x0, method='Powell', bounds=bounds,
+                options={'maxfev': max_evaluations, 'xtol': 1e-3, 'ftol': 1e-8}
+            )
+
+        best_x = np.clip(result.x, 0.0, 1.0)
+        self.objective(best_x)
+        metrics = dict(self._cache[np.round(best_x, 8).tobytes()])
+
+        return {
+            'params': export_policy_params(self.decode(best_x)),
+            'metrics': metrics,
+            'initialMetrics': initial_metrics,
+            'optimizer': {
+                'method': method,
+                'success': bool(result.success),
+                'message': str(result.message),
+                'evaluations': len(self._cache),
+                'cacheHits': self.cache_hits,
+                'elapsedSeconds': round(time.perf_counter() - start_time, 3)
+            },
+            'population': {
+                'size': int(self.incomes.size),
+                'seed': self.seed,
+                'groups': list(self.groups)
+            },
+            'targets': self.targets
+        }
+
+
+def write_parameter_file(calibration: Dict[str, Any], directory: Optional[str] = None) -> str:
+    """
+    写入版本化参数文件 policy_params_v{N}.json（N 自动递增，原子替换写入）
+
+    返回:
+        文件路径
+    """
+    directory = directory or CALIBRATED_PARAMS_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    latest = latest_calibrated_params_path(directory)
+    version = 1
+    if latest:
+        version = int(os.path.basename(latest)[len('policy_params_v'):-len('.json')]) + 1
+
+    sections = {group: calibration['params'][group] for group in ('t3', 'cap', 'subsidy')}
+    digest = hashlib.sha256(json.dumps(sections, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    document = {
+        'version': version,
+        'hash': digest,
+        'createdAt': datetime.now().isoformat(timespec='seconds'),
+        'targets': calibration['targets'],
+        'metrics': calibration['metrics'],
+        'initialMetrics': calibration['initialMetrics'],
+        'optimizer': calibration['optimizer'],
+        'population': calibration['population'],
+        **sections
+    }
+
+    path = os.path.join(directory, f'policy_params_v{version:03d}.json')
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_calibration(
+    groups: Sequence[str] = ('t3', 'cap', 'subsidy'),
+    targets: Dict[str, float] = None,
+    population_size: int = DEFAULT_POPULATION_SIZE,
+    method: str = 'Powell',
+    max_evaluations: int = 400,
+    write: bool = False,
+    directory: Optional[str] = None
+) -> Dict[str, Any]:
+    """校准入口：运行优化，可选写出版本化参数文件"""
+    calibrator = PolicyCalibrator(groups=groups, population_size=population_size, targets=targets)
+    calibration = calibrator.calibrate(method=method, max_evaluations=max_evaluations)
+    if write:
+        calibration['path'] = write_parameter_file(calibration, directory)
+    return calibration
+
+
+if __name__ == '__main__':
+    print("=" * 60)
+    print("政策参数自动校准")
+    print("=" * 60)
+
+    # 用法: python api/policy_calibration.py [--write]
+    result = run_calibration(population_size=50000, max_evaluations=300, write='--write' in sys.argv)
+
+    print(f"\n优化器: {result['optimizer']}")
+    for label, key in (('初始', 'initialMetrics'), ('校准后', 'metrics')):
+        m = result[key]
+        print(f"{label}: 财政平衡率={m['fiscalBalanceRatio']:+.3f}, 覆盖率={m['coverage']:.3f}, "
+              f"正NPV比例={m['positiveNpvShare']:.3f}, 目标值={m['loss']:.6f}")
+    for group, values in result['params'].items():
+        print(f"\n[{group}]")
+        for name, value in values.items():
+            print(f"  {name:<14} {value:,.4f}")
+    if 'path' in result:
+        print(f"\n参数文件已写入: {result['path']}")
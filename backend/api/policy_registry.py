@@ -0,0 +1,394 @@
+"""
+政策参数注册表（版本化、可热切换）
+
+把分散在各模块的政策参数集中为命名的参数集（ParameterSet），每个参数集带内容哈希版本号：
+- t3:             双逻辑 T3 参数（policy_utils）
+- cap:            混合动态上限参数（cap_calculator，公式5-5）
+- subsidy:        三段式补贴参数（SubsidyParams）
+- linear_subsidy: 生命周期/财政模块使用的线性补贴 S = α×C + base
+
+参数集来源：
+- 'default': 各模块常量（外部 final/optimal_parameters.json 存在时覆盖 t3）
+- 'calibrated-vNNN': backend/params/ 下 policy_utils 识别的版本化校准文件
+
+活动参数集通过引用替换原子切换，不需要重启进程；单个请求（或代码块）可以用
+use_parameter_set 在 contextvars 中固定某一参数集，从而在同一进程内并行做 A/B 对比。
+
+多进程部署（gunicorn -w N）时，切换/重载只发生在收到请求的进程内。设置 $POLICY_STATE_FILE 后，
+切换与重载写入该共享状态文件，各进程在每个请求开始时 sync() 一次（文件未变化时只是一次 stat），
+从而切换到同一活动版本。backend/gunicorn.conf.py 默认启用该文件，并在主进程启动时清除上次部署的状态。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import contextvars
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cached_property
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Mapping
+
+
+SECTIONS = ('t3', 'cap', 'subsidy', 'linear_subsidy')
+DEFAULT_SET_NAME = 'default'
+STATE_FILE_ENV = 'POLICY_STATE_FILE'
+
+# 生命周期可视化与财政中性模块沿用的线性补贴 S = 0.24×C + 50
+LINEAR_SUBSIDY_DEFAULTS = {'alpha': 0.24, 'base': 50.0}
+
+
+def _freeze(section: Mapping[str, Any]) -> Mapping[str, Any]:
+    """只读化参数分组（列表转为元组）"""
+    return MappingProxyType({
+        key: tuple(value) if isinstance(value, list) else value
+        for key, value in section.items()
+    })
+
+
+@dataclass(frozen=True)
+class ParameterSet:
+    """不可变的命名参数集，version 为各分组内容的哈希"""
+    name: str
+    t3: Mapping[str, Any]
+    cap: Mapping[str, Any]
+    subsidy: Mapping[str, Any]
+    linear_subsidy: Mapping[str, Any]
+    source: str = 'builtin'
+    version: str = field(init=False)
+
+    def __post_init__(self):
+        for section in SECTIONS:
+            object.__setattr__(self, section, _freeze(getattr(self, section)))
+        payload = json.dumps(
+            {section: dict(getattr(self, section)) for section in SECTIONS},
+            sort_keys=True, default=list
+        )
+        object.__setattr__(self, 'version', hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12])
+
+    @property
+    def tag(self) -> str:
+        """响应头中使用的标识：name@version"""
+        return f'{self.name}@{self.version}'
+
+    @cached_property
+    def subsidy_params(self):
+        """对应的 SubsidyParams 实例"""
+        from api.subsidy_calculator import SubsidyParams
+        return SubsidyParams(**self.subsidy)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'version': self.version,
+            'tag': self.tag,
+            'source': self.source,
+            **{section: dict(getattr(self, section)) for section in SECTIONS}
+        }
+
+
+def _normalize_cap(cap: Mapping[str, Any], base: Mapping[str, Any]) -> Dict[str, Any]:
+    """兼容校准文件中 node_1..node_4 的平铺写法"""
+    merged = dict(base)
+    merged.update({k: v for k, v in cap.items() if not k.startswith('node_')})
+    if 'node_1' in cap:
+        merged['nodes'] = tuple(float(cap[f'node_{i}']) for i in range(1, 5))
+    return merged
+
+
+def builtin_parameter_set(name: str = DEFAULT_SET_NAME) -> ParameterSet:
+    """由各模块常量构建默认参数集"""
+    from dataclasses import asdict
+    from api.policy_utils import T3_DEFAULTS, DEFAULT_PARAMS
+    from api.cap_calculator import CAP_DEFAULTS
+    from api.subsidy_calculator import SubsidyParams
+
+    t3 = dict(T3_DEFAULTS)
+    t3.update(DEFAULT_PARAMS)
+    return ParameterSet(
+        name=name,
+        t3=t3,
+        cap=dict(CAP_DEFAULTS),
+        subsidy=asdict(SubsidyParams()),
+        linear_subsidy=dict(LINEAR_SUBSIDY_DEFAULTS),
+        source='builtin'
+    )
+
+
+def parameter_set_from_document(document: Mapping[str, Any], name: str, source: str,
+                                base: Optional[ParameterSet] = None) -> ParameterSet:
+    """由参数文件内容构建参数集，缺失的分组/字段取 base"""
+    base = base or builtin_parameter_set()
+    return ParameterSet(
+        name=name,
+        t3={**base.t3, **document.get('t3', {})},
+        cap=_normalize_cap(document.get('cap', {}), base.cap),
+        subsidy={**base.subsidy, **document.get('subsidy', {})},
+        linear_subsidy={**base.linear_subsidy, **document.get('linear_subsidy', {})},
+        source=source
+    )
+
+
+class PolicyRegistry:
+    """
+    参数集注册表
+
+    读取路径无锁：_sets 与 _active 均为整体替换的引用（写时复制），
+    写操作（注册、切换、重载）在锁内完成。
+
+    state_file 为多进程共享的活动版本文件：activate / publish 写入，sync 读取。
+    """
+
+    def __init__(self, state_file: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._sets: Dict[str, ParameterSet] = {}
+        self._active: Optional[ParameterSet] = None
+        self._files: Dict[str, tuple] = {}   # path -> (mtime, name)
+        self.state_file = os.path.abspath(state_file) if state_file else None
+        self._state_stamp = None              # 最近一次写入/读取的状态文件 (mtime_ns, size)
+
+    def register(self, param_set: ParameterSet, activate: bool = False) -> ParameterSet:
+        with self._lock:
+            sets = dict(self._sets)
+            previous = sets.get(param_set.name)
+            sets[param_set.name] = param_set
+            self._sets = sets
+            if activate or self._active is None or self._active is previous:
+                self._active = param_set
+        return param_set
+
+    def resolve(self, key: str) -> ParameterSet:
+        """按名称、版本哈希或 name@version 查找参数集"""
+        sets = self._sets
+        name, _, version = str(key).partition('@')
+        if name in sets and (not version or sets[name].version == version):
+            return sets[name]
+        for param_set in sets.values():
+            if param_set.version == key:
+                return param_set
+        raise KeyError(f'未知的政策参数版本: {key}')
+
+    def activate(self, key: str, publish: bool = True) -> ParameterSet:
+        """切换活动参数集；publish 时写入共享状态文件，其他进程在下一个请求时跟随"""
+        param_set = self.resolve(key)
+        with self._lock:
+            self._active = param_set
+        if publish:
+            self.publish()
+        return param_set
+
+    @property
+    def shared(self) -> bool:
+        """切换是否经共享状态文件传播到其他进程"""
+        return self.state_file is not None
+
+    def _stat_state(self):
+        try:
+            st = os.stat(self.state_file)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def publish(self) -> None:
+        """把当前活动版本写入共享状态文件（原子替换）"""
+        if not self.shared:
+            return
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp_path = f'{self.state_file}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'active': self._active.tag, 'pid': os.getpid(), 'updatedAt': time.time()}, f)
+        os.replace(tmp_path, self.state_file)
+        with self._lock:
+            self._state_stamp = self._stat_state()
+
+    def sync(self) -> bool:
+        """
+        跟随共享状态文件：文件变化时先重载参数文件（其他进程可能重载/新增了校准文件），
+        再切换到文件记录的活动版本。返回是否读取了新状态
+        """
+        if not self.shared:
+            return False
+        stamp = self._stat_state()
+        if stamp is None or stamp == self._state_stamp:
+            return False
+        with self._lock:
+            if stamp == self._state_stamp:
+                return False
+            self._state_stamp = stamp
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                tag = json.load(f)['active']
+        except (OSError, ValueError, KeyError):
+            return False
+        self.reload()
+        try:
+            self.activate(tag, publish=False)
+        except KeyError:
+            # 版本哈希对不上（文件已再次修改）时按名称跟随
+            self.activate(tag.partition('@')[0], publish=False)
+        return True
+
+    def active(self) -> ParameterSet:
+        return self._active
+
+    def list(self) -> List[Dict[str, Any]]:
+        active = self._active
+        return [
+            {
+                'name': s.name,
+                'version': s.version,
+                'tag': s.tag,
+                'source': s.source,
+                'active': s is active
+            }
+            for s in self._sets.values()
+        ]
+
+    def load_file(self, path: str, name: Optional[str] = None, activate: bool = False) -> ParameterSet:
+        """加载参数文件并注册（文件名 policy_params_vNNN.json 默认命名为 calibrated-vNNN）"""
+        from api.policy_utils import CALIBRATED_PARAMS_PATTERN
+
+        path = os.path.abspath(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            document = json.load(f)
+        if name is None:
+            match = CALIBRATED_PARAMS_PATTERN.match(os.path.basename(path))
+            name = f'calibrated-v{match.group(1)}' if match else os.path.splitext(os.path.basename(path))[0]
+        base = self._sets.get(DEFAULT_SET_NAME)
+        param_set = self.register(
+            parameter_set_from_document(document, name, source=path, base=base), activate=activate
+        )
+        with self._lock:
+            files = dict(self._files)
+            files[path] = (os.path.getmtime(path), name)
+            self._files = files
+        return param_set
+
+    @staticmethod
+    def _calibrated_files(directory: Optional[str] = None) -> List[str]:
+        """目录下的校准参数文件路径（按版本号升序）"""
+        from api.policy_utils import CALIBRATED_PARAMS_DIR, CALIBRATED_PARAMS_PATTERN
+
+        directory = directory or CALIBRATED_PARAMS_DIR
+        if not os.path.isdir(directory):
+            return []
+        names = sorted(
+            (int(m.group(1)), n) for n in os.listdir(directory)
+            for m in [CALIBRATED_PARAMS_PATTERN.match(n)] if m
+        )
+        return [os.path.abspath(os.path.join(directory, n)) for _, n in names]
+
+    def load_directory(self, directory: Optional[str] = None) -> List[ParameterSet]:
+        """注册目录下全部校准参数文件"""
+        return [self.load_file(path) for path in self._calibrated_files(directory)]
+
+    def reload(self, directory: Optional[str] = None) -> List[str]:
+        """
+        热重载：重新读取已修改的参数文件，并注册目录中新增的文件
+
+        返回:
+            发生变化的参数集名称
+        """
+        changed = []
+        for path, (mtime, name) in list(self._files.items()):
+            if os.path.exists(path) and os.path.getmtime(path) != mtime:
+                changed.append(self.load_file(path, name=name).name)
+        for path in self._calibrated_files(directory):
+            if path not in self._files:
+                changed.append(self.load_file(path).name)
+        return changed
+
+
+_registry: Optional[PolicyRegistry] = None
+_registry_lock = threading.Lock()
+_current: contextvars.ContextVar = contextvars.ContextVar('policy_parameter_set', default=None)
+
+
+def _build_default_registry() -> PolicyRegistry:
+    """
+    初始化注册表：内置默认参数 + 校准文件 + $POLICY_PARAMS_FILE（只注册，不自动切换）
+
+    活动参数集为 default，除非 $POLICY_VERSION 指定其他版本；
+    共享状态文件中已有本次部署切换过的版本时跟随该版本。
+    """
+    registry = PolicyRegistry(state_file=os.getenv(STATE_FILE_ENV) or None)
+    registry.register(builtin_parameter_set(), activate=True)
+    registry.load_directory()
+
+    params_file = os.getenv('POLICY_PARAMS_FILE')
+    if params_file and os.path.exists(params_file):
+        registry.load_file(params_file)
+
+    version = os.getenv('POLICY_VERSION')
+    if version:
+        registry.activate(version, publish=False)
+    registry.sync()
+    return registry
+
+
+def get_registry() -> PolicyRegistry:
+    """进程级注册表（首次调用时初始化）"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = _build_default_registry()
+    return _registry
+
+
+def current_parameter_set() -> ParameterSet:
+    """当前上下文的参数集（请求内固定的版本优先，否则为活动版本）"""
+    param_set = _current.get()
+    return param_set if param_set is not None else get_registry().active()
+
+
+def set_current_parameter_set(param_set: ParameterSet) -> contextvars.Token:
+    """在当前上下文固定参数集，返回用于恢复的 token"""
+    return _current.set(param_set)
+
+
+def reset_current_parameter_set(token: contextvars.Token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def use_parameter_set(key):
+    """
+    在代码块内使用指定参数集（名称、版本哈希或 ParameterSet 实例）
+
+    示例:
+        with use_parameter_set('calibrated-v002'):
+            result_b = calculate_subsidy(60000, 5000)
+    """
+    param_set = key if isinstance(key, ParameterSet) else get_registry().resolve(key)
+    token = _current.set(param_set)
+    try:
+        yield param_set
+    finally:
+        _current.reset(token)
+
+
+if __name__ == '__main__':
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    # 以包路径导入，确保与各计算模块共用同一个注册表与上下文变量
+    from api import policy_registry as pr
+    from api.subsidy_calculator import calculate_subsidy
+
+    registry = pr.get_registry()
+    print("已注册参数集:")
+    for item in registry.list():
+        print(f"  {item['tag']:<32} {'(active)' if item['active'] else ''} {item['source']}")
+
+    # A/B 对比：同一进程内并行使用两组参数
+    default = registry.resolve(pr.DEFAULT_SET_NAME)
+    variant = registry.register(pr.parameter_set_from_document(
+        {'subsidy': {'alpha_1': 0.60, 'c_bar_1': 2000.0}}, 'variant-a', source='inline'
+    ))
+    for param_set in (default, variant):
+        with pr.use_parameter_set(param_set):
+            result = calculate_subsidy(60000, 5000)
+            print(f"{pr.current_parameter_set().tag}: 年薪6万缴费5000 → 补贴 ¥{result['subsidy']}")
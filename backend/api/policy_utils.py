@@ -5,10 +5,52 @@
 输出与原来后端期望一致：返回 dict，字段 't3' 为百分比（例如 7.25 表示 7.25%）。
 """
 import os
-import json
+import re
 import math
+import json
+from dataclasses import dataclass
+
+import numpy as np
+
+from api.policy_registry import current_parameter_set
+from api.calc_context import request_memoized
+
+# 校准子系统（api/policy_calibration.py）输出的版本化参数文件目录
+CALIBRATED_PARAMS_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'params'))
+CALIBRATED_PARAMS_PATTERN = re.compile(r'^policy_params_v(\d+)\.json$')
+
+
+def latest_calibrated_params_path(directory=None):
+    """返回目录中版本号最大的参数文件路径；没有则返回 None"""
+    directory = directory or CALIBRATED_PARAMS_DIR
+    if not os.path.isdir(directory):
+        return None
+    versions = []
+    for name in os.listdir(directory):
+        match = CALIBRATED_PARAMS_PATTERN.match(name)
+        if match:
+            versions.append((int(match.group(1)), name))
+    if not versions:
+        return None
+    return os.path.join(directory, max(versions)[1])
+
+
+# 双逻辑 T3 的默认参数（外部最优参数文件可覆盖）
+T3_DEFAULTS = {
+    'L1': 0.0,
+    'L2': 0.10,
+    'L3': 0.05,
+    'T2_mid': 0.10,
+    'w_high': 300000.0,
+    'k1': 20.0,
+    'k2': 30.0
+}
+
+# 批量计算的元素上限
+MAX_T3_BATCH = 100000
 
-# 尝试加载仓库根目录下的最优参数（如果存在）以驱动默认行为
+# 尝试加载仓库根目录下的最优参数（如果存在）以驱动默认行为；
+# 校准得到的参数文件由 policy_registry 注册为独立的参数集
 DEFAULT_PARAMS = {}
 try:
     root = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..', 'final'))
@@ -20,21 +62,101 @@ except Exception:
     DEFAULT_PARAMS = {}
 
 
-def _compute_t3_decimal(t2, w, params=None):
-    """内部计算，返回小数形式的税率（0-1）。
+def _base_t3_params():
+    """当前生效的 T3 参数（来自政策参数注册表）"""
+    return dict(current_parameter_set().t3)
 
-    t2: 以小数表示的有效缴费期税率或以相容形式的数值（如果 t2 大于1，会视为百分比除以100）。
-    w: 年收入
-    params: 参数字典
+
+@dataclass
+class T3Components:
     """
-    if params is None:
-        params = DEFAULT_PARAMS or {}
+    t3_kernel 的计算结果（百分比口径，未舍入，形状为输入广播后的形状）
 
-    # 允许外部以百分比形式传入 t2（例如 10 表示 10%），如果 t2>1 则除以100
-    t2_val = float(t2)
-    if t2_val > 1.5:
-        t2_val = t2_val / 100.0
+    t3 = max(0, rate - age_discount)，rate 为经 [L1, L1+L2+L3] 与 ≤T2 约束后的双逻辑税率。
+    """
+    t2: np.ndarray                 # 小数形式的T2
+    base_tax: np.ndarray
+    t2_component: np.ndarray
+    income_adjustment: np.ndarray
+    rate: np.ndarray
+    age_discount: np.ndarray
+    t3: np.ndarray
+
+
+def _resolve_t3_params(params=None):
+    """当前参数集的 T3 参数，显式 params 覆盖"""
+    merged_params = _base_t3_params()
+    if isinstance(params, dict):
+        merged_params.update(params)
+    return merged_params
+
+
+def t3_kernel(t2, annual_salary, age=None, params=None, cap_at_t2=True):
+    """双逻辑 T3 数组内核：各分量只计算一次。
+
+    t2 / annual_salary / age 可为标量或数组，按 NumPy 广播规则组合；
+    t2 逐元素判定百分比/小数（t2>1.5 视为百分比）。
+    age ≥ 55 时每距60岁一年扣减 0.02 个百分点。
+    cap_at_t2=False 时不施加 t3 ≤ t2 约束（第六章模拟口径）。
+    """
+    merged_params = _resolve_t3_params(params)
+    L1 = merged_params.get('L1', 0.0)
+    L2 = merged_params.get('L2', 0.10)
+    L3 = merged_params.get('L3', 0.05)
+    T2_mid = merged_params.get('T2_mid', 0.10)
+    w_high = merged_params.get('w_high', 300000.0)
+    k1 = merged_params.get('k1', 20.0)
+    k2 = merged_params.get('k2', 30.0)
+
+    t2_val = np.asarray(t2, dtype=float)
+    t2_val = np.where(t2_val > 1.5, t2_val / 100.0, t2_val)
+    xw = (np.asarray(annual_salary, dtype=float) - w_high) / max(w_high, 1.0)
+
+    # exp 上溢时分母为 inf，对应 logistic 项取 0（与饱和极限一致）
+    with np.errstate(over='ignore'):
+        S_t2 = L2 / (1.0 + np.exp(-k1 * (t2_val - T2_mid)))
+        S_w = L3 / (1.0 + np.exp(-k2 * xw))
+
+    rate = np.clip(L1 + S_t2 + S_w, L1, L1 + L2 + L3)
+    if cap_at_t2:
+        rate = np.minimum(rate, t2_val)
+    rate = np.maximum(rate, 0.0) * 100.0
+
+    if age is None:
+        age_discount = np.zeros(np.shape(rate))
+    else:
+        age_val = np.asarray(age, dtype=float)
+        age_discount = np.where(age_val >= 55, np.maximum(0.0, (60 - age_val) * 0.02), 0.0)
+
+    return T3Components(
+        t2=t2_val,
+        base_tax=np.full(np.shape(rate), L1 * 100.0),
+        t2_component=S_t2 * 100.0,
+        income_adjustment=S_w * 100.0,
+        rate=rate,
+        age_discount=age_discount,
+        t3=np.maximum(0.0, rate - age_discount)
+    )
+
+
+def _logistic(level, k, x):
+    """level / (1 + exp(-k·x))；exp 上溢时取饱和极限 0"""
+    try:
+        return level / (1.0 + math.exp(-k * x))
+    except OverflowError:
+        return 0.0
+
+
+def _t3_scalar(t2, w, params):
+    """
+    单个 (t2, 年收入) 的双逻辑各分量（小数形式，未舍入），与 t3_kernel 逐项同口径
+
+    单值调用（calculate_t3 等）走纯 Python 算术，避免 0 维数组与数据类的开销；
+    数组与批量计算使用 t3_kernel。
 
+    Returns:
+        (t2 小数, T2分量, 收入调整分量, 税率)
+    """
     L1 = params.get('L1', 0.0)
     L2 = params.get('L2', 0.10)
     L3 = params.get('L3', 0.05)
@@ -43,87 +165,107 @@ def _compute_t3_decimal(t2, w, params=None):
     k1 = params.get('k1', 20.0)
     k2 = params.get('k2', 30.0)
 
-    try:
-        S_t2 = L2 / (1.0 + math.exp(-k1 * (t2_val - T2_mid)))
-    except OverflowError:
-        S_t2 = L2 if (t2_val - T2_mid) > 0 else 0.0
+    # 允许外部以百分比形式传入 t2（例如 10 表示 10%），t2>1.5 时除以100
+    t2_val = float(t2)
+    if t2_val > 1.5:
+        t2_val = t2_val / 100.0
+
+    S_t2 = _logistic(L2, k1, t2_val - T2_mid)
+    S_w = _logistic(L3, k2, (w - w_high) / max(w_high, 1.0))
+
+    # 边界；强制 t3 不超过 t2（小数形式）以保证一致性
+    rate = min(max(L1 + S_t2 + S_w, L1), L1 + L2 + L3)
+    rate = max(min(rate, t2_val), 0.0)
+    return t2_val, S_t2, S_w, rate
 
-    xw = (w - w_high) / max(w_high, 1.0)
-    try:
-        S_w = L3 / (1.0 + math.exp(-k2 * xw))
-    except OverflowError:
-        S_w = L3 if xw > 0 else 0.0
 
-    t3 = L1 + S_t2 + S_w
-    # 边界
-    t3 = min(max(t3, L1), L1 + L2 + L3)
-    # 强制 t3 不超过 t2（小数形式）以保证一致性
-    t3 = min(t3, t2_val)
-    t3 = max(t3, 0.0)
-    return float(t3)
+def _compute_t3_decimal(t2, w, params=None):
+    """内部计算，返回小数形式的税率（0-1），不含年龄折扣。
+
+    t2: 以小数表示的有效缴费期税率或以相容形式的数值（如果 t2 大于1，会视为百分比除以100）。
+    w: 年收入
+    params: 参数字典
+    """
+    return _t3_scalar(t2, w, _resolve_t3_params(params))[3]
+
+
+def calculate_t3_array(t2, annual_salary, age=None, params=None):
+    """向量化的 T3 计算（与 calculate_t3 的 't3' 字段一致，但不做两位小数舍入）。
+
+    t2 / annual_salary / age 可为标量或数组，按 NumPy 广播规则组合；
+    t2 的百分比/小数判定与 _compute_t3_decimal 相同（逐元素判断 t2>1.5）。
+    返回百分比形式的 np.ndarray（例如 7.25 表示 7.25%）。
+    """
+    return t3_kernel(t2, annual_salary, age, params).t3
 
 
-def calculate_t3(t2, annual_salary=None, age=None, params=None):
+def _round_components(components):
+    """按 calculate_t3 的舍入顺序（先舍入税率与年龄折扣，再相减）得到两位小数的百分比"""
+    rate = np.round(components.rate, 2)
+    age_discount = np.round(components.age_discount, 2)
+    t3 = np.round(np.maximum(0.0, rate - age_discount), 2)
+    return {
+        'baseTax': np.round(components.base_tax, 2),
+        't2Component': np.round(components.t2_component, 2),
+        'incomeAdjustment': np.round(components.income_adjustment, 2),
+        'ageDiscount': age_discount,
+        'finalRate': t3
+    }
+
+
+def calculate_t3_batch(t2, annual_salary, age=None, params=None):
+    """批量 T3：(t2, 年收入, 年龄) 数组广播后一次计算，返回各字段数组（精简模式，两位小数）
+
+    年龄 ≥ 55 的元素扣减年龄折扣；元素数超过 MAX_T3_BATCH 或形状无法广播时抛出 ValueError。
+    返回 {'t3': ndarray, 'formula': ..., 'components': {...: ndarray}, 'count': 元素个数}
+    """
+    shape = np.broadcast_shapes(np.shape(t2), np.shape(annual_salary), np.shape(age))
+    if int(np.prod(shape)) > MAX_T3_BATCH:
+        raise ValueError(f'批量计算最多 {MAX_T3_BATCH} 个元素')
+    components = _round_components(t3_kernel(t2, annual_salary, age, params))
+    t3 = components['finalRate']
+    return {
+        't3': np.broadcast_to(t3, shape),
+        'formula': 'dual_logistic_compatible',
+        'components': {key: np.broadcast_to(value, shape) for key, value in components.items()},
+        'count': int(np.prod(shape))
+    }
+
+
+@request_memoized
+def calculate_t3(t2, annual_salary=None, age=None, params=None, lean=False):
     """兼容包装：接受旧签名 (t2, annual_salary, age) 或新签名 (t2, w, params)
 
     返回 dict 与旧后端模块兼容：{'t3': <percent>, 'formula':..., 'components': {...}}
+    lean=True 时 details 只含输入，不回显完整参数（params_used）。
     """
-    # 解析参数优先级：显式 params > 文件中默认参数
-    merged_params = DEFAULT_PARAMS.copy() if isinstance(DEFAULT_PARAMS, dict) else {}
-    if isinstance(params, dict):
-        merged_params.update(params)
+    # 解析参数优先级：显式 params > 当前参数集
+    merged_params = _resolve_t3_params(params)
 
     # 如果 annual_salary 被传为 None，而 params 中存在 w_high 等，我们允许把第二个参数视为 t3_max_rate（旧兼容），
     # 但在后端中大部分调用都会传入年收入，因此这里优先把 annual_salary 作为收入
     w = annual_salary if annual_salary is not None else merged_params.get('w_high', 300000.0)
 
-    # 计算小数形式 t3
-    t3_decimal = _compute_t3_decimal(t2, w, merged_params)
-
-    # 将小数转为百分比以兼容后端现有显示和计算（例如 0.07 -> 7.0）
-    t3_percent = round(t3_decimal * 100.0, 2)
-
-    # 构建组件信息（供 debug/前端展示）
-    # 为了避免复杂内联表达式导致语法问题，先单独计算各组件
-    base_tax_pct = round((merged_params.get('L1', 0.0)) * 100.0, 2)
-    try:
-        t2_input = t2 if t2 <= 1.5 else t2 / 100.0
-        t2_comp = merged_params.get('L2', 0.10)
-        k1_val = merged_params.get('k1', 20.0)
-        T2_mid_val = merged_params.get('T2_mid', 0.1)
-        t2_component_pct = round((t2_comp / (1.0 + math.exp(-k1_val * (t2_input - T2_mid_val)))) * 100.0, 2)
-    except Exception:
-        t2_component_pct = 0.0
-
-    try:
-        l3 = merged_params.get('L3', 0.05)
-        k2_val = merged_params.get('k2', 30.0)
-        w_high_val = merged_params.get('w_high', 300000.0)
-        income_adj_pct = round((l3 / (1.0 + math.exp(-k2_val * ((w - w_high_val) / max(w_high_val, 1.0))))) * 100.0, 2)
-    except Exception:
-        income_adj_pct = 0.0
-
+    # 各组件（供 debug/前端展示）与最终税率由同一次计算得到；年龄折扣只在 ≥55 岁时生效
+    _, S_t2, S_w, rate = _t3_scalar(t2, w, merged_params)
+    rate_pct = round(rate * 100.0, 2)
+    age_discount = round(max(0.0, (60 - age) * 0.02), 2) if age is not None and age >= 55 else 0.0
+    t3_percent = round(max(0.0, rate_pct - age_discount), 2)
     components = {
-        'baseTax': base_tax_pct,
-        't2Component': t2_component_pct,
-        'incomeAdjustment': income_adj_pct,
-        'ageDiscount': 0.0,
+        'baseTax': round(merged_params.get('L1', 0.0) * 100.0, 2),
+        't2Component': round(S_t2 * 100.0, 2),
+        'incomeAdjustment': round(S_w * 100.0, 2),
+        'ageDiscount': age_discount,
         'finalRate': t3_percent
     }
 
-    if age is not None and age >= 55:
-        # 与旧实现保持小幅年龄折扣（每年0.02%）
-        age_discount = round(max(0.0, (60 - age) * 0.02), 2)
-        components['ageDiscount'] = age_discount
-        components['finalRate'] = round(max(0.0, components['finalRate'] - age_discount), 2)
-        t3_percent = components['finalRate']
+    details = {'inputs': {'t2': t2, 'annual_salary': w, 'age': age}}
+    if not lean:
+        details['params_used'] = merged_params
 
     return {
         't3': t3_percent,
         'formula': 'dual_logistic_compatible',
         'components': components,
-        'details': {
-            'params_used': merged_params,
-            'inputs': {'t2': t2, 'annual_salary': w, 'age': age}
-        }
+        'details': details
     }
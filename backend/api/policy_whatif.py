@@ -0,0 +1,413 @@
+"""
+补贴政策参数情景分析（What-if）引擎
+
+对 SubsidyParams 的九个可调参数做网格扫描：
+    base_grant, c_min, c_bar_1, c_bar_2, alpha_1, alpha_2, alpha_3, taper_w_low, taper_w_high
+
+在给定（合成或上传的）收入分布上，以 参数向量 × 个体 的张量批量计算补贴，
+输出每组参数的财政成本、覆盖率、分配指标，以及"成本-覆盖率"帕累托前沿。
+个体维度分块计算（每块不超过 CHUNK_ELEMENTS 个元素），内存占用与人群规模无关。
+HTTP 接口把参数组数 × 人群规模限制在 MAX_EVALUATIONS 以内（约每亿次评估数秒）；
+直接调用（离线扫描）不受此限制。
+"""
+
+import sys
+import os
+import time
+import itertools
+from dataclasses import asdict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.subsidy_calculator import SubsidyParams, subsidy_kernel
+from api.policy_registry import current_parameter_set
+
+
+PARAM_NAMES = (
+    'base_grant', 'c_min', 'c_bar_1', 'c_bar_2',
+    'alpha_1', 'alpha_2', 'alpha_3',
+    'taper_w_low', 'taper_w_high'
+)
+
+# 合成人群（与第六章MC模拟一致：对数正态，中位数5万，σ=0.8）
+DEFAULT_POPULATION_SIZE = 100000
+DEFAULT_MEDIAN_INCOME = 50000
+DEFAULT_INCOME_SIGMA = 0.8
+INCOME_FLOOR = 20000
+INCOME_CEILING = 300000
+
+# 缴费行为（保守/稳健/积极，CFPS分布）
+CONTRIBUTION_RATES = (0.02, 0.05, 0.08)
+CONTRIBUTION_SHARES = (0.289, 0.505, 0.206)
+CURRENT_CAP = 12000
+
+MAX_POPULATION_SIZE = 2000000
+MAX_GRID_POINTS = 5000
+MAX_EVALUATIONS = 100_000_000  # 单次HTTP请求的 参数组数 × 人群规模上限
+CHUNK_ELEMENTS = 4000000       # 每块 参数×个体 元素数上限（约32MB/数组）
+N_QUANTILE_GROUPS = 5
+
+
+def generate_population(
+    size: int = DEFAULT_POPULATION_SIZE,
+    median_income: float = DEFAULT_MEDIAN_INCOME,
+    sigma: float = DEFAULT_INCOME_SIGMA,
+    seed: int = 42
+) -> Dict[str, np.ndarray]:
+    """
+    生成合成人群（对数正态收入 + 三类缴费行为，缴费受现行12000元上限约束）
+
+    返回:
+        {'incomes': 年收入数组, 'contributions': 年缴费数组, 'weights': 权重数组}
+    """
+    rng = np.random.default_rng(seed)
+    incomes = rng.lognormal(mean=np.log(median_income), sigma=sigma, size=size)
+    incomes = np.clip(incomes, INCOME_FLOOR, INCOME_CEILING)
+    rates = rng.choice(CONTRIBUTION_RATES, size=size, p=CONTRIBUTION_SHARES)
+    contributions = np.minimum(incomes * rates, CURRENT_CAP)
+    return {
+        'incomes': incomes,
+        'contributions': contributions,
+        'weights': np.ones(size)
+    }
+
+
+def load_population(
+    incomes,
+    contributions=None,
+    weights=None,
+    seed: int = 42
+) -> Dict[str, np.ndarray]:
+    """
+    由上传的收入分布构建人群；未提供缴费额时按合成人群的缴费行为补全
+    """
+    incomes = np.asarray(incomes, dtype=float).ravel()
+    if incomes.size == 0:
+        raise ValueError('incomes不能为空')
+    if incomes.size > MAX_POPULATION_SIZE:
+        raise ValueError(f'人群规模不能超过{MAX_POPULATION_SIZE}')
+
+    if contributions is None:
+        rng = np.random.default_rng(seed)
+        rates = rng.choice(CONTRIBUTION_RATES, size=incomes.size, p=CONTRIBUTION_SHARES)
+        contributions = np.minimum(incomes * rates, CURRENT_CAP)
+    else:
+        contributions = np.asarray(contributions, dtype=float).ravel()
+        if contributions.shape != incomes.shape:
+            raise ValueError('contributions长度必须与incomes一致')
+
+    if weights is None:
+        weights = np.ones(incomes.size)
+    else:
+        weights = np.asarray(weights, dtype=float).ravel()
+        if weights.shape != incomes.shape or np.any(weights < 0):
+            raise ValueError('weights长度必须与incomes一致且非负')
+
+    return {'incomes': incomes, 'contributions': contributions, 'weights': weights}
+
+
+def build_param_grid(
+    spec: Dict[str, Any],
+    base_params: SubsidyParams = None,
+    samples: Optional[int] = None,
+    seed: int = 42
+) -> np.ndarray:
+    """
+    构建参数网格（P × 9，列顺序同 PARAM_NAMES）
+
+    参数:
+        spec: {参数名: 取值列表 或 {'min', 'max', 'num'}}，未出现的参数取 base_params
+        base_params: 基准参数
+        samples: 指定时在各参数 [min, max] 内均匀随机抽样 samples 组，而非笛卡尔积
+
+    返回:
+        参数矩阵，已剔除不合法组合（c̄₂ < c̄₁ 或 w_high ≤ w_low）
+    """
+    if base_params is None:
+        base_params = current_parameter_set().subsidy_params
+    base = asdict(base_params)
+
+    unknown = set(spec) - set(PARAM_NAMES)
+    if unknown:
+        raise ValueError(f'未知参数: {", ".join(sorted(unknown))}')
+
+    axes = []
+    for name in PARAM_NAMES:
+        value = spec.get(name)
+        if value is None:
+            axes.append(np.array([float(base[name])]))
+        elif isinstance(value, dict):
+            axes.append(np.linspace(float(value['min']), float(value['max']), int(value.get('num', 5))))
+        else:
+            axes.append(np.asarray(value, dtype=float).ravel())
+
+    if samples is not None and not 1 <= samples <= MAX_GRID_POINTS:
+        raise ValueError(f'samples必须在1到{MAX_GRID_POINTS}之间')
+
+    if samples:
+        rng = np.random.default_rng(seed)
+        lows = np.array([a.min() for a in axes])
+        highs = np.array([a.max() for a in axes])
+        grid = lows + (highs - lows) * rng.random((int(samples), len(PARAM_NAMES)))
+    else:
+        n_points = int(np.prod([a.size for a in axes]))
+        if n_points > MAX_GRID_POINTS:
+            raise ValueError(f'参数网格共{n_points}组，超过上限{MAX_GRID_POINTS}')
+        grid = np.array(list(itertools.product(*axes)), dtype=float)
+
+    c_bar_1, c_bar_2 = grid[:, 2], grid[:, 3]
+    w_low, w_high = grid[:, 7], grid[:, 8]
+    valid = (c_bar_2 >= c_bar_1) & (w_high > w_low) & np.all(grid >= 0, axis=1)
+    grid = grid[valid]
+    if grid.shape[0] == 0:
+        raise ValueError('参数网格中没有合法组合')
+    if grid.shape[0] > MAX_GRID_POINTS:
+        raise ValueError(f'参数网格共{grid.shape[0]}组，超过上限{MAX_GRID_POINTS}')
+    return grid
+
+
+def _quantile_groups(incomes: np.ndarray, weights: np.ndarray, n_groups: int) -> np.ndarray:
+    """按加权收入分位把个体划入 n_groups 组（0 为最低收入组）"""
+    order = np.argsort(incomes, kind='stable')
+    w_sorted = weights[order]
+    total = w_sorted.sum()
+    midpoint = (np.cumsum(w_sorted) - 0.5 * w_sorted) / total if total > 0 else np.zeros_like(w_sorted)
+    groups = np.empty(incomes.size, dtype=np.int64)
+    groups[order] = np.minimum((midpoint * n_groups).astype(np.int64), n_groups - 1)
+    return groups
+
+
+def evaluate_policy_grid(
+    grid: np.ndarray,
+    population: Dict[str, np.ndarray],
+    base_params: SubsidyParams = None,
+    chunk_size: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    在人群上批量评估参数网格（参数 × 个体 张量，按个体分块）
+
+    返回（均为长度 P 的数组，分组指标为 P × 5）:
+        totalCost, costPerCapita, coverage, effectiveMatchRate,
+        bottom40Share, top20Share, meanSubsidyByQuintile, coverageByQuintile
+    """
+    if base_params is None:
+        base_params = current_parameter_set().subsidy_params
+
+    grid = np.atleast_2d(np.asarray(grid, dtype=float))
+    incomes = population['incomes']
+    contributions = population['contributions']
+    weights = population['weights']
+    n_params, n_people = grid.shape[0], incomes.size
+
+    groups = _quantile_groups(incomes, weights, N_QUANTILE_GROUPS)
+    group_weight = np.bincount(groups, weights=weights, minlength=N_QUANTILE_GROUPS)
+
+    # 每块元素数不超过 CHUNK_ELEMENTS（调用方指定的分块只能更小）
+    max_chunk = max(1, CHUNK_ELEMENTS // n_params)
+    chunk_size = max_chunk if chunk_size is None else max(1, min(int(chunk_size), max_chunk))
+    columns = [grid[:, j:j + 1] for j in range(len(PARAM_NAMES))]
+
+    cost_by_group = np.zeros((n_params, N_QUANTILE_GROUPS))
+    covered_by_group = np.zeros((n_params, N_QUANTILE_GROUPS))
+
+    for start in range(0, n_people, chunk_size):
+        stop = min(start + chunk_size, n_people)
+        w = incomes[None, start:stop]
+        c = contributions[None, start:stop]
+
+        subsidy = subsidy_kernel(
+            w, c, *columns,
+            taper_mode=base_params.taper_mode,
+            default_enroll=base_params.default_enroll
+        )['subsidy']
+
+        # 加权分组求和：(P × m) @ (m × 5)
+        onehot = np.zeros((stop - start, N_QUANTILE_GROUPS))
+        onehot[np.arange(stop - start), groups[start:stop]] = weights[start:stop]
+        cost_by_group += subsidy @ onehot
+        covered_by_group += (subsidy > 0) @ onehot
+
+    total_weight = group_weight.sum()
+    total_cost = cost_by_group.sum(axis=1)
+    total_contribution = float(np.dot(contributions, weights))
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        bottom40 = np.where(total_cost > 0, cost_by_group[:, :2].sum(axis=1) / total_cost, 0.0)
+        top20 = np.where(total_cost > 0, cost_by_group[:, -1] / total_cost, 0.0)
+        mean_by_group = np.where(group_weight > 0, cost_by_group / group_weight, 0.0)
+        coverage_by_group = np.where(group_weight > 0, covered_by_group / group_weight, 0.0)
+
+    return {
+        'totalCost': total_cost,
+        'costPerCapita': total_cost / total_weight,
+        'coverage': covered_by_group.sum(axis=1) / total_weight,
+        'effectiveMatchRate': total_cost / total_contribution if total_contribution > 0 else np.zeros(n_params),
+        'bottom40Share': bottom40,
+        'top20Share': top20,
+        'meanSubsidyByQuintile': mean_by_group,
+        'coverageByQuintile': coverage_by_group
+    }
+
+
+def pareto_front(cost: np.ndarray, coverage: np.ndarray) -> np.ndarray:
+    """
+    成本-覆盖率帕累托前沿（成本越低、覆盖率越高越好）
+
+    返回:
+        前沿点的索引，按成本升序
+    """
+    cost = np.asarray(cost, dtype=float)
+    coverage = np.asarray(coverage, dtype=float)
+    order = np.lexsort((-coverage, cost))
+    best_so_far = np.maximum.accumulate(coverage[order])
+    improves = np.empty(order.size, dtype=bool)
+    improves[0] = True
+    improves[1:] = coverage[order][1:] > best_so_far[:-1]
+    return order[improves]
+
+
+def count_evaluations(params: Dict[str, Any]) -> int:
+    """
+    请求的 参数组数 × 人群规模（与 run_policy_whatif 同口径，不生成人群、不计算补贴）
+
+    供 HTTP 接口在派发计算前检查 MAX_EVALUATIONS；参数不合法时抛出 ValueError。
+    """
+    samples = params.get('samples')
+    samples = int(samples) if samples is not None else None
+    grid = build_param_grid(params.get('grid') or {}, samples=samples, seed=int(params.get('seed', 42)))
+    if params.get('incomes') is not None:
+        size = int(np.size(params['incomes']))
+    else:
+        size = int((params.get('population') or {}).get('size', DEFAULT_POPULATION_SIZE))
+    return grid.shape[0] * size
+
+
+def run_policy_whatif(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    政策情景分析主入口（供API调用）
+
+    参数:
+        params: {
+            'grid': {参数名: 取值列表 或 {'min','max','num'}},
+            'samples': 随机抽样组数（可选，替代笛卡尔积）,
+            'population': {'size', 'medianIncome', 'sigma', 'seed'}（可选，合成人群）,
+            'incomes': 上传的收入数组（可选，优先于合成人群）,
+            'contributions': 上传的缴费数组（可选）,
+            'weights': 上传的权重数组（可选）,
+            'chunkSize': 个体分块大小（可选，不超过 CHUNK_ELEMENTS / 参数组数）
+        }
+
+    返回:
+        {'success', 'parameterNames', 'grid', 'metrics', 'paretoFront', 'population', 'performance'}
+    """
+    start_time = time.perf_counter()
+    seed = int(params.get('seed', 42))
+    samples = params.get('samples')
+    if samples is not None:
+        samples = int(samples)
+        if not 1 <= samples <= MAX_GRID_POINTS:
+            raise ValueError(f'samples必须在1到{MAX_GRID_POINTS}之间')
+
+    if params.get('incomes') is not None:
+        population = load_population(
+            params['incomes'], params.get('contributions'), params.get('weights'), seed=seed
+        )
+        source = 'uploaded'
+    else:
+        pop_spec = params.get('population') or {}
+        size = int(pop_spec.get('size', DEFAULT_POPULATION_SIZE))
+        if not 0 < size <= MAX_POPULATION_SIZE:
+            raise ValueError(f'人群规模必须在1到{MAX_POPULATION_SIZE}之间')
+        population = generate_population(
+            size=size,
+            median_income=float(pop_spec.get('medianIncome', DEFAULT_MEDIAN_INCOME)),
+            sigma=float(pop_spec.get('sigma', DEFAULT_INCOME_SIGMA)),
+            seed=int(pop_spec.get('seed', seed))
+        )
+        source = 'synthetic'
+
+    grid = build_param_grid(params.get('grid') or {}, samples=samples, seed=seed)
+    metrics = evaluate_policy_grid(grid, population, chunk_size=params.get('chunkSize'))
+    front = pareto_front(metrics['totalCost'], metrics['coverage'])
+    elapsed = time.perf_counter() - start_time
+
+    incomes = population['incomes']
+    return {
+        'success': True,
+        'parameterNames': list(PARAM_NAMES),
+        'grid': np.round(grid, 4).tolist(),
+        'metrics': {key: np.round(value, 4).tolist() for key, value in metrics.items()},
+        'paretoFront': [
+            {
+                'index': int(i),
+                'params': dict(zip(PARAM_NAMES, np.round(grid[i], 4).tolist())),
+                'totalCost': round(float(metrics['totalCost'][i]), 2),
+                'coverage': round(float(metrics['coverage'][i]), 4),
+                'bottom40Share': round(float(metrics['bottom40Share'][i]), 4)
+            }
+            for i in front
+        ],
+        'population': {
+            'source': source,
+            'size': int(incomes.size),
+            'totalWeight': round(float(population['weights'].sum()), 2),
+            'medianIncome': round(float(np.median(incomes)), 2),
+            'meanContribution': round(float(np.average(population['contributions'], weights=population['weights'])), 2)
+        },
+        'performance': {
+            'gridPoints': int(grid.shape[0]),
+            'evaluations': int(grid.shape[0] * incomes.size),
+            'elapsedSeconds': round(elapsed, 3)
+        }
+    }
+
+
+if __name__ == '__main__':
+    from api.subsidy_calculator import calculate_subsidy
+
+    print("=" * 60)
+    print("补贴政策 What-if 引擎测试")
+    print("=" * 60)
+
+    # 测试1：单组默认参数与标量计算器一致
+    population = generate_population(size=2000, seed=7)
+    grid = build_param_grid({})
+    metrics = evaluate_policy_grid(grid, population, chunk_size=300)
+    scalar_cost = sum(
+        calculate_subsidy(w, c)['subsidy']
+        for w, c in zip(population['incomes'], population['contributions'])
+    )
+    print(f"\n测试1 默认参数总成本: 向量={metrics['totalCost'][0]:.2f}, 标量={scalar_cost:.2f}")
+
+    # 测试2：笛卡尔积网格 + 帕累托前沿
+    result = run_policy_whatif({
+        'grid': {
+            'alpha_1': [0.3, 0.45, 0.6],
+            'c_bar_1': {'min': 800, 'max': 2400, 'num': 5},
+            'taper_w_high': [80000, 100000, 150000]
+        },
+        'population': {'size': 50000}
+    })
+    print(f"\n测试2 网格{result['performance']['gridPoints']}组, "
+          f"耗时{result['performance']['elapsedSeconds']}秒, 前沿{len(result['paretoFront'])}点")
+    for point in result['paretoFront'][:5]:
+        print(f"  成本={point['totalCost']:>14,.0f}  覆盖率={point['coverage']:.3f}  "
+              f"底部40%份额={point['bottom40Share']:.3f}")
+
+    # 测试3：500组随机参数 × 20万人
+    result = run_policy_whatif({
+        'grid': {
+            'base_grant': {'min': 0, 'max': 300},
+            'alpha_1': {'min': 0.2, 'max': 0.6},
+            'c_bar_1': {'min': 800, 'max': 3000},
+            'taper_w_high': {'min': 60000, 'max': 200000}
+        },
+        'samples': 500,
+        'population': {'size': 200000}
+    })
+    print(f"\n测试3 {result['performance']['evaluations']:,}次评估, "
+          f"耗时{result['performance']['elapsedSeconds']}秒")
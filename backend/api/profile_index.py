@@ -0,0 +1,233 @@
+"""
+按年薪预计算的政策画像索引（/api/optimize-contribution 查表）
+
+推荐缴费额中只有 NPV 依赖工资增长率；其余各量——自洽 T2 / 上限 / T3（不动点求解）、
+个性化上限及其各分量（capResult）、各候选缴费额的真实 T2 与节税额——只由 (年薪, 年龄) 决定。
+构建步骤在 年薪（¥100 步长，至可配置上限）× 年龄 18–59 网格上一次性向量化计算这些量，
+写成定长记录的二进制文件（.npy，按内存映射加载，多个 worker 共享页缓存）；
+请求时按下标 O(1) 取出记录，只需对候选缴费额调用一次 NPV 内核。
+
+索引与政策参数集版本绑定（文件名含 version），当前参数集不同、索引缺失或为旧记录格式，
+或年薪不是 ¥100 的整数倍、超出上限、年龄不在 18–59 时回退到实时计算。
+进程启动后才构建的索引在下一次请求时即被使用。
+
+构建:
+    python api/profile_index.py --max-salary 1000000
+"""
+
+import sys
+import os
+import json
+import numpy as np
+from typing import Any, Dict, Optional
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.policy_registry import current_parameter_set
+from api.fixed_point_solver import solve_fixed_point, STATUTORY_CONTRIBUTION
+from api.contribution_optimizer import candidate_amounts
+from api.cap_calculator import cap_components, format_cap_result
+from api.t2_calculator import calculate_t2_for_contribution
+from api.policy_utils import calculate_t3_array
+
+
+DEFAULT_INDEX_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'cache', 'profile_index'))
+SALARY_STEP = 100
+DEFAULT_MAX_SALARY = 1_000_000
+AGE_MIN = 18
+AGE_MAX = 59
+MAX_CANDIDATES = 24    # 500 ~ 12000，步长500
+CAP_COMPONENTS = ('dynamic', 'fixed_raw', 'tau', 'fixed_effective', 'cap')
+
+# 定长记录（每个年薪一条）；舍入到分/0.01% 的量以整数存储，还原后与实时计算的舍入结果逐位一致
+RECORD_DTYPE = np.dtype([
+    ('t2', '<i4'),                               # 自洽T2（0.01%）
+    ('t3', '<i4', (AGE_MAX - AGE_MIN + 1,)),     # 各年龄自洽T3（0.01%）
+    ('contribution', '<i8'),                     # 自洽缴费额（分）
+    ('cap', '<i8'),                              # 自洽上限（元）
+    ('iterations', '<i4'),
+    ('converged', '?'),
+    ('residual', '<f8'),
+    ('personal_cap', '<i8'),                     # 个性化上限（元，≤12000）
+    ('cap_components', '<f8', (len(CAP_COMPONENTS),)),  # 按舍入后T2计算的上限各分量（capResult，未舍入）
+    ('real_t2', '<i4', (MAX_CANDIDATES,)),       # 各候选缴费额的真实T2（0.01%）
+    ('tax_saving', '<i8', (MAX_CANDIDATES,)),    # 各候选缴费额的节税额（分）
+])
+
+
+def _hundredths(value: float) -> int:
+    """round(value, 2) 的整数表示（k / 100 与 round(value, 2) 是同一个浮点数）"""
+    return int(round(round(float(value), 2) * 100))
+
+
+def index_paths(version: str, directory: Optional[str] = None):
+    directory = directory or os.getenv('PROFILE_INDEX_DIR', DEFAULT_INDEX_DIR)
+    stem = os.path.join(directory, f'profile_index_{version}')
+    return stem + '.npy', stem + '.json'
+
+
+def build_profile_index(max_salary: int = DEFAULT_MAX_SALARY, directory: Optional[str] = None) -> str:
+    """
+    按当前政策参数集构建画像索引并写入 directory，返回索引文件路径
+
+    Args:
+        max_salary: 年薪上限（元，按 SALARY_STEP 向下取整）
+        directory: 输出目录，默认 PROFILE_INDEX_DIR 或 cache/profile_index
+    """
+    param_set = current_parameter_set()
+    salaries = np.arange(SALARY_STEP, int(max_salary) + 1, SALARY_STEP, dtype=float)
+    ages = np.arange(AGE_MIN, AGE_MAX + 1)
+    if salaries.size == 0:
+        raise ValueError(f'max_salary 必须不小于 {SALARY_STEP}')
+
+    records = np.zeros(salaries.size, dtype=RECORD_DTYPE)
+
+    # 自洽 T2 / 上限 / T3：全部年薪 × 年龄一次求解（T2 与上限不依赖年龄）
+    consistent = solve_fixed_point(salaries, STATUTORY_CONTRIBUTION)
+    t3 = calculate_t3_array(consistent.t2[:, None], salaries[:, None], ages[None, :])
+    records['t2'] = [_hundredths(v) for v in consistent.t2]
+    records['t3'] = np.vectorize(_hundredths, otypes=[np.int64])(t3)
+    records['contribution'] = [_hundredths(v) for v in consistent.contribution]
+    records['cap'] = [round(float(v), 0) for v in consistent.cap]
+    records['iterations'] = consistent.iterations
+    records['converged'] = consistent.converged
+    records['residual'] = consistent.residual
+
+    # 上限各分量与候选缴费额表（依赖舍入后的T2，按优化器相同口径计算）
+    components = cap_components(salaries, records['t2'] / 100)
+    records['cap_components'] = np.stack([components[name] for name in CAP_COMPONENTS], axis=1)
+    for row, salary in enumerate(salaries):
+        salary = int(salary)
+        personal_cap = min(round(float(components['cap'][row]), 0), STATUTORY_CONTRIBUTION)
+        records['personal_cap'][row] = personal_cap
+        for k, contrib in enumerate(candidate_amounts(personal_cap)):
+            t2_result = calculate_t2_for_contribution(salary, contrib)
+            records['real_t2'][row, k] = _hundredths(t2_result['t2'])
+            records['tax_saving'][row, k] = _hundredths(t2_result['taxSaving'])
+
+    index_path, meta_path = index_paths(param_set.version, directory)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    tmp_path = index_path + '.tmp.npy'
+    np.save(tmp_path, records)
+    os.replace(tmp_path, index_path)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'policy': param_set.tag,
+            'salaryStep': SALARY_STEP,
+            'maxSalary': int(salaries[-1]),
+            'ageMin': AGE_MIN,
+            'ageMax': AGE_MAX,
+            'records': int(salaries.size),
+            'recordBytes': RECORD_DTYPE.itemsize
+        }, f, ensure_ascii=False, indent=2)
+    _INDEXES.pop(index_path, None)
+    return index_path
+
+
+class ProfileIndex:
+    """内存映射的画像索引（只读）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = np.load(path, mmap_mode='r')
+        self.max_salary = self.records.shape[0] * SALARY_STEP
+
+    def row(self, annual_salary, age) -> Optional[int]:
+        """索引域内返回记录下标，否则 None"""
+        if not AGE_MIN <= age <= AGE_MAX or age != int(age):
+            return None
+        if not SALARY_STEP <= annual_salary <= self.max_salary or annual_salary % SALARY_STEP:
+            return None
+        return int(annual_salary) // SALARY_STEP - 1
+
+    def lookup(self, annual_salary, age) -> Optional[Dict[str, Any]]:
+        """
+        取出 (年薪, 年龄) 的画像；不在索引域内返回 None
+
+        Returns:
+            {'profile': solve_consistent_profile 同格式, 'table': contribution_candidates 同格式}
+        """
+        row = self.row(annual_salary, age)
+        if row is None:
+            return None
+        record = self.records[row]
+        personal_cap = float(record['personal_cap'])
+        candidates = candidate_amounts(personal_cap)
+        iterations = int(record['iterations'])
+        converged = bool(record['converged'])
+        t2 = int(record['t2']) / 100
+        return {
+            'profile': {
+                'contribution': int(record['contribution']) / 100,
+                't2': t2,
+                'cap': float(record['cap']),
+                't3': int(record['t3'][int(age) - AGE_MIN]) / 100,
+                'convergence': {
+                    'converged': converged,
+                    'unconverged': int(not converged),
+                    'iterations': iterations,
+                    'meanIterations': round(float(iterations), 2),
+                    'maxResidual': float(record['residual'])
+                }
+            },
+            'table': {
+                'capResult': format_cap_result(
+                    annual_salary, t2, dict(zip(CAP_COMPONENTS, record['cap_components']))
+                ),
+                'personalCap': personal_cap,
+                'candidates': candidates,
+                'realT2': record['real_t2'][:candidates.size] / 100,
+                # 应税收入为0时实时计算的节税额为整数 0
+                'taxSaving': [int(v) / 100 if v else 0 for v in record['tax_saving'][:candidates.size]]
+            }
+        }
+
+
+_INDEXES: Dict[str, ProfileIndex] = {}
+
+
+def load_profile_index(directory: Optional[str] = None) -> Optional[ProfileIndex]:
+    """
+    当前政策参数集的画像索引（按路径缓存）；未构建或为旧记录格式时返回 None
+
+    只缓存已加载的索引，缺失时每次重新检查文件，进程启动后构建的索引无需重启即可生效。
+    """
+    index_path, _ = index_paths(current_parameter_set().version, directory)
+    index = _INDEXES.get(index_path)
+    if index is None:
+        if not os.path.exists(index_path):
+            return None
+        index = ProfileIndex(index_path)
+        if index.records.dtype != RECORD_DTYPE:
+            return None
+        _INDEXES[index_path] = index
+    return index
+
+
+def lookup_profile(annual_salary, age, directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """查表入口：索引缺失或不在索引域内时返回 None（调用方回退到实时计算）"""
+    index = load_profile_index(directory)
+    return index.lookup(annual_salary, age) if index is not None else None
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='构建按年薪预计算的政策画像索引')
+    parser.add_argument('--max-salary', type=int, default=DEFAULT_MAX_SALARY, help='年薪上限（元）')
+    parser.add_argument('--output', help='输出目录（默认 PROFILE_INDEX_DIR 或 cache/profile_index）')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path = build_profile_index(args.max_salary, args.output)
+    elapsed = time.perf_counter() - start
+    print(f"画像索引已写入: {path}（{os.path.getsize(path) / 1e6:.1f} MB，耗时 {elapsed:.1f}s）")
+
+    index = load_profile_index(args.output)
+    start = time.perf_counter()
+    for salary in range(100000, 200000, 100):
+        index.lookup(salary, 35)
+    print(f"查表: {(time.perf_counter() - start) / 1000 * 1e6:.1f}μs/次")
@@ -0,0 +1,167 @@
+"""
+按请求的可选性能剖析（确定性 profiler，输出折叠栈火焰图数据）
+
+启用条件：设置环境变量 PROFILE_SECRET，并在请求中携带
+    请求头  X-Profile: <secret>
+（只接受请求头，避免密钥进入访问日志与代理日志）。未设置 PROFILE_SECRET 时功能关闭；
+密钥用 hmac.compare_digest 比较。
+
+剖析结果：
+- 折叠栈（collapsed stack，"a;b;c 微秒"，可直接交给 flamegraph.pl / speedscope）
+- 每个函数的调用次数（如 calculate_tax_from_taxable_income、calculate_subsidy、_sigma）
+写入 PROFILE_ARTIFACT_DIR（默认 backend/profiles/），并在响应头返回剖析ID与产物文件名（不含服务器路径）；
+请求头 X-Profile-Inline: 1 时把摘要附加到 JSON 响应的 _profile 字段。
+"""
+
+import os
+import sys
+import json
+import hmac
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_INLINE_HEADER = 'X-Profile-Inline'
+DEFAULT_ARTIFACT_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'profiles'))
+TOP_N = 30
+
+
+def profiling_authorized(provided: Optional[str]) -> bool:
+    """校验请求携带的剖析密钥（未配置 PROFILE_SECRET 时始终为 False）"""
+    secret = os.getenv('PROFILE_SECRET')
+    if not secret or not provided:
+        return False
+    return hmac.compare_digest(provided.encode('utf-8'), secret.encode('utf-8'))
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class RequestProfiler:
+    """
+    基于 sys.setprofile 的确定性剖析器（仅作用于当前线程）
+
+    每个 Python 函数调用记录一次；折叠栈的值为该栈帧的自身耗时（微秒）。
+    """
+
+    def __init__(self):
+        self.collapsed: Dict[str, float] = defaultdict(float)
+        self.calls: Counter = Counter()
+        self._stack: List[list] = []     # [path, start, child_elapsed]
+        self._previous = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def _tracer(self, frame, event, arg):
+        if event == 'call':
+            name = _frame_name(frame)
+            self.calls[name] += 1
+            parent = self._stack[-1][0] + ';' if self._stack else ''
+            self._stack.append([parent + name, time.perf_counter(), 0.0])
+        elif event == 'return' and self._stack:
+            path, start, child = self._stack.pop()
+            elapsed = time.perf_counter() - start
+            self.collapsed[path] += elapsed - child
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def start(self):
+        self._previous = sys.getprofile()
+        self.started = time.perf_counter()
+        sys.setprofile(self._tracer)
+
+    def stop(self):
+        sys.setprofile(self._previous)
+        self.elapsed = time.perf_counter() - self.started
+        # 尚未返回的栈帧按当前时间结算
+        now = time.perf_counter()
+        while self._stack:
+            path, start, child = self._stack.pop()
+            self.collapsed[path] += (now - start) - child
+            if self._stack:
+                self._stack[-1][2] += now - start
+
+    def collapsed_lines(self) -> List[str]:
+        """折叠栈文本行（微秒，按耗时降序）"""
+        return [
+            f'{path} {max(1, int(round(seconds * 1e6)))}'
+            for path, seconds in sorted(self.collapsed.items(), key=lambda kv: -kv[1])
+        ]
+
+    def self_time_by_function(self) -> Dict[str, float]:
+        totals: Dict[str, float] = defaultdict(float)
+        for path, seconds in self.collapsed.items():
+            totals[path.rsplit(';', 1)[-1]] += seconds
+        return totals
+
+    def summary(self, top_n: int = TOP_N) -> Dict[str, Any]:
+        self_time = self.self_time_by_function()
+        return {
+            'totalSeconds': round(self.elapsed, 6),
+            'functionCalls': sum(self.calls.values()),
+            'topCalls': [
+                {'function': name, 'calls': count}
+                for name, count in self.calls.most_common(top_n)
+            ],
+            'topSelfTime': [
+                {'function': name, 'seconds': round(seconds, 6)}
+                for name, seconds in sorted(self_time.items(), key=lambda kv: -kv[1])[:top_n]
+            ]
+        }
+
+
+def write_profile_artifacts(profiler: RequestProfiler, route: str,
+                            directory: Optional[str] = None) -> Dict[str, str]:
+    """
+    写入剖析产物：<id>.collapsed（折叠栈）与 <id>.json（摘要 + 全部调用次数）
+
+    返回:
+        {'id', 'collapsed', 'summary'}
+    """
+    directory = directory or os.getenv('PROFILE_ARTIFACT_DIR') or DEFAULT_ARTIFACT_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    slug = route.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root'
+    profile_id = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}_{slug}_{uuid.uuid4().hex[:8]}"
+    collapsed_path = os.path.join(directory, f'{profile_id}.collapsed')
+    summary_path = os.path.join(directory, f'{profile_id}.json')
+
+    with open(collapsed_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(profiler.collapsed_lines()) + '\n')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'id': profile_id,
+            'route': route,
+            **profiler.summary(),
+            'calls': dict(profiler.calls.most_common())
+        }, f, ensure_ascii=False, indent=2)
+
+    return {'id': profile_id, 'collapsed': collapsed_path, 'summary': summary_path}
+
+
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api.lifecycle_visualization import generate_lifecycle_data
+
+    profiler = RequestProfiler()
+    profiler.start()
+    generate_lifecycle_data({
+        'age': 30, 'annualSalary': 150000, 'contributionAmount': 12000,
+        't2': 10, 't3': 3, 'wageGrowthRate': 3.9
+    })
+    profiler.stop()
+
+    summary = profiler.summary(top_n=8)
+    print(f"总耗时 {summary['totalSeconds']:.4f}s，Python调用 {summary['functionCalls']} 次")
+    for item in summary['topCalls']:
+        print(f"  {item['calls']:>6}  {item['function']}")
+    print("\n折叠栈（前5行）:")
+    for line in profiler.collapsed_lines()[:5]:
+        print(f"  {line}")
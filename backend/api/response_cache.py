@@ -0,0 +1,200 @@
+"""
+确定性端点的响应缓存
+
+除依赖大模型的路由外，各计算端点的响应只取决于请求体与政策参数版本。
+缓存键 = sha256(路由 + 规范化JSON请求体 + 政策参数版本)，同时用作 ETag：
+相同输入必然得到相同响应，因此客户端带 If-None-Match 时可直接返回 304。
+
+后端（环境变量 RESPONSE_CACHE）：
+- memory（默认）: 进程内 LRU，RESPONSE_CACHE_MAX_ENTRIES 条
+- disk:          RESPONSE_CACHE_DIR 下的文件，多个 worker 共享；
+                 条目数不超过 RESPONSE_CACHE_MAX_ENTRIES、总大小不超过 RESPONSE_CACHE_MAX_BYTES（按最近使用淘汰）
+- off:           关闭
+条目有效期 RESPONSE_CACHE_TTL 秒（同时作为 Cache-Control 的 max-age）。
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple, Any
+
+
+DEFAULT_TTL = 3600
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+SWEEP_EVERY = 64   # 磁盘缓存每写入 SWEEP_EVERY 个条目清理一次
+DEFAULT_CACHE_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', 'cache', 'responses'))
+
+
+def cache_key(route: str, body: Any, policy_version: str) -> str:
+    """规范化请求体（键排序、紧凑分隔符）后与路由、政策版本一起哈希"""
+    canonical = json.dumps(body, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    payload = f'{route}\n{policy_version}\n{canonical}'
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class MemoryCache:
+    """进程内 LRU 缓存（线程安全）"""
+
+    def __init__(self, ttl: float = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[float, bytes, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, body, content_type = entry
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body, content_type
+
+    def set(self, key: str, body: bytes, content_type: str):
+        with self._lock:
+            self._entries[key] = (time.time(), body, content_type)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    目录缓存：每个条目一个 <key>.cache 文件，首行为 "写入时间\t内容类型"，其后为响应体
+
+    写入先落临时文件再 os.replace，多进程并发读写安全。文件 mtime 记录最近一次使用（命中时更新），
+    每写入 SWEEP_EVERY 个条目清理一次：删除超过有效期未使用的文件，再按 mtime 从旧到新淘汰，
+    直到条目数与总大小都不超过上限（多个 worker 各自计数，上限可能短暂超出 SWEEP_EVERY × worker 数个条目）。
+    """
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.cache')
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                header, _, body = f.read().partition(b'\n')
+            stored_at, _, content_type = header.decode('utf-8').partition('\t')
+            if time.time() - float(stored_at) > self.ttl:
+                os.remove(path)
+                return None
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return body, content_type
+
+    def set(self, key: str, body: bytes, content_type: str):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(f'{time.time()}\t{content_type}\n'.encode('utf-8') + body)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._writes += 1
+            due = self._writes >= SWEEP_EVERY
+            if due:
+                self._writes = 0
+        if due:
+            self.sweep()
+
+    def _entries(self):
+        """[(mtime, size, path)]，已被其他进程删除的文件跳过"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.cache'):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def sweep(self) -> int:
+        """删除过期条目并按最近使用淘汰到上限以内，返回删除的条目数"""
+        now = time.time()
+        entries = sorted(self._entries())
+        keep = [e for e in entries if now - e[0] <= self.ttl]
+        evict = [e for e in entries if now - e[0] > self.ttl]
+        total_bytes = sum(size for _, size, _ in keep)
+        while keep and (len(keep) > self.max_entries or total_bytes > self.max_bytes):
+            oldest = keep.pop(0)
+            total_bytes -= oldest[1]
+            evict.append(oldest)
+        removed = 0
+        for _, _, path in evict:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def __len__(self):
+        return sum(1 for name in os.listdir(self.directory) if name.endswith('.cache'))
+
+
+def create_response_cache():
+    """按环境变量创建缓存后端；RESPONSE_CACHE=off 时返回 None"""
+    backend = os.getenv('RESPONSE_CACHE', 'memory').lower()
+    ttl = float(os.getenv('RESPONSE_CACHE_TTL', DEFAULT_TTL))
+    max_entries = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+    if backend in ('off', 'none', '0', 'false'):
+        return None
+    if backend == 'disk':
+        return DiskCache(os.getenv('RESPONSE_CACHE_DIR', DEFAULT_CACHE_DIR), ttl=ttl, max_entries=max_entries,
+                         max_bytes=int(os.getenv('RESPONSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)))
+    return MemoryCache(ttl=ttl, max_entries=max_entries)
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    body = {'annualSalary': 150000, 'age': 30, 'wageGrowthRate': 3.9}
+    reordered = {'wageGrowthRate': 3.9, 'age': 30, 'annualSalary': 150000}
+    key = cache_key('/api/calculate-t2', body, 'default@abc123')
+    assert key == cache_key('/api/calculate-t2', reordered, 'default@abc123')
+    assert key != cache_key('/api/calculate-t2', body, 'calibrated-v001@def456')
+    print(f"缓存键: {key[:16]}...（字段顺序无关，政策版本相关）")
+
+    for cache in (MemoryCache(max_entries=2), DiskCache(tempfile.mkdtemp(), max_entries=2)):
+        cache.set('a', b'{"x":1}', 'application/json')
+        cache.set('b', b'{"x":2}', 'application/json')
+        cache.set('c', b'{"x":3}', 'application/json')
+        if isinstance(cache, DiskCache):
+            cache.sweep()
+        print(f"{type(cache).__name__}: 条目 {len(cache)}，a={cache.get('a')}，c={cache.get('c')}")
@@ -0,0 +1,159 @@
+"""
+账户投资收益的随机过程
+
+各模型默认使用固定的 1.75% 账户收益率。请求体带 returnProcess 时，
+生命周期与 NPV 计算改为同时模拟数千条收益路径，返回账户余额与 NPV 的分位带。
+
+returnProcess（百分比口径，与 wageGrowthRate 一致）:
+{
+    "model": "lognormal",   // constant | lognormal
+    "mean": 1.75,           // 年均收益率（%），期望值
+    "volatility": 4.0,      // 年收益率标准差（%）
+    "persistence": 0.0,     // 对数收益偏离的一阶自相关（0 ≤ φ < 1）
+    "paths": 5000,          // 路径数（上限 MAX_PATHS）
+    "seed": 42              // 随机种子（相同请求结果相同，可缓存）
+}
+"""
+
+import sys
+import os
+import math
+import numpy as np
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+DEFAULT_MEAN = 1.75
+DEFAULT_PATHS = 5000
+MAX_PATHS = 20000
+DEFAULT_SEED = 42
+BANDS = (5, 50, 95)
+MODELS = ('constant', 'lognormal')
+
+
+@dataclass(frozen=True)
+class ReturnProcess:
+    """账户收益率过程（小数口径）"""
+    model: str = 'lognormal'
+    mean: float = DEFAULT_MEAN / 100
+    volatility: float = 0.04
+    persistence: float = 0.0
+    paths: int = DEFAULT_PATHS
+    seed: int = DEFAULT_SEED
+
+    def sample(self, years: int) -> np.ndarray:
+        """
+        抽样 (paths, years) 的年收益率
+
+        lognormal: log(1+r) 服从正态分布，参数取使 E[1+r] = 1+mean、Std[1+r] = volatility；
+        persistence > 0 时对数收益偏离为平稳 AR(1)（边际分布不变）。
+        """
+        if self.model == 'constant' or self.volatility == 0:
+            return np.full((self.paths, years), self.mean)
+
+        sigma = math.sqrt(math.log(1 + (self.volatility / (1 + self.mean)) ** 2))
+        mu = math.log(1 + self.mean) - sigma ** 2 / 2
+
+        shocks = np.random.default_rng(self.seed).standard_normal((self.paths, years))
+        if self.persistence > 0 and years > 1:
+            # 从平稳分布出发：e_t = φ e_{t-1} + √(1-φ²) z_t
+            innovation = math.sqrt(1 - self.persistence ** 2)
+            for t in range(1, years):
+                shocks[:, t] = self.persistence * shocks[:, t - 1] + innovation * shocks[:, t]
+        return np.expm1(mu + sigma * shocks)
+
+
+def parse_return_process(spec: Optional[Dict[str, Any]]) -> Optional[ReturnProcess]:
+    """
+    解析请求体中的 returnProcess（百分比口径）；未提供时返回 None（确定性模式）
+
+    参数不合法时抛出 ValueError。
+    """
+    if spec is None:
+        return None
+    if not isinstance(spec, dict):
+        raise ValueError('returnProcess 必须是对象')
+
+    model = spec.get('model', 'lognormal')
+    if model not in MODELS:
+        raise ValueError(f'returnProcess.model 必须是 {" / ".join(MODELS)} 之一')
+
+    mean = float(spec.get('mean', DEFAULT_MEAN)) / 100
+    volatility = float(spec.get('volatility', 0.0 if model == 'constant' else 4.0)) / 100
+    persistence = float(spec.get('persistence', 0.0))
+    paths = int(spec.get('paths', DEFAULT_PATHS))
+    seed = int(spec.get('seed', DEFAULT_SEED))
+
+    if not math.isfinite(mean):
+        raise ValueError('returnProcess.mean 必须是有限数值')
+    if not math.isfinite(volatility):
+        raise ValueError('returnProcess.volatility 必须是有限数值')
+    if mean <= -1:
+        raise ValueError('returnProcess.mean 必须大于 -100')
+    if volatility < 0:
+        raise ValueError('returnProcess.volatility 不能为负')
+    if not 0 <= persistence < 1:
+        raise ValueError('returnProcess.persistence 必须在 [0, 1) 之间')
+    if not 1 <= paths <= MAX_PATHS:
+        raise ValueError(f'returnProcess.paths 必须在 1 ~ {MAX_PATHS} 之间')
+
+    return ReturnProcess(model=model, mean=mean, volatility=volatility,
+                         persistence=persistence, paths=paths, seed=seed)
+
+
+def simulate_balances(contributions: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    """
+    逐路径账户余额：B_k = B_{k-1} × (1 + r_k) + C_k（与确定性模型同一递推，首年 B_0 = C_0）
+
+    参数:
+        contributions: (years,) 每年缴费额
+        returns: (paths, years) 年收益率（第0年不计息）
+    返回:
+        (paths, years) 各年末余额
+    """
+    contributions = np.asarray(contributions, dtype=float)
+    balances = np.empty(returns.shape)
+    if contributions.size == 0:
+        return balances
+    balances[:, 0] = contributions[0]
+    for k in range(1, contributions.size):
+        balances[:, k] = balances[:, k - 1] * (1 + returns[:, k]) + contributions[k]
+    return balances
+
+
+def percentile_bands(values: np.ndarray, bands: Sequence[float] = BANDS) -> Dict[str, np.ndarray]:
+    """按路径维（axis=0）取分位数，返回 {'p5': ..., 'p50': ..., 'p95': ...}（两位小数）"""
+    quantiles = np.round(np.percentile(values, bands, axis=0), 2)
+    return {f'p{b:g}': q for b, q in zip(bands, quantiles)}
+
+
+def describe_process(process: ReturnProcess) -> Dict[str, Any]:
+    """响应中回显的过程参数（百分比口径）"""
+    return {
+        'model': process.model,
+        'mean': round(process.mean * 100, 4),
+        'volatility': round(process.volatility * 100, 4),
+        'persistence': process.persistence,
+        'paths': process.paths,
+        'seed': process.seed,
+        'percentiles': list(BANDS)
+    }
+
+
+if __name__ == '__main__':
+    import time
+
+    process = parse_return_process({'model': 'lognormal', 'mean': 1.75, 'volatility': 4.0, 'paths': 5000})
+    start = time.perf_counter()
+    returns = process.sample(30)
+    balances = simulate_balances(np.full(30, 9500.0), returns)
+    bands = percentile_bands(balances[:, -1])
+    elapsed = (time.perf_counter() - start) * 1000
+
+    print(f"{process.paths} 条路径 × 30 年，耗时 {elapsed:.1f}ms")
+    print(f"年收益率: 均值 {returns.mean() * 100:.2f}%，标准差 {returns.std() * 100:.2f}%")
+    print(f"期末余额 P5/P50/P95: ¥{bands['p5']:,.0f} / ¥{bands['p50']:,.0f} / ¥{bands['p95']:,.0f}")
@@ -3,9 +3,24 @@
 识别高风险用户并提供预警
 """
 
+import sys
+import os
+from functools import lru_cache
 from typing import Dict, List, Any
 import math
 
+import numpy as np
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.t2_calculator import calculate_t2_array
+from api.policy_utils import calculate_t3_array
+from api.cap_calculator import calculate_contribution_cap
+from api.npv_kernel import npv_kernel, RETIREMENT_AGE
+from api.policy_registry import current_parameter_set
+
 
 def assess_t3_risk(params: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -210,39 +225,221 @@ def batch_risk_screening(users: List[Dict[str, Any]]) -> Dict[str, Any]:
     }
 
 
+# ==================== 最优缴费上限（约束优化） ====================
+
+MAX_T3_RATE = 3.0              # T3约束上限（%），对应现行3%固定税率
+CAP_GRID_STEP = 100            # 粗网格步长（元）
+CAP_TOLERANCE = 1.0            # 二分精度（元）
+
+
+def _evaluate_contributions(annual_salary, contributions, age):
+    """
+    在缴费网格上评估 T2 / T3 / NPV（支持 工资 × 缴费 广播）
+
+    NPV 由统一内核 npv_kernel 计算（三段式补贴、按T2节税，工资不增长），
+    与 calculate_npv 口径一致：账户按1.75%累积，20年等额领取，3%贴现；年龄超过60岁时 NPV = 0。
+    """
+    salary = np.asarray(annual_salary, dtype=float)
+    contributions = np.asarray(contributions, dtype=float)
+
+    t2, _ = calculate_t2_array(salary, contributions)
+    t3 = calculate_t3_array(t2, salary, age)
+    npv = npv_kernel(
+        salary, contributions, RETIREMENT_AGE - int(age), t3 / 100, t2=t2 / 100,
+        subsidy_rule='tiered', tax_rule='t2'
+    ).npv
+    return t2, t3, npv
+
+
+def _is_feasible(t3, npv, max_t3):
+    """约束：NPV > 0 且 T3 <= max_t3"""
+    return (npv > 0) & (t3 <= max_t3)
+
+
+def _personal_cap(annual_salary, t2):
+    """缴费搜索上界：个性化上限（公式5-5）与系统上限12000取小"""
+    return min(calculate_contribution_cap(annual_salary, t2)['cap'], 12000)
+
+
+def _search_optimal_caps(salaries, ages, upper, max_t3, step=CAP_GRID_STEP, tol=CAP_TOLERANCE):
+    """
+    批量搜索最大可行缴费额
+
+    1. 在 [0, upper] 上以 step 为步长的粗网格上一次性评估约束（工资 × 网格）
+    2. 取每行最后一个可行网格点 lo 与其后的第一个不可行点 hi
+    3. 对 [lo, hi] 区间上单调变化的约束做向量化二分，直至精度 tol
+
+    Returns:
+        tuple: (optimal, feasible_any, evaluations, iterations)
+    """
+    salaries = np.asarray(salaries, dtype=float)
+    ages = np.broadcast_to(np.asarray(ages, dtype=int), salaries.shape)
+    upper = np.asarray(upper, dtype=float)
+
+    grid = np.arange(0.0, float(upper.max()) + step, step)
+    grid_c = np.minimum(grid[None, :], upper[:, None])
+
+    feasible = np.zeros(grid_c.shape, dtype=bool)
+    for age in np.unique(ages):
+        rows = ages == age
+        t2, t3, npv = _evaluate_contributions(salaries[rows, None], grid_c[rows], age)
+        feasible[rows] = _is_feasible(t3, npv, max_t3)
+    evaluations = grid_c.size
+
+    feasible_any = feasible.any(axis=1)
+    last = np.where(feasible_any, grid_c.shape[1] - 1 - np.argmax(feasible[:, ::-1], axis=1), 0)
+    rows = np.arange(len(salaries))
+    lo = grid_c[rows, last]
+    hi = grid_c[rows, np.minimum(last + 1, grid_c.shape[1] - 1)]
+
+    # 仅对 "可行 → 不可行" 的区间二分；上界本身可行时 lo == hi
+    active = feasible_any & (hi > lo)
+    iterations = 0
+    while active.any() and np.max(hi[active] - lo[active]) > tol:
+        mid = (lo + hi) / 2
+        ok = np.zeros_like(active)
+        for age in np.unique(ages[active]):
+            sel = active & (ages == age)
+            _, t3, npv = _evaluate_contributions(salaries[sel], mid[sel], age)
+            ok[sel] = _is_feasible(t3, npv, max_t3)
+        lo = np.where(active & ok, mid, lo)
+        hi = np.where(active & ~ok, mid, hi)
+        evaluations += int(active.sum())
+        iterations += 1
+
+    optimal = np.where(feasible_any, np.floor(lo), 0.0)
+    return optimal, feasible_any, evaluations, iterations
+
+
 def calculate_optimal_cap(params: Dict[str, Any]) -> Dict[str, Any]:
     """
     计算最优缴费上限（避免T3风险）
     
     目标：找到使 NPV > 0 且 T3 <= 3% 的最大缴费额
+
+    在 [0, 个性化上限] 上先做粗网格扫描，再对约束边界做二分，
+    T3 使用 policy_utils 双逻辑模型（基于各缴费额对应的真实T2）。
+
+    参数:
+    - annualSalary: 年薪
+    - t2: T2节税率（%），用于确定个性化上限
+    - age: 当前年龄
+    - maxT3: T3约束上限（%，可选，默认3%）
     """
     salary = params['annualSalary']
-    t2 = params['t2']
+    t2 = params.get('t2')
     age = params['age']
-    
-    # 简化算法：根据收入水平设定安全上限
-    if salary >= 1000000:
-        safe_cap = 6000  # 百万年薪，保守缴费
-        reason = '超高收入群体，需严格控制T3风险'
-    elif salary >= 500000:
-        safe_cap = 8000  # 50万年薪，适度缴费
-        reason = '高收入群体，平衡税收优惠与T3税负'
-    elif salary >= 200000:
-        safe_cap = 10000  # 20万年薪，积极缴费
-        reason = '中高收入群体，充分利用税收优惠'
+    max_t3 = float(params.get('maxT3', MAX_T3_RATE))
+
+    upper = _personal_cap(salary, t2)
+    optimal, feasible_any, evaluations, iterations = _search_optimal_caps(
+        [salary], [age], [upper], max_t3
+    )
+    safe_cap = int(optimal[0])
+
+    # 评估最优点与上界处的指标，用于说明约束是否绑定
+    t2_at, t3_at, npv_at = _evaluate_contributions(salary, np.array([safe_cap, upper], dtype=float), age)
+    if not feasible_any[0]:
+        binding = 't3' if t3_at[1] > max_t3 else 'npv'
+        reason = (
+            f'任意缴费额下T3均高于{max_t3:g}%，建议暂不缴费或分散养老投资'
+            if binding == 't3' else '任意缴费额下NPV均不为正，缴费无净收益'
+        )
+    elif safe_cap >= upper:
+        binding = 'cap'
+        reason = f'个性化上限内NPV均为正且T3≤{max_t3:g}%，可缴满上限'
     else:
-        safe_cap = 12000  # 普通收入，上限缴费
-        reason = '普通收入群体，T3风险较低'
-    
+        _, t3_next, npv_next = _evaluate_contributions(salary, float(safe_cap + CAP_TOLERANCE), age)
+        binding = 't3' if t3_next > max_t3 else 'npv'
+        reason = (
+            f'缴费超过该值后T3将高于{max_t3:g}%'
+            if binding == 't3' else '缴费超过该值后NPV转负'
+        )
+
     return {
         'optimalCap': safe_cap,
         'reason': reason,
-        'estimatedT3': round(0.5 + (salary / 100000) * 0.3, 1),  # 简化估算
-        'safetyMargin': 12000 - safe_cap,
+        'estimatedT3': round(float(t3_at[0] if safe_cap > 0 else t3_at[1]), 2),
+        'safetyMargin': int(upper - safe_cap),
+        'details': {
+            'personalCap': int(upper),
+            'maxT3': max_t3,
+            'bindingConstraint': binding,
+            't2AtOptimal': round(float(t2_at[0]), 2),
+            'npvAtOptimal': round(float(npv_at[0]), 2),
+            'npvAtCap': round(float(npv_at[1]), 2),
+            'evaluations': evaluations,
+            'iterations': iterations
+        },
         'success': True
     }
 
 
+def calculate_optimal_cap_table(salaries, age: int, t2=None, max_t3: float = MAX_T3_RATE) -> Dict[str, Any]:
+    """
+    批量计算工资网格上的最优缴费上限（一次调用，向量化网格 + 向量化二分）
+
+    Args:
+        salaries: 年薪数组
+        age: 年龄
+        t2: 各工资对应的T2（%，可选）；缺省时使用缴费12000元时的真实T2
+        max_t3: T3约束上限（%）
+
+    Returns:
+        dict: 与 salaries 对齐的数组 {'salaries', 'optimalCap', 'estimatedT3', 'npv', 'personalCap'}
+    """
+    salaries = np.asarray(salaries, dtype=float)
+    if t2 is None:
+        t2 = calculate_t2_array(salaries, 12000)[0]
+    t2 = np.broadcast_to(np.asarray(t2, dtype=float), salaries.shape)
+
+    upper = np.array([_personal_cap(w, round(float(t), 2)) for w, t in zip(salaries, t2)])
+    optimal, feasible_any, _, _ = _search_optimal_caps(salaries, np.full(salaries.shape, age), upper, max_t3)
+
+    _, t3, npv = _evaluate_contributions(salaries, np.where(optimal > 0, optimal, upper), age)
+
+    return {
+        'salaries': salaries,
+        'optimalCap': optimal,
+        'personalCap': upper,
+        'estimatedT3': t3,
+        'npv': np.where(feasible_any, npv, 0.0),
+        'age': age,
+        'maxT3': max_t3
+    }
+
+
+def get_optimal_cap_table(salary_min: float, salary_max: float, salary_step: float,
+                          age: int, max_t3: float = MAX_T3_RATE) -> Dict[str, Any]:
+    """
+    预计算并缓存的最优上限表（以网格参数 + 当前政策参数版本为键）
+
+    查询时使用 lookup_optimal_cap 做最近网格点查找。
+    """
+    return _optimal_cap_table(salary_min, salary_max, salary_step, age, max_t3,
+                              current_parameter_set().version)
+
+
+@lru_cache(maxsize=64)
+def _optimal_cap_table(salary_min: float, salary_max: float, salary_step: float,
+                       age: int, max_t3: float, policy_version: str) -> Dict[str, Any]:
+    salaries = np.arange(salary_min, salary_max + salary_step, salary_step)
+    table = calculate_optimal_cap_table(salaries, age, max_t3=max_t3)
+    for arr in table.values():
+        if isinstance(arr, np.ndarray):
+            arr.setflags(write=False)
+    return table
+
+
+def lookup_optimal_cap(table: Dict[str, Any], annual_salary: float) -> float:
+    """在预计算表中查找最接近的工资网格点对应的最优上限"""
+    salaries = table['salaries']
+    idx = int(np.clip(np.searchsorted(salaries, annual_salary), 0, len(salaries) - 1))
+    if idx > 0 and abs(salaries[idx - 1] - annual_salary) <= abs(salaries[idx] - annual_salary):
+        idx -= 1
+    return float(table['optimalCap'][idx])
+
+
 if __name__ == '__main__':
     # 测试1: 低风险用户
     print("=== 测试1: 普通收入用户 ===")
@@ -286,3 +483,13 @@ if __name__ == '__main__':
     result3 = assess_t3_risk(test3)
     print(f"风险等级: {result3['riskLabel']} ({result3['riskScore']}分)")
     print(f"税率倒挂: T3({result3['monitoring']['t3']}%) > T2({result3['monitoring']['t2']}%)")
+    
+    # 测试4: 最优缴费上限（约束边界搜索）
+    print("\n=== 测试4: 最优缴费上限 ===")
+    for salary, t2 in [(40000, 0.0), (80000, 3.0), (150000, 10.0), (600000, 20.0)]:
+        result4 = calculate_optimal_cap({'annualSalary': salary, 't2': t2, 'age': 30})
+        print(f"年薪¥{salary:,}: 最优上限¥{result4['optimalCap']:,} "
+              f"(T3={result4['estimatedT3']}%, 约束={result4['details']['bindingConstraint']}) {result4['reason']}")
+    
+    table = get_optimal_cap_table(20000, 300000, 10000, 30)
+    print(f"上限表: {len(table['salaries'])}个工资网格点, 年薪¥95,000 → ¥{lookup_optimal_cap(table, 95000):,.0f}")
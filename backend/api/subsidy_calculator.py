@@ -15,6 +15,11 @@
 from dataclasses import dataclass
 from typing import Dict, Any
 
+import numpy as np
+
+from api.policy_registry import current_parameter_set
+from api.calc_context import request_memoized
+
 
 @dataclass
 class SubsidyParams:
@@ -44,10 +49,156 @@ class SubsidyParams:
     default_enroll: bool = True        # 默认纳入补贴体系
 
 
+def subsidy_kernel(
+    wage,
+    contribution,
+    base_grant,
+    c_min,
+    c_bar_1,
+    c_bar_2,
+    alpha_1,
+    alpha_2,
+    alpha_3,
+    taper_w_low,
+    taper_w_high,
+    taper_mode=True,
+    default_enroll=True
+) -> Dict[str, np.ndarray]:
+    """
+    三段式补贴数组内核（所有参数均可为数组，按NumPy广播规则组合）
+
+    calculate_subsidy_array、蒙特卡洛模拟与政策情景分析共用此内核，
+    参数可以是标量（单一政策）或列向量（政策参数网格 × 个体）；单值计算见 _subsidy_scalar。
+
+    返回未舍入的分量数组：
+        {'subsidy', 'tier1', 'tier2', 'tier3', 'taper', 'segment', 'triggered'}
+    """
+    w = np.asarray(wage, dtype=float)
+    c = np.asarray(contribution, dtype=float)
+
+    # 三段式配比（论文公式5-12），分段用clip表达，各段互不重叠
+    tier1 = alpha_1 * np.clip(c, 0.0, c_bar_1)
+    tier2 = alpha_2 * np.clip(c - c_bar_1, 0.0, np.subtract(c_bar_2, c_bar_1))
+    tier3 = alpha_3 * np.maximum(c - c_bar_2, 0.0)
+    segment = np.where(c <= c_bar_1, 1, np.where(c <= c_bar_2, 2, 3))
+
+    # 收入递减因子：≤w_low 全额，≥w_high 归零，中间线性
+    if taper_mode:
+        taper = np.clip(
+            np.subtract(taper_w_high, w) / np.subtract(taper_w_high, taper_w_low), 0.0, 1.0
+        )
+    else:
+        taper = np.ones_like(w)
+
+    triggered = (c >= c_min) & bool(default_enroll)
+    subsidy = np.where(triggered, (base_grant + (tier1 + tier2 + tier3)) * taper, 0.0)
+
+    return {
+        'subsidy': subsidy,
+        'tier1': tier1,
+        'tier2': tier2,
+        'tier3': tier3,
+        'taper': taper,
+        'segment': segment,
+        'triggered': triggered
+    }
+
+
+def calculate_subsidy_array(
+    annual_salary,
+    contribution_amount,
+    params: SubsidyParams = None,
+    components: bool = False
+):
+    """
+    向量化补贴计算（数组输入，用于人群模拟与批量接口）
+
+    参数:
+        annual_salary: 年工资收入（标量或数组）
+        contribution_amount: 缴费额（标量或数组）
+        params: 补贴参数配置
+        components: 为True时返回 subsidy_kernel 的全部分量
+
+    返回:
+        补贴金额数组（未舍入），或分量字典
+    """
+    if params is None:
+        params = current_parameter_set().subsidy_params
+
+    result = subsidy_kernel(
+        annual_salary,
+        contribution_amount,
+        params.base_grant,
+        params.c_min,
+        params.c_bar_1,
+        params.c_bar_2,
+        params.alpha_1,
+        params.alpha_2,
+        params.alpha_3,
+        params.taper_w_low,
+        params.taper_w_high,
+        taper_mode=params.taper_mode,
+        default_enroll=params.default_enroll
+    )
+    return result if components else result['subsidy']
+
+
+def _subsidy_scalar(wage: float, contribution: float, params: SubsidyParams) -> Dict[str, Any]:
+    """
+    单个 (年薪, 缴费额) 的补贴分量，与 subsidy_kernel 同口径（未舍入）
+
+    calculate_subsidy 的单值调用走纯 Python 算术，避免 0 维数组的开销；
+    数组与政策网格计算使用 subsidy_kernel。
+    """
+    c = contribution
+    tier1 = params.alpha_1 * min(max(c, 0.0), params.c_bar_1)
+    tier2 = params.alpha_2 * min(max(c - params.c_bar_1, 0.0), params.c_bar_2 - params.c_bar_1)
+    tier3 = params.alpha_3 * max(c - params.c_bar_2, 0.0)
+    segment = 1 if c <= params.c_bar_1 else (2 if c <= params.c_bar_2 else 3)
+
+    # 收入递减因子：≤w_low 全额，≥w_high 归零，中间线性
+    if params.taper_mode:
+        taper = (params.taper_w_high - wage) / (params.taper_w_high - params.taper_w_low)
+        taper = min(max(taper, 0.0), 1.0)
+    else:
+        taper = 1.0
+
+    triggered = c >= params.c_min and bool(params.default_enroll)
+    return {
+        'subsidy': (params.base_grant + (tier1 + tier2 + tier3)) * taper if triggered else 0.0,
+        'tier1': tier1,
+        'tier2': tier2,
+        'tier3': tier3,
+        'taper': taper,
+        'segment': segment,
+        'triggered': triggered
+    }
+
+
+def _build_breakdown(result: Dict[str, Any], params: SubsidyParams) -> Dict[str, Any]:
+    """由补贴分量生成补贴明细（仅在需要时调用）"""
+    taper_factor = result['taper']
+    return {
+        'base_grant': round(params.base_grant * taper_factor, 2),
+        'tier1_subsidy': round(result['tier1'] * taper_factor, 2),
+        'tier2_subsidy': round(result['tier2'] * taper_factor, 2),
+        'tier3_subsidy': round(result['tier3'] * taper_factor, 2),
+        'taper_factor': round(taper_factor, 3),
+        'segment': result['segment'],
+        'alpha_1': params.alpha_1,
+        'alpha_2': params.alpha_2,
+        'alpha_3': params.alpha_3,
+        'c_bar_1': params.c_bar_1,
+        'c_bar_2': params.c_bar_2
+    }
+
+
+@request_memoized
 def calculate_subsidy(
     annual_salary: float,
     contribution_amount: float,
-    params: SubsidyParams = None
+    params: SubsidyParams = None,
+    include_breakdown: bool = True
 ) -> Dict[str, Any]:
     """
     计算渐进式精准补贴 - 三段式模型（符合论文公式5-12）
@@ -61,6 +212,7 @@ def calculate_subsidy(
         annual_salary: 年工资收入（元）
         contribution_amount: 计划缴费额（元）
         params: 补贴参数配置
+        include_breakdown: 是否生成补贴明细（内部批量调用可关闭）
         
     返回:
         {
@@ -68,7 +220,7 @@ def calculate_subsidy(
             'c_effective': 实际生效缴费（元）,
             'ratio': 补贴率（%）,
             'triggered': 是否触发补贴（bool）,
-            'breakdown': {  # 补贴明细
+            'breakdown': {  # 补贴明细（include_breakdown=True时）
                 'base_grant': 固定补贴（元）,
                 'tier1_subsidy': 第一段补贴（元）,
                 'tier2_subsidy': 第二段补贴（元）,
@@ -79,98 +231,37 @@ def calculate_subsidy(
         }
     """
     if params is None:
-        params = SubsidyParams()
+        params = current_parameter_set().subsidy_params
     
-    # 1. 默认参与检查
-    if not params.default_enroll:
-        return {
-            'subsidy': 0.0,
-            'c_effective': 0.0,
-            'ratio': 0.0,
-            'triggered': False,
-            'breakdown': {}
-        }
-    
-    # 2. 最低缴费门槛检查
     c_eff = float(contribution_amount)
-    if c_eff < params.c_min:
-        return {
+    result = _subsidy_scalar(float(annual_salary), c_eff, params)
+    
+    # 1. 默认参与检查 / 2. 最低缴费门槛检查
+    if not result['triggered']:
+        output = {
             'subsidy': 0.0,
-            'c_effective': c_eff,
+            'c_effective': c_eff if params.default_enroll else 0.0,
             'ratio': 0.0,
-            'triggered': False,
-            'breakdown': {
-                'reason': f'缴费额{c_eff:.0f}元低于最低门槛{params.c_min:.0f}元'
-            }
+            'triggered': False
         }
+        if include_breakdown:
+            output['breakdown'] = {
+                'reason': f'缴费额{c_eff:.0f}元低于最低门槛{params.c_min:.0f}元'
+            } if params.default_enroll else {}
+        return output
     
-    wage = float(annual_salary)
-    
-    # 3. 三段式补贴计算（论文公式5-12）
-    tier1_subsidy = 0.0
-    tier2_subsidy = 0.0
-    tier3_subsidy = 0.0
-    segment = 0
-    
-    if c_eff <= params.c_bar_1:
-        # 第一段：0 < C ≤ C̅₁，配比率 α₁ = 45%
-        tier1_subsidy = params.alpha_1 * c_eff
-        segment = 1
-    elif c_eff <= params.c_bar_2:
-        # 第二段：C̅₁ < C ≤ C̅₂，配比率 α₂ = 30%
-        tier1_subsidy = params.alpha_1 * params.c_bar_1
-        tier2_subsidy = params.alpha_2 * (c_eff - params.c_bar_1)
-        segment = 2
-    else:
-        # 第三段：C > C̅₂，配比率 α₃ = 6%
-        tier1_subsidy = params.alpha_1 * params.c_bar_1
-        tier2_subsidy = params.alpha_2 * (params.c_bar_2 - params.c_bar_1)
-        tier3_subsidy = params.alpha_3 * (c_eff - params.c_bar_2)
-        segment = 3
-    
-    # 配比补贴总额
-    match_subsidy = tier1_subsidy + tier2_subsidy + tier3_subsidy
-    
-    # 4. 固定补贴 + 配比补贴
-    subsidy_raw = params.base_grant + match_subsidy
-    
-    # 5. 收入递减调整
-    taper_factor = 1.0
-    if params.taper_mode:
-        if wage <= params.taper_w_low:
-            taper_factor = 1.0  # 全额补贴
-        elif wage >= params.taper_w_high:
-            taper_factor = 0.0  # 补贴归零
-        else:
-            # 线性递减
-            taper_factor = (params.taper_w_high - wage) / (
-                params.taper_w_high - params.taper_w_low
-            )
-    
-    subsidy_final = subsidy_raw * taper_factor
-    
-    # 6. 计算补贴率
+    subsidy_final = result['subsidy']
     ratio = (subsidy_final / c_eff * 100) if c_eff > 0 else 0.0
     
-    return {
+    output = {
         'subsidy': round(subsidy_final, 2),
         'c_effective': round(c_eff, 2),
         'ratio': round(ratio, 2),
-        'triggered': True,
-        'breakdown': {
-            'base_grant': round(params.base_grant * taper_factor, 2),
-            'tier1_subsidy': round(tier1_subsidy * taper_factor, 2),
-            'tier2_subsidy': round(tier2_subsidy * taper_factor, 2),
-            'tier3_subsidy': round(tier3_subsidy * taper_factor, 2),
-            'taper_factor': round(taper_factor, 3),
-            'segment': segment,
-            'alpha_1': params.alpha_1,
-            'alpha_2': params.alpha_2,
-            'alpha_3': params.alpha_3,
-            'c_bar_1': params.c_bar_1,
-            'c_bar_2': params.c_bar_2
-        }
+        'triggered': True
     }
+    if include_breakdown:
+        output['breakdown'] = _build_breakdown(result, params)
+    return output
 
 
 def get_subsidy_explanation(result: Dict[str, Any], annual_salary: float) -> str:
@@ -226,6 +317,7 @@ def get_subsidy_explanation(result: Dict[str, Any], annual_salary: float) -> str
     return "\n".join(lines)
 
 
+@request_memoized
 def get_subsidy_tier_info(annual_salary: float) -> Dict[str, Any]:
     """
     获取用户的补贴档位信息（用于前端显示）
@@ -236,7 +328,7 @@ def get_subsidy_tier_info(annual_salary: float) -> Dict[str, Any]:
     返回:
         补贴档位信息字典
     """
-    params = SubsidyParams()
+    params = current_parameter_set().subsidy_params
     
     # 判断收入层次（基于taper机制）
     low_income_threshold = params.taper_w_low  # 40000元
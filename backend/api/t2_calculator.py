@@ -2,8 +2,18 @@
 T2平均节税率计算模块
 实现蓝浩歌模型核心公式: T2 = 节税额 / 缴费额
 """
+import sys
+import os
 import math
 
+import numpy as np
+
+# 添加父目录到路径以支持独立测试
+if __name__ == '__main__':
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.calc_context import request_memoized
+
 
 # 中国个人所得税税率表（综合所得年度税率）
 TAX_BRACKETS = [
@@ -74,6 +84,55 @@ def calculate_tax_from_taxable_income(taxable_income):
     return accumulated_tax
 
 
+def calculate_tax_array(taxable_income):
+    """
+    向量化的超额累进个税计算（与 calculate_tax_from_taxable_income 等价）
+
+    Args:
+        taxable_income: 应纳税所得额（标量或数组）
+
+    Returns:
+        np.ndarray: 应纳税额，形状与输入一致
+    """
+    x = np.maximum(np.asarray(taxable_income, dtype=float), 0.0)
+    tax = np.zeros_like(x)
+
+    prev_threshold = 0.0
+    for threshold, rate in TAX_BRACKETS:
+        # 本档应税金额 = clip(x - 下限, 0, 档宽)
+        tax += rate * np.clip(x - prev_threshold, 0.0, threshold - prev_threshold)
+        prev_threshold = threshold
+
+    return tax
+
+
+def calculate_t2_array(annual_salary, contribution_amount):
+    """
+    向量化的T2计算（与 calculate_t2_for_contribution 的 t2/taxSaving 字段等价，未四舍五入）
+
+    年薪与缴费额按NumPy广播规则组合，可一次性评估"工资网格 × 缴费网格"。
+
+    Args:
+        annual_salary: 年薪（标量或数组）
+        contribution_amount: 缴费额（标量或数组）
+
+    Returns:
+        tuple: (t2 (%), tax_saving (元))，均为 np.ndarray
+    """
+    salary = np.asarray(annual_salary, dtype=float)
+    contribution = np.minimum(np.asarray(contribution_amount, dtype=float), 12000)
+
+    tax_no_pension = calculate_tax_array(salary - 60000)
+    tax_with_pension = calculate_tax_array(salary - 60000 - contribution)
+    tax_saving = tax_no_pension - tax_with_pension
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t2 = np.where(contribution > 0, tax_saving / contribution * 100, 0.0)
+
+    return t2, tax_saving
+
+
+@request_memoized
 def calculate_t2_for_contribution(annual_salary, contribution_amount):
     """
     根据缴费额计算对应的T2平均节税率（蓝浩歌模型核心公式）
@@ -144,6 +203,7 @@ def calculate_t2_for_contribution(annual_salary, contribution_amount):
     }
 
 
+@request_memoized
 def calculate_t2(age, annual_salary, wage_growth_rate):
     """
     计算T2平均节税率（简化版，假设固定缴费12000）
@@ -7,8 +7,8 @@ from api.policy_utils import calculate_t3 as _calculate_t3
 
 
 def calculate_t3(t2, annual_salary, age):
-    """兼容旧签名的包装，返回和旧实现相同格式的 dict。"""
-    return _calculate_t3(t2, annual_salary, age)
+    """兼容旧签名的包装，返回和旧实现相同格式的 dict（精简模式，不回显参数）。"""
+    return _calculate_t3(t2, annual_salary, age, lean=True)
 
 
 # 测试函数
@@ -9,6 +9,8 @@
 """
 import json
 import os
+import time
+import asyncio
 from datetime import datetime
 
 try:
@@ -74,46 +76,36 @@ def get_age_multiplier(age):
         return 0.7  # 接近退休，增长放缓
 
 
-def ai_deep_thinking_prediction(age, annual_salary, industry, job_level, base_prediction):
-    """
-    AI深度思考增强预测
-    
-    使用AI分析宏观经济环境、行业趋势、政策影响等因素，
-    对基础预测进行智能调整
-    
-    Args:
-        age: 年龄
-        annual_salary: 年薪
-        industry: 行业类型
-        job_level: 职级
-        base_prediction: 基础预测增长率
-        
-    Returns:
-        dict: AI分析结果
-    """
+def _ai_unavailable(base_prediction, message, error=None):
+    """AI 不可用或调用失败时回退到基础预测"""
+    result = {
+        'aiAdjustedGrowth': base_prediction,
+        'aiInsights': [message],
+        'confidence': 0.7,
+        'available': False
+    }
+    if error is not None:
+        result['error'] = error
+    return result
+
+
+def _ai_precheck(base_prediction):
+    """检查 AI 是否可用并配置 API 密钥；不可用时返回回退结果，否则返回 None"""
     if not OPENAI_AVAILABLE:
-        return {
-            'aiAdjustedGrowth': base_prediction,
-            'aiInsights': ['AI功能未启用，使用基础预测'],
-            'confidence': 0.7,
-            'available': False
-        }
+        return _ai_unavailable(base_prediction, 'AI功能未启用，使用基础预测')
     
-    try:
-        # 配置OpenAI API（需要在环境变量中设置OPENAI_API_KEY）
-        api_key = os.getenv('OPENAI_API_KEY')
-        if not api_key:
-            return {
-                'aiAdjustedGrowth': base_prediction,
-                'aiInsights': ['未配置OpenAI API密钥'],
-                'confidence': 0.7,
-                'available': False
-            }
-        
-        openai.api_key = api_key
-        
-        # 构建AI分析提示词
-        prompt = f"""你是一位资深的人力资源和薪酬分析专家。请基于以下信息，深度分析该员工未来3-5年的工资增长趋势：
+    # 配置OpenAI API（需要在环境变量中设置OPENAI_API_KEY）
+    api_key = os.getenv('OPENAI_API_KEY')
+    if not api_key:
+        return _ai_unavailable(base_prediction, '未配置OpenAI API密钥')
+    
+    openai.api_key = api_key
+    return None
+
+
+def _build_ai_prompt(age, annual_salary, industry, job_level, base_prediction):
+    """构建AI分析提示词"""
+    return f"""你是一位资深的人力资源和薪酬分析专家。请基于以下信息，深度分析该员工未来3-5年的工资增长趋势：
 
 **个人信息**：
 - 年龄：{age}岁
@@ -143,38 +135,128 @@ def ai_deep_thinking_prediction(age, annual_salary, industry, job_level, base_pr
     "reasoning": "简要推理过程（不超过100字）"
 }}"""
 
-        # 调用OpenAI API（使用较新的聊天模型）
-        response = openai.ChatCompletion.create(
-            model="gpt-4",  # 或 "gpt-3.5-turbo"
-            messages=[
-                {"role": "system", "content": "你是一位专业的薪酬分析专家，擅长基于多维度信息预测工资增长趋势。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,  # 降低随机性，提高预测稳定性
-            max_tokens=500
-        )
-        
-        # 解析AI返回的JSON
-        ai_result = json.loads(response.choices[0].message.content)
+
+def _ai_request_kwargs(prompt):
+    """ChatCompletion 请求参数（同步 create 与异步 acreate 共用）"""
+    return dict(
+        model="gpt-4",  # 或 "gpt-3.5-turbo"
+        messages=[
+            {"role": "system", "content": "你是一位专业的薪酬分析专家，擅长基于多维度信息预测工资增长趋势。"},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.3,  # 降低随机性，提高预测稳定性
+        max_tokens=500
+    )
+
+
+def _parse_ai_response(response, base_prediction):
+    """解析AI返回的JSON"""
+    ai_result = json.loads(response.choices[0].message.content)
+    
+    return {
+        'aiAdjustedGrowth': round(ai_result.get('adjustedGrowth', base_prediction), 2),
+        'aiInsights': ai_result.get('insights', []),
+        'confidence': round(ai_result.get('confidence', 0.85), 2),
+        'reasoning': ai_result.get('reasoning', ''),
+        'available': True,
+        'model': 'GPT-4'
+    }
+
+
+def ai_deep_thinking_prediction(age, annual_salary, industry, job_level, base_prediction):
+    """
+    AI深度思考增强预测
+    
+    使用AI分析宏观经济环境、行业趋势、政策影响等因素，
+    对基础预测进行智能调整
+    
+    Args:
+        age: 年龄
+        annual_salary: 年薪
+        industry: 行业类型
+        job_level: 职级
+        base_prediction: 基础预测增长率
         
-        return {
-            'aiAdjustedGrowth': round(ai_result.get('adjustedGrowth', base_prediction), 2),
-            'aiInsights': ai_result.get('insights', []),
-            'confidence': round(ai_result.get('confidence', 0.85), 2),
-            'reasoning': ai_result.get('reasoning', ''),
-            'available': True,
-            'model': 'GPT-4'
-        }
+    Returns:
+        dict: AI分析结果
+    """
+    if _llm_stub_enabled():
+        return llm_stub_prediction(base_prediction)
+    
+    unavailable = _ai_precheck(base_prediction)
+    if unavailable is not None:
+        return unavailable
+    
+    try:
+        prompt = _build_ai_prompt(age, annual_salary, industry, job_level, base_prediction)
+        # 调用OpenAI API（使用较新的聊天模型）
+        response = openai.ChatCompletion.create(**_ai_request_kwargs(prompt))
+        return _parse_ai_response(response, base_prediction)
         
     except Exception as e:
         # AI调用失败，回退到基础预测
-        return {
-            'aiAdjustedGrowth': base_prediction,
-            'aiInsights': [f'AI分析暂时不可用：{str(e)}'],
-            'confidence': 0.7,
-            'available': False,
-            'error': str(e)
-        }
+        return _ai_unavailable(base_prediction, f'AI分析暂时不可用：{str(e)}', error=str(e))
+
+
+async def ai_deep_thinking_prediction_async(age, annual_salary, industry, job_level, base_prediction):
+    """
+    ai_deep_thinking_prediction 的异步版本（ASGI 模式使用）
+    
+    等待上游模型响应期间不占用线程；桩模式下用 asyncio.sleep 模拟耗时。
+    """
+    if _llm_stub_enabled():
+        return await llm_stub_prediction_async(base_prediction)
+    
+    unavailable = _ai_precheck(base_prediction)
+    if unavailable is not None:
+        return unavailable
+    
+    try:
+        prompt = _build_ai_prompt(age, annual_salary, industry, job_level, base_prediction)
+        response = await openai.ChatCompletion.acreate(**_ai_request_kwargs(prompt))
+        return _parse_ai_response(response, base_prediction)
+        
+    except Exception as e:
+        return _ai_unavailable(base_prediction, f'AI分析暂时不可用：{str(e)}', error=str(e))
+
+
+def _llm_stub_enabled():
+    return os.getenv('LLM_STUB', '').lower() in ('1', 'true', 'yes')
+
+
+def _llm_stub_latency():
+    return float(os.getenv('LLM_STUB_LATENCY_MS', '0')) / 1000.0
+
+
+def _llm_stub_result(base_prediction):
+    return {
+        'aiAdjustedGrowth': base_prediction,
+        'aiInsights': ['LLM桩：未调用外部模型'],
+        'confidence': 0.75,
+        'available': True,
+        'model': 'stub'
+    }
+
+
+def llm_stub_prediction(base_prediction):
+    """
+    LLM 桩（压测/离线环境使用，设置环境变量 LLM_STUB=1 启用）
+    
+    不访问外部API，按 LLM_STUB_LATENCY_MS（默认0）模拟调用耗时，
+    返回与基础预测一致的确定性结果。
+    """
+    latency = _llm_stub_latency()
+    if latency > 0:
+        time.sleep(latency)
+    return _llm_stub_result(base_prediction)
+
+
+async def llm_stub_prediction_async(base_prediction):
+    """llm_stub_prediction 的异步版本"""
+    latency = _llm_stub_latency()
+    if latency > 0:
+        await asyncio.sleep(latency)
+    return _llm_stub_result(base_prediction)
 
 
 def web_search_enhancement(industry, job_level):
@@ -310,6 +392,43 @@ def predict_wage_growth(age, annual_salary, industry, job_level, enable_ai=True,
         }
     """
     # === 第一层：基础预测 ===
+    base = _base_prediction(age, annual_salary, industry, job_level)
+    
+    # === 第二层：AI深度思考 ===
+    ai_result = None
+    if enable_ai:
+        ai_result = ai_deep_thinking_prediction(age, annual_salary, industry, job_level, base['predicted'])
+    
+    # === 第三层：联网搜索 ===
+    web_result = None
+    if enable_web_search:
+        web_result = web_search_enhancement(industry, job_level)
+    
+    return _combine_predictions(annual_salary, industry, base, ai_result, web_result)
+
+
+async def predict_wage_growth_async(age, annual_salary, industry, job_level, enable_ai=True, enable_web_search=True):
+    """
+    predict_wage_growth 的异步版本：AI深度思考以 await 方式调用上游模型，
+    其余层与同步版本相同，返回格式一致
+    """
+    base = _base_prediction(age, annual_salary, industry, job_level)
+    
+    ai_result = None
+    if enable_ai:
+        ai_result = await ai_deep_thinking_prediction_async(
+            age, annual_salary, industry, job_level, base['predicted']
+        )
+    
+    web_result = None
+    if enable_web_search:
+        web_result = web_search_enhancement(industry, job_level)
+    
+    return _combine_predictions(annual_salary, industry, base, ai_result, web_result)
+
+
+def _base_prediction(age, annual_salary, industry, job_level):
+    """第一层：基础预测（行业 × 职级 × 年龄 × 薪资水平）"""
     # 获取基础行业增长率
     base_growth = INDUSTRY_GROWTH_RATES.get(industry, 3.5)
     
@@ -334,15 +453,22 @@ def predict_wage_growth(age, annual_salary, industry, job_level, enable_ai=True,
     base_predicted_growth = base_growth * level_multiplier * age_multiplier * salary_multiplier
     base_predicted_growth = max(0.5, min(10.0, base_predicted_growth))
     
-    # === 第二层：AI深度思考 ===
-    ai_result = None
-    if enable_ai:
-        ai_result = ai_deep_thinking_prediction(age, annual_salary, industry, job_level, base_predicted_growth)
-    
-    # === 第三层：联网搜索 ===
-    web_result = None
-    if enable_web_search:
-        web_result = web_search_enhancement(industry, job_level)
+    return {
+        'growth': base_growth,
+        'levelMultiplier': level_multiplier,
+        'ageMultiplier': age_multiplier,
+        'salaryMultiplier': salary_multiplier,
+        'predicted': base_predicted_growth
+    }
+
+
+def _combine_predictions(annual_salary, industry, base, ai_result, web_result):
+    """综合三层预测结果，计算最终增长率、置信度与方法说明"""
+    base_growth = base['growth']
+    level_multiplier = base['levelMultiplier']
+    age_multiplier = base['ageMultiplier']
+    salary_multiplier = base['salaryMultiplier']
+    base_predicted_growth = base['predicted']
     
     # === 综合决策 ===
     # 权重分配：基础预测40% + AI分析40% + 联网搜索20%
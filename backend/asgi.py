@@ -0,0 +1,260 @@
+"""
+ASGI 入口：异步服务模式（与 gunicorn + main:app 的同步部署并存）
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+同步部署下，依赖大模型的 /api/predict-wage-growth 会在等待上游响应的数秒内占住整个 worker。
+异步模式在同一进程内分流：
+- I/O 密集路由（ASYNC_ROUTES）原生异步处理，等待上游模型时不占线程；
+  同时在途的上游调用数不超过 LLM_MAX_CONCURRENCY
+- 其余路由（CPU 密集的计算器）交给 Flask 应用，在 ASGI_CPU_THREADS 个线程的有界线程池中执行，
+  请求钩子、响应缓存、压缩与流式输出与同步部署一致
+
+/api/ai-suggestions 是规则引擎，不访问上游服务，因此同样走计算线程池。
+"""
+
+import os
+import io
+import json
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Tuple
+
+from main import app as flask_app, POLICY_VERSION_HEADER, COMPUTE_POOL
+from api.path_reports import wage_growth_report_async
+from api.policy_registry import get_registry
+from api.metrics import observe_request, REQUESTS_IN_FLIGHT
+
+
+ASGI_CPU_THREADS = int(os.getenv('ASGI_CPU_THREADS', min(32, (os.cpu_count() or 1) + 4)))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 64))
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            break
+    return b''.join(chunks)
+
+
+def _build_environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    """把 ASGI HTTP scope 转换为 WSGI environ"""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f'HTTP_{key}'
+        value = value.decode('latin-1')
+        if key.startswith('HTTP_') and key in environ:
+            value = f'{environ[key]},{value}'
+        environ[key] = value
+    return environ
+
+
+class WSGIBridge:
+    """
+    在有界线程池中运行 WSGI 应用
+
+    每个请求占用池中一个线程直至响应体迭代完毕；响应体逐块转发，
+    流式输出（NDJSON / SSE）保持流式。每个请求在全新的 contextvars 上下文中执行。
+    """
+
+    def __init__(self, wsgi_app, executor: ThreadPoolExecutor):
+        self.wsgi_app = wsgi_app
+        self.executor = executor
+
+    async def __call__(self, scope, receive, send):
+        environ = _build_environ(scope, await _read_body(receive))
+        loop = asyncio.get_running_loop()
+        messages: asyncio.Queue = asyncio.Queue()
+
+        def emit(message):
+            loop.call_soon_threadsafe(messages.put_nowait, message)
+
+        def run():
+            state = {}
+
+            def start_response(status, headers, exc_info=None):
+                state['start'] = {
+                    'type': 'http.response.start',
+                    'status': int(status.split(' ', 1)[0]),
+                    'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+                }
+                return lambda data: emit_body(data)
+
+            def emit_body(data, more_body=True):
+                if 'start' in state:
+                    emit(state.pop('start'))
+                if data or not more_body:
+                    emit({'type': 'http.response.body', 'body': data, 'more_body': more_body})
+
+            try:
+                result = self.wsgi_app(environ, start_response)
+                try:
+                    for chunk in result:
+                        emit_body(chunk)
+                finally:
+                    if hasattr(result, 'close'):
+                        result.close()
+                emit_body(b'', more_body=False)
+            except Exception as e:
+                emit(e)
+
+        loop.run_in_executor(self.executor, contextvars.Context().run, run)
+
+        started = False
+        while True:
+            message = await messages.get()
+            if isinstance(message, Exception):
+                if not started:
+                    await _send_json(send, 500, {'error': str(message)})
+                else:
+                    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+                return
+            started = True
+            await send(message)
+            if message['type'] == 'http.response.body' and not message['more_body']:
+                return
+
+
+async def _send_json(send, status: int, payload: Any, headers: Tuple = ()):
+    body = flask_app.json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            *headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class AsyncServingApp:
+    """ASGI 应用：I/O 密集路由原生异步处理，其余路由经 WSGIBridge 交给 Flask"""
+
+    ASYNC_ROUTES = {
+        ('POST', '/api/predict-wage-growth'): 'predict_wage_growth',
+    }
+
+    def __init__(self, wsgi_app, cpu_threads: int = ASGI_CPU_THREADS,
+                 llm_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.cpu_pool = ThreadPoolExecutor(max_workers=cpu_threads, thread_name_prefix='cpu')
+        self.llm_slots = asyncio.Semaphore(llm_concurrency)
+        self.flask = WSGIBridge(wsgi_app, self.cpu_pool)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        handler = self.ASYNC_ROUTES.get((scope['method'], scope['path']))
+        if handler is None:
+            await self.flask(scope, receive, send)
+            return
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        status, body = 500, b''
+        try:
+            body = await _read_body(receive)
+            headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+            status, payload, extra_headers = await self._dispatch(handler, headers, body)
+            if 'origin' in headers:
+                # 与 Flask-CORS 默认配置一致
+                extra_headers.append((b'access-control-allow-origin', b'*'))
+            await _send_json(send, status, payload, tuple(extra_headers))
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            observe_request(route=scope['path'], method=scope['method'], status=status,
+                            duration=time.perf_counter() - started, request_bytes=len(body),
+                            response_bytes=None)
+
+    async def _dispatch(self, handler: str, headers: Dict[str, str], body: bytes):
+        # 与同步部署一致：按请求头解析政策参数版本并回写
+        requested = headers.get(POLICY_VERSION_HEADER.lower())
+        try:
+            param_set = get_registry().resolve(requested) if requested else get_registry().active()
+        except KeyError as e:
+            return 400, {'error': str(e.args[0])}, []
+        version_header = [(POLICY_VERSION_HEADER.lower().encode('latin-1'), param_set.tag.encode('latin-1'))]
+
+        try:
+            data = json.loads(body or b'null')
+        except ValueError as e:
+            return 400, {'error': f'请求体不是有效的JSON: {e}'}, version_header
+        if not isinstance(data, dict):
+            return 400, {'error': '请求体必须是JSON对象'}, version_header
+
+        status, payload = await getattr(self, handler)(data)
+        return status, payload, version_header
+
+    async def predict_wage_growth(self, data: Dict[str, Any]):
+        """/api/predict-wage-growth 的异步实现（请求/响应格式与 main.api_predict_wage_growth 相同）"""
+        try:
+            for field in ['age', 'annualSalary', 'industry', 'jobLevel']:
+                if field not in data:
+                    return 400, {'error': f'缺少必填字段: {field}'}
+
+            async with self.llm_slots:
+                response = await wage_growth_report_async(
+                    age=data['age'],
+                    annual_salary=data['annualSalary'],
+                    industry=data['industry'],
+                    job_level=data['jobLevel']
+                )
+            return 200, response
+
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # 预热计算进程池，首个请求无需等待工作进程启动
+                await asyncio.get_running_loop().run_in_executor(self.cpu_pool, COMPUTE_POOL.start)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.cpu_pool.shutdown(wait=True)
+                COMPUTE_POOL.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = AsyncServingApp(flask_app)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.getenv('PORT', 8000)), log_level='info')
@@ -0,0 +1,450 @@
+"""
+计算函数基准：单次调用（scalar）与批量（batch，BATCH_SIZE 个样本的循环或数组内核）
+"""
+
+import os
+import json
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import BATCH_SIZE
+from payloads import T3_BATCH, LIFECYCLE, LIFECYCLE_STOCHASTIC, FISCAL, HISTORY_MEDIUM, FIVE_TIER, FIVE_TIER_CURVE, NPV_CURVE
+from api.t2_calculator import calculate_t2_for_contribution, calculate_t2_array
+from api.subsidy_calculator import calculate_subsidy, calculate_subsidy_array
+from api.cap_calculator import (
+    calculate_contribution_cap, calculate_cap_array, salary_range_for_cap, crossover_wage, crossover_t2
+)
+from api.policy_utils import calculate_t3, calculate_t3_array, calculate_t3_batch
+from api.contribution_optimizer import optimize_contribution
+from api.contribution_suggestions import generate_5tier_suggestions, calculate_npv_simple
+from api.history_diagnosis import diagnose_history
+from api.lifecycle_visualization import generate_lifecycle_data
+from api.fiscal_neutral_npv import calculate_government_cash_flow, optimize_fiscal_neutral_contribution
+from api.npv_calculator import calculate_npv
+from api.return_process import parse_return_process
+from api.npv_kernel import npv_kernel
+from api.npv_curve import calculate_npv_curve
+from api.fixed_point_solver import solve_fixed_point
+from api.profile_index import build_profile_index, lookup_profile
+from api.path_reports import optimization_report
+from api.calc_context import calculation_context
+from api import policy_whatif
+from api.policy_whatif import (
+    run_policy_whatif, count_evaluations, generate_population, build_param_grid, evaluate_policy_grid,
+    MAX_GRID_POINTS, MAX_EVALUATIONS
+)
+
+
+# ---------- T2 ----------
+
+@pytest.mark.benchmark(group='t2')
+def test_t2_scalar(benchmark):
+    result = benchmark(calculate_t2_for_contribution, 150000, 12000)
+    assert result['t2'] > 0
+
+
+@pytest.mark.benchmark(group='t2')
+def test_t2_batch(benchmark, batch_pairs):
+    results = benchmark(lambda: [calculate_t2_for_contribution(w, c) for w, c in batch_pairs])
+    assert len(results) == BATCH_SIZE
+
+
+# ---------- 补贴 ----------
+
+@pytest.mark.benchmark(group='subsidy')
+def test_subsidy_scalar(benchmark):
+    result = benchmark(calculate_subsidy, 70000, 8000)
+    assert result['subsidy'] >= 0
+
+
+@pytest.mark.benchmark(group='subsidy')
+def test_subsidy_batch(benchmark, batch_pairs):
+    results = benchmark(lambda: [calculate_subsidy(w, c, include_breakdown=False) for w, c in batch_pairs])
+    assert len(results) == BATCH_SIZE
+
+
+@pytest.mark.benchmark(group='subsidy')
+def test_subsidy_array(benchmark, salaries, contributions):
+    result = benchmark(calculate_subsidy_array, salaries, contributions)
+    assert result.shape == salaries.shape
+
+
+# ---------- 缴费上限 ----------
+
+@pytest.fixture(scope='module')
+def t2_rates(salaries, contributions):
+    """各样本按其缴费额计算的真实T2（%），上限走主路径而非缺省T2的回退分支"""
+    return calculate_t2_array(salaries, contributions)[0]
+
+
+@pytest.mark.benchmark(group='cap')
+def test_cap_scalar(benchmark):
+    result = benchmark(calculate_contribution_cap, 150000, 10.0)
+    assert result['cap'] > 0
+
+
+@pytest.mark.benchmark(group='cap')
+def test_cap_batch(benchmark, batch_pairs, t2_rates):
+    cases = [(w, t2) for (w, _), t2 in zip(batch_pairs, t2_rates[:BATCH_SIZE].tolist())]
+    results = benchmark(lambda: [calculate_contribution_cap(w, t2) for w, t2 in cases])
+    assert len(results) == BATCH_SIZE
+    assert all(r['strategy'] == 'min_dynamic_vs_fixed' for r in results)
+
+
+@pytest.mark.benchmark(group='cap')
+def test_cap_array(benchmark, salaries, t2_rates):
+    result = benchmark(calculate_cap_array, salaries, t2_rates)
+    assert result.shape == salaries.shape
+
+
+def test_cap_array_matches_scalar():
+    wages = np.array([30000, 80000, 150000, 250000, 500000, 1000000])
+    for t2 in (0.0, 4.0, 10.0, 25.0):
+        expected = [calculate_contribution_cap(w, t2)['cap'] for w in wages]
+        assert np.round(calculate_cap_array(wages, t2)).tolist() == expected
+
+
+def test_cap_inverse_queries():
+    t2 = np.array([5.0, 10.0, 20.0, 30.0])
+    w_cross = crossover_wage(t2)
+    caps = calculate_cap_array(w_cross, t2)
+    np.testing.assert_allclose(caps, 0.08 * w_cross, rtol=1e-9)
+    np.testing.assert_allclose(crossover_t2(w_cross[:3]), t2[:3], atol=1e-6)
+
+    # 上限在区间端点等于 X、区间内 ≥ X；X 超过最高上限时区间为空
+    w_low, w_high = salary_range_for_cap(np.array([12000.0, 36000.0, 60000.0]), 20.0)
+    assert np.isinf(w_high[0]) and np.isnan(w_low[2])
+    np.testing.assert_allclose(calculate_cap_array(np.array([w_low[1], w_high[1]]), 20.0), 36000.0, rtol=1e-9)
+    inside = np.linspace(w_low[1], w_high[1], 50)
+    assert (calculate_cap_array(inside, 20.0) >= 36000.0 * (1 - 1e-9)).all()
+
+
+def test_request_memoized_returns_independent_copies():
+    with calculation_context():
+        first = calculate_contribution_cap(150000, 10.0)
+        first['details']['finalCap'] = -1
+        second = calculate_contribution_cap(150000, 10.0)
+    assert second['details']['finalCap'] == second['cap'] != -1
+
+
+@pytest.mark.benchmark(group='cap')
+def test_cap_bands(benchmark):
+    levels = np.arange(1000, 72001, 1000, dtype=float)[:, None]
+    t2 = np.linspace(0, 45, 451)[None, :]
+    w_low, w_high = benchmark(salary_range_for_cap, levels, t2)
+    assert w_low.shape == w_high.shape == (levels.size, t2.size)
+
+
+def test_fixed_point_consistent(salaries):
+    desired = salaries * 0.15
+    result = solve_fixed_point(salaries, desired, 35)
+    assert result.converged.all()
+    t2, _ = calculate_t2_array(salaries, result.contribution)
+    np.testing.assert_allclose(result.t2, t2)
+    np.testing.assert_allclose(result.cap, calculate_cap_array(salaries, result.t2))
+    np.testing.assert_allclose(result.contribution, np.minimum(desired, result.cap), atol=0.01)
+    np.testing.assert_allclose(result.t3, calculate_t3_array(result.t2, salaries, 35))
+
+
+def test_fixed_point_oscillating_map():
+    # f(C) = min(D, 2w - 2C)：直接迭代发散，区间中点保护后收敛到 C = 2w/3
+    wages = np.array([30000.0, 90000.0])
+    result = solve_fixed_point(wages, 1e9, t2_fn=lambda w, c: 1 - c / w, cap_fn=lambda w, t2: 2 * w * t2,
+                               t3_fn=lambda t2, w, age: t2)
+    assert result.converged.all()
+    np.testing.assert_allclose(result.contribution, 2 * wages / 3, atol=0.01)
+
+
+@pytest.mark.benchmark(group='cap')
+def test_fixed_point_population(benchmark, salaries):
+    result = benchmark(solve_fixed_point, salaries, salaries * 0.15, 35)
+    assert result.diagnostics()['converged']
+
+
+# ---------- T3 ----------
+
+@pytest.mark.benchmark(group='t3')
+def test_t3_scalar(benchmark):
+    result = benchmark(calculate_t3, 1.4, 150000, 30)
+    assert 't3' in result
+
+
+@pytest.mark.benchmark(group='t3')
+def test_t3_batch(benchmark, batch_pairs):
+    results = benchmark(lambda: [calculate_t3(3.0, w, 35) for w, _ in batch_pairs])
+    assert len(results) == BATCH_SIZE
+
+
+@pytest.mark.benchmark(group='t3')
+def test_t3_array(benchmark, salaries):
+    result = benchmark(calculate_t3_array, 3.0, salaries, 35)
+    assert result.shape == salaries.shape
+
+
+def test_t3_batch_matches_scalar():
+    result = calculate_t3_batch(T3_BATCH['t2'], T3_BATCH['annualSalary'], T3_BATCH['age'])
+    for i, (t2, salary, age) in enumerate(zip(T3_BATCH['t2'], T3_BATCH['annualSalary'], T3_BATCH['age'])):
+        expected = calculate_t3(t2, salary, age)
+        assert result['t3'][i] == expected['t3']
+        assert {key: values[i] for key, values in result['components'].items()} == expected['components']
+    assert 'params_used' not in calculate_t3(3.0, 150000, 35, lean=True)['details']
+
+
+@pytest.mark.benchmark(group='t3')
+def test_t3_batch_kernel(benchmark, salaries):
+    ages = np.arange(salaries.size) % 38 + 22
+    result = benchmark(calculate_t3_batch, 3.0, salaries, ages)
+    assert result['count'] == salaries.size
+
+
+# ---------- 组合计算 ----------
+
+@pytest.mark.benchmark(group='optimizer')
+def test_optimize_contribution(benchmark):
+    result = benchmark(optimize_contribution, 30, 150000, 10.0, 3.0, 3.9)
+    assert result
+
+
+PROFILE_INDEX_MAX_SALARY = 200000
+PROFILE_CASES = [(18, 6300, 3.9), (30, 45000, 5.0), (30, 150000, 3.9), (55, 88800, 0.0), (59, 200000, 8.0)]
+
+
+@pytest.fixture(scope='module')
+def profile_index_dir(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp('profile_index'))
+    build_profile_index(PROFILE_INDEX_MAX_SALARY, directory)
+    return directory
+
+
+def _optimization_report(monkeypatch, directory, age, salary, growth):
+    monkeypatch.setenv('PROFILE_INDEX_DIR', directory)
+    return optimization_report(age, salary, growth)
+
+
+def test_profile_index_matches_live(monkeypatch, tmp_path, profile_index_dir):
+    for age, salary, growth in PROFILE_CASES:
+        assert lookup_profile(salary, age, profile_index_dir) is not None
+        indexed = _optimization_report(monkeypatch, profile_index_dir, age, salary, growth)
+        live = _optimization_report(monkeypatch, str(tmp_path), age, salary, growth)
+        assert json.dumps(indexed, sort_keys=True) == json.dumps(live, sort_keys=True)
+
+    # 索引域外：非 ¥100 整数倍、超出上限、年龄越界
+    for salary, age in ((150050, 30), (PROFILE_INDEX_MAX_SALARY + 100, 30), (150000, 60)):
+        assert lookup_profile(salary, age, profile_index_dir) is None
+
+
+def test_profile_index_picked_up_after_miss(tmp_path, profile_index_dir):
+    # 索引缺失的结果不缓存：其他进程随后构建的索引在下一次查询时生效
+    assert lookup_profile(150000, 30, str(tmp_path)) is None
+    for name in os.listdir(profile_index_dir):
+        shutil.copy(os.path.join(profile_index_dir, name), tmp_path)
+    assert lookup_profile(150000, 30, str(tmp_path)) is not None
+
+
+@pytest.mark.benchmark(group='optimizer')
+def test_optimization_report_indexed(benchmark, monkeypatch, profile_index_dir):
+    result = benchmark(_optimization_report, monkeypatch, profile_index_dir, 30, 150000, 3.9)
+    assert result['consistentProfile']['convergence']['converged']
+
+
+@pytest.mark.benchmark(group='optimizer')
+def test_optimization_report_live(benchmark, monkeypatch, tmp_path):
+    result = benchmark(_optimization_report, monkeypatch, str(tmp_path), 30, 150000, 3.9)
+    assert result['consistentProfile']['convergence']['converged']
+
+
+@pytest.mark.benchmark(group='suggestions')
+def test_5tier_suggestions(benchmark):
+    result = benchmark(
+        generate_5tier_suggestions,
+        FIVE_TIER['currentSalary'], FIVE_TIER['currentAge'],
+        FIVE_TIER['currentContribution'], None, FIVE_TIER['wageGrowthRate']
+    )
+    assert len(result['tiers']) == 5
+
+
+@pytest.mark.benchmark(group='suggestions')
+def test_5tier_suggestions_curve(benchmark):
+    result = benchmark(
+        generate_5tier_suggestions,
+        FIVE_TIER_CURVE['currentSalary'], FIVE_TIER_CURVE['currentAge'],
+        FIVE_TIER_CURVE['currentContribution'], None, FIVE_TIER_CURVE['wageGrowthRate'],
+        FIVE_TIER_CURVE['fractions']
+    )
+    assert result['curve']['totalNpv'].shape == (1001,)
+
+
+def test_5tier_matches_single_tier():
+    result = generate_5tier_suggestions(
+        FIVE_TIER['currentSalary'], FIVE_TIER['currentAge'], None, None, FIVE_TIER['wageGrowthRate'],
+        fractions=[0.30, 0.95]
+    )
+    params = result['parameters']
+    for tier in result['tiers']:
+        expected = calculate_npv_simple(
+            params['max_cap'] * tier['cap_utilization'] / 100, params['current_salary'], params['t2_rate'],
+            params['t3_rate'], params['current_age'], params['wage_growth_rate']
+        )
+        assert tier['npv'] == pytest.approx(expected, abs=0.01)
+    curve = result['curve']['totalNpv']
+    assert curve.tolist() == [result['tiers'][0]['npv']['total_npv'], result['tiers'][-1]['npv']['total_npv']]
+
+
+@pytest.mark.benchmark(group='diagnosis')
+def test_diagnose_history(benchmark):
+    result = benchmark(diagnose_history, HISTORY_MEDIUM['historyData'], HISTORY_MEDIUM['age'])
+    assert result
+
+
+@pytest.mark.benchmark(group='lifecycle')
+def test_lifecycle_data(benchmark):
+    result = benchmark(generate_lifecycle_data, dict(LIFECYCLE))
+    assert result['success']
+
+
+@pytest.mark.benchmark(group='lifecycle')
+def test_lifecycle_data_stochastic(benchmark):
+    result = benchmark(generate_lifecycle_data, dict(LIFECYCLE_STOCHASTIC))
+    assert result['stochastic']['returnProcess']['paths'] == 5000
+
+
+@pytest.mark.benchmark(group='fiscal')
+def test_government_cash_flow(benchmark):
+    result = benchmark(calculate_government_cash_flow, dict(FISCAL))
+    assert 'fiscalBalance' in result
+
+
+# ---------- NPV内核 ----------
+
+def _loop_npv(age, salary, contribution, t2, t3, wage_growth):
+    """原 calculate_npv 的逐年循环（收入递减配比补贴、3%贴现、账户1.75%）"""
+    years = 60 - age
+    npv = 0.0
+    for year in range(years):
+        if salary <= 40000:
+            match_rate = 0.30
+        elif salary <= 100000:
+            match_rate = 0.30 - 0.24 * (salary - 40000) / 60000
+        else:
+            match_rate = 0.06
+        npv += (150 + contribution * match_rate + contribution * t2 / 100) / 1.03 ** year
+        salary *= 1 + wage_growth / 100
+    balance = contribution * (1.0175 ** years - 1) / 0.0175
+    for year in range(20):
+        npv -= balance / 20 * t3 / 100 / 1.03 ** (years + year)
+    return npv
+
+
+def test_npv_kernel_matches_loop():
+    rng = np.random.default_rng(7)
+    ages = rng.integers(22, 60, 50)
+    salaries = rng.uniform(20000, 300000, 50)
+    levels = rng.uniform(500, 12000, 50)
+    components = npv_kernel(salaries, levels, 60 - ages, 0.02, 0.05, wage_growth=0.04)
+    expected = [_loop_npv(a, w, c, 5.0, 2.0, 4.0) for a, w, c in zip(ages, salaries, levels)]
+    np.testing.assert_allclose(components.npv, expected, rtol=1e-9)
+
+
+def test_npv_kernel_clamps_negative_years():
+    # 年龄超过60岁：内核按0年处理（NPV为0）；原年金终值公式在负年限下给出负余额与正NPV
+    components = npv_kernel(150000, [9500, 4000], 60 - 65, 0.012, 0.014, wage_growth=0.039)
+    np.testing.assert_array_equal(components.npv, 0.0)
+    np.testing.assert_array_equal(components.final_balance, 0.0)
+    assert _loop_npv(65, 150000, 9500, 1.4, 1.2, 3.9) > 0
+
+
+def test_npv_endpoints_agree():
+    result = optimize_contribution(30, 150000, 10.0, 3.0, 3.9)
+    amount = result['recommendedAmount']
+    t2 = calculate_t2_for_contribution(150000, amount)['t2']
+    assert result['npvOptimized'] == pytest.approx(calculate_npv(30, 150000, amount, t2, 3.0, 3.9)['npv'], abs=0.01)
+
+    fiscal = calculate_government_cash_flow(dict(FISCAL))
+    components = npv_kernel(FISCAL['annualSalary'], FISCAL['contributionAmount'], 60 - FISCAL['age'],
+                            FISCAL['t3'] / 100, wage_growth=FISCAL['wageGrowthRate'] / 100,
+                            subsidy_rule='linear', tax_rule='marginal', annual_cap=12000, salary_cap_ratio=0.12)
+    assert fiscal['fiscalBalance'] == pytest.approx(-float(components.npv), abs=0.01)
+
+
+def test_npv_past_retirement_age():
+    process = parse_return_process({'paths': 200})
+    result = calculate_npv(65, 150000, 9500, 1.4, 1.2, 3.9, return_process=process)
+    assert result['npv'] == calculate_npv(65, 150000, 9500, 1.4, 1.2, 3.9)['npv'] == 0
+    assert result['details']['contributionYears'] == 0
+    assert result['stochastic']['npv'] == {'p5': 0, 'p50': 0, 'p95': 0}
+
+
+@pytest.mark.parametrize('field', ['mean', 'volatility'])
+@pytest.mark.parametrize('value', [float('nan'), float('inf')])
+def test_return_process_rejects_non_finite(field, value):
+    with pytest.raises(ValueError):
+        parse_return_process({field: value})
+
+
+@pytest.mark.benchmark(group='npv-kernel')
+def test_npv_kernel_array(benchmark, salaries, contributions):
+    components = benchmark(npv_kernel, salaries, contributions, 30, 0.02, subsidy_rule='tiered',
+                           tax_rule='marginal', wage_growth=0.035, annual_cap=12000, salary_cap_ratio=0.12)
+    assert components.npv.shape == salaries.shape
+
+
+@pytest.mark.benchmark(group='fiscal')
+def test_fiscal_optimize(benchmark):
+    result = benchmark(optimize_fiscal_neutral_contribution, dict(FISCAL))
+    assert result['optimalContribution'] > 0
+
+
+def _npv_curve(payload):
+    return calculate_npv_curve(payload['annualSalary'], payload['age'], payload['t2'], payload['t3'],
+                               payload['wageGrowthRate'], points=payload['points'])
+
+
+def test_npv_curve_matches_kernel():
+    result = _npv_curve(NPV_CURVE)
+    assert [kink['type'] for kink in result['kinks']] == ['start', 'jump', 'kink', 'cap']
+
+    # 插值曲线与逐点调用内核一致（含拐点与间断点）
+    contributions = result['contributions']
+    direct = npv_kernel(NPV_CURVE['annualSalary'], contributions, 60 - NPV_CURVE['age'],
+                        NPV_CURVE['t3'] / 100, NPV_CURVE['t2'] / 100,
+                        wage_growth=NPV_CURVE['wageGrowthRate'] / 100, subsidy_rule='tiered')
+    np.testing.assert_allclose(result['npv'], direct.npv, atol=0.01)
+    np.testing.assert_allclose(result['t3TaxPV'], direct.t3_tax_pv, atol=0.01)
+
+
+@pytest.mark.benchmark(group='npv-curve')
+def test_npv_curve(benchmark):
+    result = benchmark(_npv_curve, NPV_CURVE)
+    assert len(result['npv']) >= NPV_CURVE['points']
+
+
+# ---------- 政策情景分析 ----------
+
+def test_policy_whatif_limits(client):
+    with pytest.raises(ValueError, match='samples'):
+        run_policy_whatif({'grid': {}, 'samples': MAX_GRID_POINTS * 1000})
+    # 评估次数上限只在HTTP接口检查，直接调用可运行完整扫描
+    size = 100000
+    payload = {'grid': {'alpha_1': {'min': 0.2, 'max': 0.6}},
+               'samples': MAX_EVALUATIONS // size + 1, 'population': {'size': size}}
+    response = client.post('/api/policy-whatif', json=payload)
+    assert response.status_code == 400 and str(MAX_EVALUATIONS) in response.get_json()['error']
+    assert count_evaluations(payload) > MAX_EVALUATIONS
+
+
+def test_policy_whatif_chunk_size_bounded(monkeypatch):
+    population = generate_population(size=3000, seed=7)
+    grid = build_param_grid({'alpha_1': [0.3, 0.45, 0.6]})
+    expected = evaluate_policy_grid(grid, population)
+
+    # 请求指定的分块不能超过 CHUNK_ELEMENTS / 参数组数
+    chunk_widths = []
+    kernel = policy_whatif.subsidy_kernel
+    monkeypatch.setattr(policy_whatif, 'CHUNK_ELEMENTS', 300)
+    monkeypatch.setattr(policy_whatif, 'subsidy_kernel',
+                        lambda w, *args, **kwargs: chunk_widths.append(w.shape[1]) or kernel(w, *args, **kwargs))
+    chunked = evaluate_policy_grid(grid, population, chunk_size=10 ** 12)
+    assert max(chunk_widths) == 100
+    np.testing.assert_allclose(chunked['totalCost'], expected['totalCost'])
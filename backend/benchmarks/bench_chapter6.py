@@ -0,0 +1,191 @@
+"""
+第六章基准
+
+财政NPV / 行为参与率：列运算（POPULATION_SIZE 人）对比原逐人循环。
+原 iloc 双重循环每人需数毫秒（chapter6 的1万人约 1 分钟，1000万人需十余小时），无法在基准中完整运行；
+这里以 LOOP_SIZE 人的样本测量，extra_info 中给出按人数线性外推到 POPULATION_SIZE 的耗时。
+
+随机宏观情景：MACRO_POPULATION 人 × MACRO_PATHS 条路径，extra_info 给出外推到 10000 条路径的耗时。
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from chapter6_fiscal import DISCOUNT_RATE, behavioral_participation_rate, calculate_fiscal_npv
+from chapter6_macro_scenarios import (
+    VARIABLES, MacroScenarioGenerator, PopulationScenarioEngine, bootstrap_paths
+)
+
+POPULATION_SIZE = 10_000_000
+LOOP_SIZE = 1000
+CONTRIBUTE_YEARS = 30
+RECEIVE_YEARS = 20
+MACRO_POPULATION = 100_000
+MACRO_PATHS = 100
+MACRO_TARGET_PATHS = 10_000
+
+
+@pytest.fixture(scope='module')
+def population():
+    """各列独立抽样的人群（固定种子）"""
+    rng = np.random.default_rng(2024)
+    return {
+        'net_benefit': rng.normal(2000, 3000, POPULATION_SIZE),
+        'subsidy': rng.uniform(0, 1500, POPULATION_SIZE),
+        'tax_saving_pv': rng.uniform(0, 40000, POPULATION_SIZE),
+        'tax_receive_pv': rng.uniform(0, 30000, POPULATION_SIZE),
+    }
+
+
+@pytest.fixture(scope='module')
+def loop_sample(population):
+    return pd.DataFrame({name: column[:LOOP_SIZE] for name, column in population.items()})
+
+
+def _scalar_participation_rate(net_benefit):
+    """原 chapter6_corrected 的逐个判断"""
+    if net_benefit <= 0:
+        return 0.0
+    elif net_benefit < 500:
+        return 0.30
+    elif net_benefit < 2000:
+        return 0.60
+    elif net_benefit < 5000:
+        return 0.80
+    else:
+        return 0.95
+
+
+def _loop_fiscal_npv(df_policy):
+    """原 chapter6_corrected.calculate_fiscal_npv_correct 的逐人逐年循环"""
+    total_subsidy_npv = 0.0
+    total_tax_saving_npv = 0.0
+    total_t3_tax_npv = 0.0
+    for i in range(len(df_policy)):
+        for t in range(CONTRIBUTE_YEARS):
+            discount_factor = (1 + DISCOUNT_RATE) ** (-t)
+            total_subsidy_npv += df_policy.iloc[i]['subsidy'] * discount_factor
+            total_tax_saving_npv += df_policy.iloc[i]['tax_saving_pv'] / CONTRIBUTE_YEARS * discount_factor
+        for t in range(CONTRIBUTE_YEARS, CONTRIBUTE_YEARS + RECEIVE_YEARS):
+            discount_factor = (1 + DISCOUNT_RATE) ** (-t)
+            total_t3_tax_npv += df_policy.iloc[i]['tax_receive_pv'] / RECEIVE_YEARS * discount_factor
+    return {
+        'subsidy_npv': total_subsidy_npv,
+        'tax_saving_npv': total_tax_saving_npv,
+        't3_tax_npv': total_t3_tax_npv,
+        'net_cost_npv': total_subsidy_npv + total_tax_saving_npv - total_t3_tax_npv
+    }
+
+
+def _vectorized_fiscal_npv(columns):
+    return calculate_fiscal_npv(columns['subsidy'], columns['tax_saving_pv'], columns['tax_receive_pv'],
+                                CONTRIBUTE_YEARS, RECEIVE_YEARS)
+
+
+def _extrapolate(benchmark, size):
+    if benchmark.stats is None:  # --benchmark-disable
+        return
+    benchmark.extra_info['per_individual_us'] = benchmark.stats.stats.mean / size * 1e6
+    benchmark.extra_info['extrapolated_population_s'] = benchmark.stats.stats.mean / size * POPULATION_SIZE
+
+
+def _extrapolate_paths(benchmark, n_paths):
+    if benchmark.stats is None:
+        return
+    benchmark.extra_info['extrapolated_target_paths_s'] = benchmark.stats.stats.mean / n_paths * MACRO_TARGET_PATHS
+
+
+# ---------- 等价性 ----------
+
+def test_vectorized_matches_loop(loop_sample):
+    expected = _loop_fiscal_npv(loop_sample)
+    result = _vectorized_fiscal_npv(loop_sample)
+    for key, value in expected.items():
+        assert result[key] == pytest.approx(value, rel=1e-9)
+
+    net_benefit = loop_sample['net_benefit']
+    expected_rates = [_scalar_participation_rate(b) for b in net_benefit]
+    assert behavioral_participation_rate(net_benefit).tolist() == expected_rates
+
+
+# ---------- 财政NPV ----------
+
+@pytest.mark.benchmark(group='chapter6-fiscal-npv')
+def test_fiscal_npv_vectorized(benchmark, population):
+    result = benchmark(_vectorized_fiscal_npv, population)
+    assert result['subsidy_npv'] > 0
+
+
+@pytest.mark.benchmark(group='chapter6-fiscal-npv')
+def test_fiscal_npv_loop(benchmark, loop_sample):
+    result = benchmark.pedantic(_loop_fiscal_npv, args=(loop_sample,), rounds=1, iterations=1)
+    _extrapolate(benchmark, LOOP_SIZE)
+    assert result['subsidy_npv'] > 0
+
+
+# ---------- 行为参与率 ----------
+
+@pytest.mark.benchmark(group='chapter6-participation')
+def test_participation_rate_vectorized(benchmark, population):
+    rates = benchmark(behavioral_participation_rate, population['net_benefit'])
+    assert rates.shape == (POPULATION_SIZE,)
+
+
+@pytest.mark.benchmark(group='chapter6-participation')
+def test_participation_rate_loop(benchmark, loop_sample):
+    net_benefit = loop_sample['net_benefit']
+    rates = benchmark(lambda: [_scalar_participation_rate(b) for b in net_benefit])
+    _extrapolate(benchmark, LOOP_SIZE)
+    assert len(rates) == LOOP_SIZE
+
+
+# ---------- 随机宏观情景 ----------
+
+@pytest.fixture(scope='module')
+def macro_engine():
+    rng = np.random.default_rng(2024)
+    incomes = rng.lognormal(np.log(50000), 0.8, MACRO_POPULATION)
+    rates = rng.choice([0.02, 0.05, 0.08], MACRO_POPULATION, p=[0.289, 0.505, 0.206])
+    return PopulationScenarioEngine(incomes, rates)
+
+
+@pytest.fixture(scope='module')
+def macro_paths():
+    return MacroScenarioGenerator.default().sample(MACRO_PATHS, CONTRIBUTE_YEARS + RECEIVE_YEARS, seed=2024)
+
+
+def test_macro_piecewise_matches_tensor(macro_engine, macro_paths):
+    sample = slice(0, MACRO_POPULATION, 50)
+    engine = PopulationScenarioEngine(macro_engine.income[sample], macro_engine.contribution_rate[sample])
+    piecewise = engine.run(macro_paths[:8])
+    tensor = engine.run(macro_paths[:8], method='tensor')
+    for field in ('path_percentiles', 'path_mean', 'positive_share', 'subsidy_npv', 't2_npv', 't3_npv',
+                  'individual_mean', 'individual_positive'):
+        np.testing.assert_allclose(getattr(piecewise, field), getattr(tensor, field), rtol=1e-9, atol=1e-6)
+
+
+def test_macro_path_generators(macro_paths):
+    history = pd.DataFrame(macro_paths[0], columns=VARIABLES)
+    fitted = MacroScenarioGenerator.from_history(history)
+    np.testing.assert_allclose(fitted.mean, history.mean().to_numpy())
+
+    resampled = bootstrap_paths(history, 20, 50, block_size=5, seed=1)
+    assert resampled.shape == (20, 50, len(VARIABLES))
+    assert np.isin(resampled[:, :, 0], history['inflation'].to_numpy()).all()
+
+
+@pytest.mark.benchmark(group='chapter6-macro')
+def test_macro_scenarios_piecewise(benchmark, macro_engine, macro_paths):
+    result = benchmark.pedantic(macro_engine.run, args=(macro_paths,), rounds=3, iterations=1)
+    _extrapolate_paths(benchmark, MACRO_PATHS)
+    assert result.path_mean.shape == (MACRO_PATHS,)
+
+
+@pytest.mark.benchmark(group='chapter6-macro')
+def test_macro_scenarios_tensor(benchmark, macro_engine, macro_paths):
+    paths = macro_paths[:4]
+    result = benchmark.pedantic(macro_engine.run, args=(paths,), kwargs={'method': 'tensor'},
+                                rounds=1, iterations=1)
+    _extrapolate_paths(benchmark, len(paths))
+    assert result.path_mean.shape == (len(paths),)
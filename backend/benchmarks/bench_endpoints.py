@@ -0,0 +1,24 @@
+"""
+端点基准：通过 Flask test client 在进程内调用，不需要启动 8000 端口服务
+"""
+
+import pytest
+
+from payloads import ENDPOINT_CASES
+
+
+@pytest.mark.benchmark(group='endpoints')
+@pytest.mark.parametrize('route,payload', [
+    pytest.param(route, payload, id=name) for name, route, payload in ENDPOINT_CASES
+])
+def test_endpoint(benchmark, client, route, payload):
+    response = benchmark(client.post, route, json=payload)
+    assert response.status_code == 200, response.get_json()
+    assert 'X-Cache' not in response.headers
+
+
+def test_calculate_t3_lean_requires_boolean(client):
+    payload = {'t2': 3.0, 'annualSalary': 150000, 'age': 35}
+    assert 'params_used' not in client.post('/api/calculate-t3', json={**payload, 'lean': True}).get_json()['details']
+    assert 'params_used' in client.post('/api/calculate-t3', json=payload).get_json()['details']
+    assert client.post('/api/calculate-t3', json={**payload, 'lean': 'false'}).status_code == 400
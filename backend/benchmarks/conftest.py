@@ -0,0 +1,65 @@
+"""
+pytest-benchmark 配置
+
+基线保存在 benchmarks/baselines/（与运行目录无关）：
+    pytest benchmarks --benchmark-save=baseline     # 记录基线
+    pytest benchmarks                               # 与最近一次基线比较，超过阈值即失败
+阈值由 pytest.ini 中的 --benchmark-compare-fail 指定；尚无基线时只运行不比较。
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+BASELINE_STORAGE = 'file://' + BASELINE_DIR
+DEFAULT_STORAGE = 'file://./.benchmarks'
+
+# 批量基准的样本规模
+BATCH_SIZE = 1000
+ARRAY_SIZE = 100000
+
+
+def pytest_configure(config):
+    # 在 pytest-benchmark（trylast）创建会话之前把默认存储改到 baselines/
+    if config.getoption('benchmark_storage', None) == DEFAULT_STORAGE:
+        config.option.benchmark_storage = BASELINE_STORAGE
+        if not _has_baseline(BASELINE_DIR):
+            config.option.benchmark_compare = False
+            config.option.benchmark_compare_fail = None
+
+
+def _has_baseline(directory):
+    return any(name.endswith('.json') for _, _, names in os.walk(directory) for name in names)
+
+
+@pytest.fixture(scope='session')
+def client():
+    # 关闭响应缓存：否则第一轮之后都是缓存命中，计时的是缓存查找而不是端点计算
+    os.environ['RESPONSE_CACHE'] = 'off'
+    from main import app
+    app.config['TESTING'] = True
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def salaries():
+    """对数正态年薪样本（固定种子）"""
+    rng = np.random.default_rng(2024)
+    return np.clip(rng.lognormal(np.log(80000), 0.7, ARRAY_SIZE), 20000, 1000000)
+
+
+@pytest.fixture(scope='session')
+def contributions(salaries):
+    return np.minimum(salaries * 0.08, 12000.0)
+
+
+@pytest.fixture(scope='session')
+def batch_pairs(salaries, contributions):
+    """标量循环使用的 (年薪, 缴费) 样本"""
+    return list(zip(salaries[:BATCH_SIZE].tolist(), contributions[:BATCH_SIZE].tolist()))
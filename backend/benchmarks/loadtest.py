@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+压测工具：按比例回放 Path A / Path B 会话，报告各服务端 worker 数 × 客户端并发度下的
+吞吐、延迟分位数与错误率
+
+会话定义：
+- Path A: predict-wage-growth → optimize-contribution → 5tier-suggestions → lifecycle-data
+- Path B: diagnose-history → ai-suggestions
+后一步的请求体使用前一步的响应（增长率、推荐缴费额、T2/T3、诊断结果）。
+
+两个维度分开指定：
+- --server-workers: 服务端进程数（--spawn 时对每个取值分别以 gunicorn -w N 启动服务）
+- --concurrency:    客户端并发会话数（每个服务端配置下依次压测）
+
+用法：
+    # 自动启动本地服务（gunicorn，LLM_STUB=1，不访问外部模型），测量吞吐随 worker 数的扩展
+    python benchmarks/loadtest.py --spawn --server-workers 1,2,4 --concurrency 4,16 --duration 20 --mix 0.7
+
+    # 异步模式（uvicorn asgi:app --workers N），模拟 500ms 的大模型调用
+    python benchmarks/loadtest.py --spawn --asgi --stub-latency-ms 500 --concurrency 16,64
+
+    # 压测已运行的服务（服务端 worker 数由部署决定）
+    python benchmarks/loadtest.py --base-url http://localhost:8000 --concurrency 8 --preset low-income
+
+只依赖标准库与 numpy。
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+from collections import defaultdict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from payloads import WAGE_GROWTH, HISTORY_MEDIUM, HISTORY_LOW, FIVE_TIER
+
+
+# 用户画像：Path A 的基本信息 + Path B 的历史缴费
+PERSONAS = {
+    'medium': {
+        'pathA': dict(WAGE_GROWTH),
+        'pathB': HISTORY_MEDIUM,
+        'currentContribution': FIVE_TIER['currentContribution']
+    },
+    'low-income': {
+        'pathA': {'age': 28, 'annualSalary': 90000, 'industry': 'retail', 'jobLevel': 'entry'},
+        'pathB': HISTORY_LOW,
+        'currentContribution': 4000
+    },
+    'high-income': {
+        'pathA': {'age': 45, 'annualSalary': 400000, 'industry': 'finance', 'jobLevel': 'senior'},
+        'pathB': {
+            'historyData': [
+                {'year': 2022, 'salary': 360000, 'contribution': 12000},
+                {'year': 2023, 'salary': 380000, 'contribution': 12000},
+                {'year': 2024, 'salary': 400000, 'contribution': 12000}
+            ],
+            'age': 45
+        },
+        'currentContribution': 12000
+    }
+}
+
+# 预设：画像集合（会话随机抽取）
+PRESETS = {
+    'medium': ['medium'],
+    'low-income': ['low-income'],
+    'high-income': ['high-income'],
+    'mixed': ['medium', 'low-income', 'high-income']
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class ApiClient:
+    """每个工作线程一个保持连接的 HTTP 客户端"""
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def post(self, path: str, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request('POST', path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                data = response.read()
+                if response.getheader('Connection', '').lower() == 'close':
+                    self.close()
+                return response.status, data
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # 服务端关闭了空闲连接：重连一次
+                self.close()
+                if attempt:
+                    raise
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class Recorder:
+    """线程安全的请求结果记录"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.sessions: Dict[str, int] = defaultdict(int)
+        self.failed_sessions = 0
+
+    def record(self, step: str, seconds: float, ok: bool):
+        with self._lock:
+            self.latencies[step].append(seconds)
+            if not ok:
+                self.errors[step] += 1
+
+    def session_done(self, path: str, ok: bool):
+        with self._lock:
+            self.sessions[path] += 1
+            if not ok:
+                self.failed_sessions += 1
+
+
+def _call(client: ApiClient, recorder: Recorder, step: str, path: str,
+          payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    start = time.perf_counter()
+    try:
+        status, data = client.post(path, payload)
+        ok = status == 200
+    except OSError:
+        status, data, ok = None, b'', False
+    recorder.record(step, time.perf_counter() - start, ok)
+    return json.loads(data) if ok else None
+
+
+def run_path_a(client: ApiClient, recorder: Recorder, persona: Dict[str, Any]) -> bool:
+    profile = persona['pathA']
+    growth = _call(client, recorder, 'A1 predict-wage-growth', '/api/predict-wage-growth', profile)
+    if growth is None:
+        return False
+    growth_rate = growth['predicted_growth_rate']
+
+    optimized = _call(client, recorder, 'A2 optimize-contribution', '/api/optimize-contribution', {
+        'age': profile['age'], 'annualSalary': profile['annualSalary'], 'wageGrowthRate': growth_rate
+    })
+    if optimized is None:
+        return False
+
+    tiers = _call(client, recorder, 'A3 5tier-suggestions', '/api/5tier-suggestions', {
+        'currentSalary': profile['annualSalary'],
+        'currentAge': profile['age'],
+        'currentContribution': persona['currentContribution'],
+        'wageGrowthRate': growth_rate
+    })
+    lifecycle = _call(client, recorder, 'A4 lifecycle-data', '/api/lifecycle-data', {
+        'age': profile['age'],
+        'annualSalary': profile['annualSalary'],
+        'contributionAmount': optimized['recommendedAmount'],
+        't2': optimized['t2'],
+        't3': optimized['t3'],
+        'wageGrowthRate': growth_rate
+    })
+    return tiers is not None and lifecycle is not None
+
+
+def run_path_b(client: ApiClient, recorder: Recorder, persona: Dict[str, Any]) -> bool:
+    history = persona['pathB']
+    diagnosis = _call(client, recorder, 'B1 diagnose-history', '/api/diagnose-history', history)
+    if diagnosis is None:
+        return False
+    suggestions = _call(client, recorder, 'B2 ai-suggestions', '/api/ai-suggestions', {
+        'diagnosisResult': diagnosis, 'currentAge': history['age']
+    })
+    return suggestions is not None
+
+
+def run_level(base_url: str, concurrency: int, duration: float, mix: float,
+              personas: List[str], seed: int) -> Dict[str, Any]:
+    """以 concurrency 个并发客户端持续回放会话 duration 秒"""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    def worker(index: int):
+        rng = random.Random(seed + index)
+        client = ApiClient(base_url)
+        try:
+            while time.perf_counter() < deadline:
+                persona = PERSONAS[rng.choice(personas)]
+                if rng.random() < mix:
+                    recorder.session_done('A', run_path_a(client, recorder, persona))
+                else:
+                    recorder.session_done('B', run_path_b(client, recorder, persona))
+        finally:
+            client.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    return summarize(recorder, concurrency, elapsed)
+
+
+def summarize(recorder: Recorder, concurrency: int, elapsed: float) -> Dict[str, Any]:
+    def stats(values: List[float], errors: int) -> Dict[str, Any]:
+        arr = np.asarray(values) * 1000.0
+        result = {
+            'requests': len(values),
+            'errorRate': round(errors / len(values), 4) if values else 0.0,
+            'meanMs': round(float(arr.mean()), 2) if values else None
+        }
+        for p in PERCENTILES:
+            result[f'p{p}Ms'] = round(float(np.percentile(arr, p)), 2) if values else None
+        return result
+
+    all_latencies = [v for values in recorder.latencies.values() for v in values]
+    total_errors = sum(recorder.errors.values())
+    sessions = sum(recorder.sessions.values())
+    return {
+        'concurrency': concurrency,
+        'elapsedSeconds': round(elapsed, 2),
+        'sessions': dict(recorder.sessions),
+        'sessionsPerSecond': round(sessions / elapsed, 2),
+        'requestsPerSecond': round(len(all_latencies) / elapsed, 2),
+        'failedSessions': recorder.failed_sessions,
+        'overall': stats(all_latencies, total_errors),
+        'steps': {
+            step: stats(values, recorder.errors.get(step, 0))
+            for step, values in sorted(recorder.latencies.items())
+        }
+    }
+
+
+def print_report(results: List[Dict[str, Any]]):
+    print('\n' + '=' * 104)
+    print(f"{'server':>6} {'clients':>7} {'sess/s':>8} {'req/s':>8} {'err%':>6} "
+          + ' '.join(f"{'p' + str(p) + 'ms':>8}" for p in PERCENTILES) + f" {'sessions(A/B)':>15}")
+    print('-' * 104)
+    for r in results:
+        o = r['overall']
+        print(f"{r['serverWorkers'] or '-':>6} {r['concurrency']:>7} {r['sessionsPerSecond']:>8.1f} "
+              f"{r['requestsPerSecond']:>8.1f} {o['errorRate'] * 100:>6.2f} "
+              + ' '.join(f"{o[f'p{p}Ms'] or 0:>8.1f}" for p in PERCENTILES)
+              + f" {r['sessions'].get('A', 0):>7}/{r['sessions'].get('B', 0):<7}")
+    print('=' * 104)
+
+    # 扩展性：各客户端并发度下，吞吐相对最少 worker 配置的倍数
+    server_workers = sorted({r['serverWorkers'] for r in results if r['serverWorkers']})
+    if len(server_workers) > 1:
+        print(f"\n吞吐扩展（相对 {server_workers[0]} 个 worker）:")
+        for concurrency in sorted({r['concurrency'] for r in results}):
+            rows = {r['serverWorkers']: r['requestsPerSecond'] for r in results if r['concurrency'] == concurrency}
+            base = rows.get(server_workers[0]) or 0
+            print(f"  clients={concurrency:<5} " + '  '.join(
+                f"w={w}: {rows[w] / base:.2f}x" if base and w in rows else f"w={w}: -" for w in server_workers
+            ))
+
+    last = results[-1]
+    print(f"\n各步骤延迟（server={last['serverWorkers'] or '-'}, clients={last['concurrency']}）:")
+    for step, s in last['steps'].items():
+        print(f"  {step:<28} n={s['requests']:<6} mean={s['meanMs']:>8.1f}ms "
+              f"p95={s['p95Ms']:>8.1f}ms err={s['errorRate'] * 100:.2f}%")
+
+
+def spawn_server(port: int, stub_latency_ms: float, server_workers: int = 1, asgi: bool = False) -> subprocess.Popen:
+    """
+    启动本地服务（LLM 使用桩）：gunicorn -w server_workers main:app；
+    asgi=True 时为 uvicorn asgi:app --workers server_workers
+    """
+    env = dict(os.environ, FLASK_DEBUG='False', LLM_STUB='1',
+               LLM_STUB_LATENCY_MS=str(stub_latency_ms), WEB_CONCURRENCY=str(server_workers))
+    if asgi:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                   '--workers', str(server_workers), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'gunicorn', '-w', str(server_workers),
+                   '-b', f'127.0.0.1:{port}', '--log-level', 'warning', 'main:app']
+    process = subprocess.Popen(
+        command, cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/health')
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.2)
+        if process.poll() is not None:
+            break
+    stop_server(process)
+    raise RuntimeError(f'本地服务启动失败（端口 {port}）')
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AIPPOF Path A / Path B 压测')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--spawn', action='store_true', help='启动本地服务（gunicorn，LLM_STUB=1）')
+    parser.add_argument('--port', type=int, default=8765, help='--spawn 使用的端口')
+    parser.add_argument('--asgi', action='store_true', help='--spawn 时以异步模式（uvicorn asgi:app）启动')
+    parser.add_argument('--server-workers', default='1', help='--spawn 时的服务端 worker 数列表，逗号分隔')
+    parser.add_argument('--stub-latency-ms', type=float, default=0.0, help='LLM 桩模拟耗时')
+    parser.add_argument('--concurrency', default='1,2,4,8', help='客户端并发会话数列表，逗号分隔')
+    parser.add_argument('--duration', type=float, default=10.0, help='每个并发度持续秒数')
+    parser.add_argument('--mix', type=float, default=0.7, help='Path A 会话占比（0-1）')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='mixed')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', dest='json_path', help='结果另存为 JSON')
+    args = parser.parse_args(argv)
+
+    concurrency_list = _int_list(args.concurrency)
+    # 压测已运行的服务时 worker 数由部署决定，不可控
+    server_workers_list = _int_list(args.server_workers) if args.spawn else [None]
+
+    results = []
+    for server_workers in server_workers_list:
+        process = None
+        base_url = args.base_url
+        if args.spawn:
+            print(f'启动服务: {"uvicorn" if args.asgi else "gunicorn"} × {server_workers} worker')
+            process = spawn_server(args.port, args.stub_latency_ms, server_workers, asgi=args.asgi)
+            base_url = f'http://127.0.0.1:{args.port}'
+        try:
+            for concurrency in concurrency_list:
+                print(f'▶ server={server_workers or "-"}，clients={concurrency}，持续 {args.duration}s ...')
+                result = run_level(base_url, concurrency, args.duration, args.mix,
+                                   PRESETS[args.preset], args.seed)
+                results.append({'serverWorkers': server_workers, **result})
+        finally:
+            if process is not None:
+                stop_server(process)
+
+    print_report(results)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'baseUrl': args.base_url if not args.spawn else f'http://127.0.0.1:{args.port}',
+                'server': ('uvicorn' if args.asgi else 'gunicorn') if args.spawn else None,
+                'preset': args.preset, 'mix': args.mix,
+                'duration': args.duration, 'results': results
+            }, f, ensure_ascii=False, indent=2)
+        print(f'\n结果已保存: {args.json_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+基准测试与压测共用的样例请求体（取自 test_*.py / e2e_tests.py 中的样例）
+"""
+
+WAGE_GROWTH = {'age': 30, 'annualSalary': 150000, 'industry': 'it', 'jobLevel': 'intermediate'}
+
+T2 = {'age': 30, 'annualSalary': 150000, 'wageGrowthRate': 3.9}
+T3 = {'t2': 1.4, 'annualSalary': 150000, 'age': 30}
+# 批量 T3：1000 组 (t2, 年薪, 年龄)
+T3_BATCH = {
+    't2': [round(0.5 + i % 300 * 0.1, 1) for i in range(1000)],
+    'annualSalary': [30000 + i * 500 for i in range(1000)],
+    'age': [22 + i % 38 for i in range(1000)]
+}
+CAP = {'annualSalary': 150000, 't2Rate': 10.0}
+OPTIMIZE = {'age': 30, 'annualSalary': 150000, 'wageGrowthRate': 3.9}
+
+# test_new_apis.py
+LIFECYCLE = {
+    'age': 30,
+    'annualSalary': 150000,
+    'contributionAmount': 9500,
+    't2': 1.4,
+    't3': 1.2,
+    'wageGrowthRate': 3.9
+}
+FISCAL = dict(LIFECYCLE)
+
+# 缴费额 → NPV 曲线（低收入、三段式补贴拐点均在上限内）
+NPV_CURVE = {'age': 30, 'annualSalary': 60000, 't2': 3.0, 't3': 1.2, 'wageGrowthRate': 4.0, 'points': 1001}
+
+# 随机收益：单个用户 5000 条路径的分位带
+RETURN_PROCESS = {'model': 'lognormal', 'mean': 1.75, 'volatility': 4.0, 'paths': 5000}
+LIFECYCLE_STOCHASTIC = dict(LIFECYCLE, returnProcess=RETURN_PROCESS)
+
+# test_ai_suggestions_api.py 用例1（中等效率）/ 用例2（低效率）
+HISTORY_MEDIUM = {
+    'historyData': [
+        {'year': 2022, 'salary': 120000, 'contribution': 8000},
+        {'year': 2023, 'salary': 135000, 'contribution': 10000},
+        {'year': 2024, 'salary': 150000, 'contribution': 12000}
+    ],
+    'age': 35
+}
+HISTORY_LOW = {
+    'historyData': [
+        {'year': 2022, 'salary': 80000, 'contribution': 3000},
+        {'year': 2023, 'salary': 85000, 'contribution': 3500},
+        {'year': 2024, 'salary': 90000, 'contribution': 4000}
+    ],
+    'age': 28
+}
+
+FIVE_TIER = {'currentSalary': 150000, 'currentAge': 35, 'currentContribution': 12000, 'wageGrowthRate': 5.0}
+# 滑块响应曲线：上限比例 0~1 共 1001 个点
+FIVE_TIER_CURVE = dict(FIVE_TIER, fractions=[i / 1000 for i in range(1001)])
+
+# 端点基准：(名称, 路由, 请求体)
+ENDPOINT_CASES = [
+    ('calculate-t2', '/api/calculate-t2', T2),
+    ('calculate-t3', '/api/calculate-t3', T3),
+    ('calculate-t3-batch', '/api/calculate-t3', T3_BATCH),
+    ('calculate-cap', '/api/calculate-cap', CAP),
+    ('optimize-contribution', '/api/optimize-contribution', OPTIMIZE),
+    ('5tier-suggestions', '/api/5tier-suggestions', FIVE_TIER),
+    ('5tier-suggestions-curve', '/api/5tier-suggestions', FIVE_TIER_CURVE),
+    ('diagnose-history', '/api/diagnose-history', HISTORY_MEDIUM),
+    ('lifecycle-data', '/api/lifecycle-data', LIFECYCLE),
+    ('lifecycle-data-stochastic', '/api/lifecycle-data', LIFECYCLE_STOCHASTIC),
+    ('calculate-npv-stochastic', '/api/calculate-npv', LIFECYCLE_STOCHASTIC),
+    ('npv-curve', '/api/npv-curve', NPV_CURVE),
+    ('fiscal-analysis', '/api/fiscal-analysis', FISCAL),
+]
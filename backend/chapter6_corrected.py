@@ -10,6 +10,9 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from matplotlib import rcParams
 from chapter6_simulation import *
+from chapter6_fiscal import (
+    DISCOUNT_RATE, discount_factors, behavioral_participation_rate, calculate_fiscal_npv
+)
 
 rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
 rcParams['axes.unicode_minus'] = False
@@ -34,35 +37,13 @@ print("   说明: 这是理论上限，实际参与率需要行为助推")
 
 print("\n📊 引入行为参与率模型:")
 
-# 定义行为参与率函数（基于净收益大小）
-def behavioral_participation_rate(net_benefit):
-    """
-    基于净收益计算实际参与概率
-    考虑惰性、短视、复杂性厌恶等行为因素
-    """
-    if net_benefit <= 0:
-        return 0.0  # 净收益为负，不参与
-    elif net_benefit < 500:
-        return 0.30  # 收益很小，惰性导致低参与率
-    elif net_benefit < 2000:
-        return 0.60  # 收益中等，参与率提升
-    elif net_benefit < 5000:
-        return 0.80  # 收益较大，多数人参与
-    else:
-        return 0.95  # 收益很大，高参与率
-
+# 行为参与率模型（基于净收益大小，分档见 chapter6_fiscal.behavioral_participation_rate）
 # 计算现行政策的实际参与率
-actual_participation_current = []
-for benefit in df_current['net_benefit']:
-    actual_participation_current.append(behavioral_participation_rate(benefit))
-
+actual_participation_current = behavioral_participation_rate(df_current['net_benefit'])
 actual_coverage_current = np.mean(actual_participation_current)
 
 # 计算优化方案的实际参与率
-actual_participation_optimized = []
-for benefit in df_optimized['net_benefit']:
-    actual_participation_optimized.append(behavioral_participation_rate(benefit))
-
+actual_participation_optimized = behavioral_participation_rate(df_optimized['net_benefit'])
 actual_coverage_optimized = np.mean(actual_participation_optimized)
 
 print(f"\n现行政策:")
@@ -91,44 +72,14 @@ print("   问题: 忽略了货币时间价值，今天的钱≠30年后的钱")
 print("\n✅ 修正计算（正确）:")
 print("   使用NPV（净现值）折现，贴现率r = 1.75%")
 
-DISCOUNT_RATE = 0.0175
-
 def calculate_fiscal_npv_correct(df_policy, policy_name):
     """
-    正确计算财政NPV
+    正确计算财政NPV（按列求和 × 预先计算的折现系数，见 chapter6_fiscal）
     """
-    total_subsidy_npv = 0.0
-    total_tax_saving_npv = 0.0
-    total_t3_tax_npv = 0.0
-    
-    for i in range(len(df_policy)):
-        # 缴费期补贴和税优（第1-30年）
-        for t in range(CONTRIBUTE_YEARS):
-            subsidy_t = df_policy.iloc[i]['subsidy']
-            tax_saving_t = df_policy.iloc[i]['tax_saving_pv'] / CONTRIBUTE_YEARS
-            
-            # 折现到第0年
-            discount_factor = (1 + DISCOUNT_RATE) ** (-t)
-            total_subsidy_npv += subsidy_t * discount_factor
-            total_tax_saving_npv += tax_saving_t * discount_factor
-        
-        # 领取期T3税收（第31-50年）
-        for t in range(CONTRIBUTE_YEARS, CONTRIBUTE_YEARS + RECEIVE_YEARS):
-            t3_tax_t = df_policy.iloc[i]['tax_receive_pv'] / RECEIVE_YEARS
-            
-            # 折现到第0年
-            discount_factor = (1 + DISCOUNT_RATE) ** (-t)
-            total_t3_tax_npv += t3_tax_t * discount_factor
-    
-    # 财政成本 = 补贴支出 + 税优减收 - T3税收
-    fiscal_cost_npv = total_subsidy_npv + total_tax_saving_npv - total_t3_tax_npv
-    
     return {
         'policy': policy_name,
-        'subsidy_npv': total_subsidy_npv,
-        'tax_saving_npv': total_tax_saving_npv,
-        't3_tax_npv': total_t3_tax_npv,
-        'net_cost_npv': fiscal_cost_npv
+        **calculate_fiscal_npv(df_policy['subsidy'], df_policy['tax_saving_pv'], df_policy['tax_receive_pv'],
+                               CONTRIBUTE_YEARS, RECEIVE_YEARS, DISCOUNT_RATE)
     }
 
 fiscal_current_npv = calculate_fiscal_npv_correct(df_current, '现行政策')
@@ -195,18 +146,9 @@ fiscal_optimized_exit.loc[high_income_exit_mask, 'tax_saving_pv'] = 0
 fiscal_optimized_exit.loc[high_income_exit_mask, 'tax_receive_pv'] = 0
 
 # 计算新的财政NPV
-subsidy_npv_exit = 0.0
-t3_tax_npv_exit = 0.0
-
-for t in range(CONTRIBUTE_YEARS):
-    subsidy_t = fiscal_optimized_exit['subsidy'].sum()
-    discount_factor = (1 + DISCOUNT_RATE) ** (-t)
-    subsidy_npv_exit += subsidy_t * discount_factor
-
-for t in range(CONTRIBUTE_YEARS, CONTRIBUTE_YEARS + RECEIVE_YEARS):
-    t3_tax_t = fiscal_optimized_exit['tax_receive_pv'].sum() / RECEIVE_YEARS
-    discount_factor = (1 + DISCOUNT_RATE) ** (-t)
-    t3_tax_npv_exit += t3_tax_t * discount_factor
+fiscal_exit_npv = calculate_fiscal_npv_correct(fiscal_optimized_exit, '高收入者退出')
+subsidy_npv_exit = fiscal_exit_npv['subsidy_npv']
+t3_tax_npv_exit = fiscal_exit_npv['t3_tax_npv']
 
 t3_loss = fiscal_optimized_npv['t3_tax_npv'] - t3_tax_npv_exit
 
@@ -241,10 +183,7 @@ print(f"⚠️  覆盖率目标严重受损！")
 # 计算补贴浪费
 total_subsidy_budget = fiscal_optimized_npv['subsidy_npv']
 wasted_subsidy = df_optimized.loc[low_income_nonparticipate_mask, 'subsidy'].sum() * CONTRIBUTE_YEARS
-wasted_subsidy_npv = 0.0
-for t in range(CONTRIBUTE_YEARS):
-    discount_factor = (1 + DISCOUNT_RATE) ** (-t)
-    wasted_subsidy_npv += wasted_subsidy / CONTRIBUTE_YEARS * discount_factor
+wasted_subsidy_npv = wasted_subsidy / CONTRIBUTE_YEARS * discount_factors(CONTRIBUTE_YEARS, DISCOUNT_RATE).sum()
 
 print(f"\n补贴预算NPV: ¥{total_subsidy_budget/10000:.2f}万")
 print(f"未能触达人群的补贴NPV: ¥{wasted_subsidy_npv/10000:.2f}万")
@@ -9,6 +9,8 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 
+from chapter6_macro_scenarios import MacroScenarioGenerator, PopulationScenarioEngine
+
 # 设置中文字体
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
 plt.rcParams['axes.unicode_minus'] = False
@@ -51,6 +53,9 @@ class MacroEconomicResilienceValidator:
             'subsidy_growth': 0.0  # 补贴不随工资增长（实际负增长）
         }
         
+        # 随机情景：通胀、工资增长、投资回报、折现率的相关路径（VAR(1)）
+        self.scenario_generator = MacroScenarioGenerator.default()
+        
     def validate_inflation_erosion(self):
         """验证6.4.1：通货膨胀侵蚀识别"""
         print("\n" + "="*80)
@@ -160,6 +165,40 @@ class MacroEconomicResilienceValidator:
             'subsidy_growth': subsidy_growth
         }
     
+    def validate_stochastic_scenarios(self, n_paths=1000, seed=42):
+        """验证6.4.3：随机宏观情景下的全人群分布"""
+        print("\n" + "="*80)
+        print("6.4.3 随机宏观情景：实际净收益与财政余额分布")
+        print("="*80)
+        
+        paths = self.scenario_generator.sample(n_paths, 50, seed=seed)
+        engine = PopulationScenarioEngine(self.df['annual_income'], self.df['contribution_rate'])
+        result = engine.run(paths)
+        
+        print(f"\n{n_paths} 条相关宏观路径（通胀/工资增长/投资回报/折现率）× {len(engine)} 个个体:")
+        print(result.summary().round(1).to_string())
+        
+        # 人均实际净收益最低的5%路径
+        worst = result.path_mean <= np.percentile(result.path_mean, 5)
+        print(f"\n人均实际净收益最低的5%路径:")
+        print(f"  人均实际净收益: ¥{result.path_mean[worst].mean():,.0f}（全部路径 ¥{result.path_mean.mean():,.0f}）")
+        print(f"  实际净收益为正比例: {result.positive_share[worst].mean():.1%}")
+        print(f"  财政余额: ¥{result.fiscal_balance[worst].mean()/10000:,.0f}万")
+        
+        at_risk = (result.individual_positive < 0.95).mean()
+        print(f"\n  在超过5%的路径中实际净收益非正的个体: {at_risk:.1%}")
+        
+        print(f"\n结论：AI框架应以分布尾部（而非单一情景）校准补贴与税率参数")
+        
+        return {
+            'n_paths': n_paths,
+            'real_net_benefit_mean_p5': float(np.percentile(result.path_mean, 5)),
+            'real_net_benefit_mean_p50': float(np.percentile(result.path_mean, 50)),
+            'fiscal_balance_p5': float(np.percentile(result.fiscal_balance, 5)),
+            'fiscal_balance_p50': float(np.percentile(result.fiscal_balance, 50)),
+            'result': result
+        }
+    
     def generate_macro_resilience_report(self):
         """生成宏观经济韧性验证报告"""
         print("\n" + "="*80)
@@ -173,27 +212,35 @@ class MacroEconomicResilienceValidator:
         # 验证2：负实际补贴率
         subsidy_result = self.validate_negative_real_subsidy()
         
+        # 验证3：随机宏观情景
+        stochastic_result = self.validate_stochastic_scenarios()
+        
         # 生成对比表
         comparison_data = {
             '偏误类型': [
                 '通货膨胀侵蚀',
-                '负实际补贴率'
+                '负实际补贴率',
+                '宏观联合波动'
             ],
             '静态模型表现': [
                 '无法识别（仅计算名义值）',
-                '无法感知（补贴固定）'
+                '无法感知（补贴固定）',
+                '仅评估单一确定情景'
             ],
             'AI框架识别机制': [
                 '必须持续输入CPI数据',
-                '监测覆盖率下降信号'
+                '监测覆盖率下降信号',
+                '相关宏观路径 × 全人群分布'
             ],
             'AI框架修正机制': [
                 '自动迭代补贴/税率参数对冲通胀',
-                '调整补贴参数恢复正激励'
+                '调整补贴参数恢复正激励',
+                '按分布尾部校准参数'
             ],
             '有效性体现': [
                 '反通胀动态设计',
-                '反失效反馈闭环'
+                '反失效反馈闭环',
+                '尾部风险可量化'
             ]
         }
         
@@ -246,6 +293,7 @@ def main():
     print("\n✓ AI框架成功通过宏观经济韧性验证")
     print("  • 具备识别通胀侵蚀的能力")
     print("  • 具备修正负实际利率的能力")
+    print("  • 具备量化宏观联合波动下分布尾部的能力")
     print("\n下一步：层级3 - 行为风险韧性验证（ABM模拟）")
 
 
@@ -10,15 +10,37 @@ MC-ABM双重模拟框架
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
-# 设置中文字体
-plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
-plt.rcParams['axes.unicode_minus'] = False
+from api.subsidy_calculator import calculate_subsidy_array
+from api.policy_registry import current_parameter_set
+
+try:
+    # 绘图库只用于图表输出；未安装时模拟函数（如 progressive_t3_rate）仍可被其他模块导入
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    # 设置中文字体
+    plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei']
+    plt.rcParams['axes.unicode_minus'] = False
+except ImportError:
+    plt = None
+    sns = None
+
+
+def progressive_t3_rate(accumulated_value):
+    """
+    累进T3税率（双逻辑函数，支持数组输入）
+
+    50万以下为 0；第一段 50万-100万：0-7%；第二段 100万以上：7-14%
+    """
+    a = np.asarray(accumulated_value, dtype=float)
+    upper = a > 1000000
+    x_norm = np.where(upper, np.minimum((a - 1000000) / 1000000, 1.0), (a - 500000) / 500000)
+    rate = np.where(upper, 0.07, 0.0) + 0.07 * (1 / (1 + np.exp(-10 * (x_norm - 0.5))))
+    return np.where(a <= 500000, 0.0, rate)
 
 # ==================== 第一部分：数据准备 ====================
 
@@ -78,11 +100,8 @@ class StandardMCSimulator:
         self.cap_min_ratio = 0.06  # 动态上限最低6%
         self.cap_max_ratio = 0.12  # 动态上限最高12%
         
-        # 补贴参数（双层补贴）
-        self.subsidy_low = 0.45    # 低收入补贴45%
-        self.subsidy_mid = 0.30    # 中收入补贴30%
-        self.subsidy_high = 0.06   # 高收入补贴6%
-        self.subsidy_threshold = 100000  # 补贴归零阈值¥100,000
+        # 补贴参数（三段式，与 api.subsidy_calculator 共用同一内核）
+        self.subsidy_params = current_parameter_set().subsidy_params
         
         # 缴费类型分布
         self.contribution_types = {
@@ -117,32 +136,13 @@ class StandardMCSimulator:
         return income * ratio
     
     def calculate_subsidy(self, income, contribution):
-        """计算双层补贴"""
-        if income >= self.subsidy_threshold:
-            return 0.0
-        
-        if income <= 60000:
-            subsidy_rate = self.subsidy_low
-        elif income <= 100000:
-            subsidy_rate = self.subsidy_mid
-        else:
-            subsidy_rate = self.subsidy_high
-            
-        return contribution * subsidy_rate
+        """计算三段式精准补贴（支持数组输入）"""
+        subsidy = calculate_subsidy_array(income, contribution, self.subsidy_params)
+        return float(subsidy) if np.ndim(subsidy) == 0 else subsidy
     
     def calculate_progressive_t3(self, accumulated_value):
         """计算累进T3税率（双逻辑函数）"""
-        # 简化版双逻辑函数
-        if accumulated_value <= 500000:
-            return 0.0
-        elif accumulated_value <= 1000000:
-            # 第一段：0-7%
-            x_norm = (accumulated_value - 500000) / 500000
-            return 0.07 * (1 / (1 + np.exp(-10 * (x_norm - 0.5))))
-        else:
-            # 第二段：7-14%
-            x_norm = min((accumulated_value - 1000000) / 1000000, 1.0)
-            return 0.07 + 0.07 * (1 / (1 + np.exp(-10 * (x_norm - 0.5))))
+        return float(progressive_t3_rate(accumulated_value))
     
     def simulate_individual_current_policy(self, income, contribution_rate):
         """模拟个体在现行政策下的结果"""
@@ -407,24 +407,14 @@ class Level1Validator:
     
     def calculate_nominal_subsidy(self, income, contribution_rate):
         """计算名义补贴（未折现）"""
-        subsidy_total = 0
-        for t in range(30):
-            income_t = income * (1.05 ** t)
-            if income_t <= 60000:
-                cap_t = income_t * 0.12
-                rate = 0.45
-            elif income_t <= 100000:
-                cap_t = income_t * 0.09
-                rate = 0.30
-            else:
-                cap_t = income_t * 0.06
-                rate = 0.06
-            
-            contribution_t = min(income_t * contribution_rate, cap_t)
-            subsidy_t = contribution_t * rate if income_t < 100000 else 0
-            subsidy_total += subsidy_t
+        income_t = income * 1.05 ** np.arange(30)
+        cap_t = income_t * np.select(
+            [income_t <= 60000, income_t <= 100000], [0.12, 0.09], default=0.06
+        )
+        contribution_t = np.minimum(income_t * contribution_rate, cap_t)
+        subsidy_t = calculate_subsidy_array(income_t, contribution_t)
         
-        return subsidy_total
+        return float(subsidy_t.sum())
     
     def calculate_gini(self, values):
         """计算基尼系数"""
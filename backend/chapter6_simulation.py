@@ -12,6 +12,11 @@ from matplotlib import rcParams
 import seaborn as sns
 from scipy import stats
 
+from api.subsidy_calculator import calculate_subsidy_array
+from api.policy_registry import current_parameter_set
+from api.policy_utils import t3_kernel
+from api.fixed_point_solver import solve_fixed_point
+
 # 设置中文字体
 rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'Arial Unicode MS']
 rcParams['axes.unicode_minus'] = False
@@ -111,16 +116,19 @@ K2 = 0.00001  # 收入灵敏度
 
 print(f"  T3范围: {L1*100:.1f}%-{(L2+L3)*100:.1f}% (双逻辑函数)")
 
-# 补贴参数（两段式）
-SUBSIDY_BASE = 150        # 固定补贴150元
-SUBSIDY_RATIO_LOW = 0.45  # 低收入档45%配比
-SUBSIDY_RATIO_MID = 0.30  # 中收入档30%配比
-SUBSIDY_RATIO_HIGH = 0.06 # 超额档6%配比
-SUBSIDY_INCOME_LOW = 40000   # 低收入界定4万
-SUBSIDY_INCOME_HIGH = 100000  # 补贴归零10万
+# 补贴参数（三段式，取自政策参数注册表的当前参数集，与 api.subsidy_calculator 共用同一内核）
+POLICY_PARAMETER_SET = current_parameter_set()
+SUBSIDY_PARAMS = POLICY_PARAMETER_SET.subsidy_params
+SUBSIDY_BASE = SUBSIDY_PARAMS.base_grant            # 固定补贴150元
+SUBSIDY_RATIO_LOW = SUBSIDY_PARAMS.alpha_1          # 第一段45%配比
+SUBSIDY_RATIO_MID = SUBSIDY_PARAMS.alpha_2          # 第二段30%配比
+SUBSIDY_RATIO_HIGH = SUBSIDY_PARAMS.alpha_3         # 超额段6%配比
+SUBSIDY_INCOME_LOW = SUBSIDY_PARAMS.taper_w_low     # 递减起点4万
+SUBSIDY_INCOME_HIGH = SUBSIDY_PARAMS.taper_w_high   # 补贴归零10万
+print(f"  政策参数版本: {POLICY_PARAMETER_SET.tag}")
 
-print(f"  补贴配比: 低收入45% → 中收入30% → 超额6%")
-print(f"  补贴归零: 年薪≥¥{SUBSIDY_INCOME_HIGH:,}")
+print(f"  补贴配比: 第一段{SUBSIDY_RATIO_LOW:.0%} → 第二段{SUBSIDY_RATIO_MID:.0%} → 超额{SUBSIDY_RATIO_HIGH:.0%}")
+print(f"  补贴归零: 年薪≥¥{SUBSIDY_INCOME_HIGH:,.0f}")
 
 # ==================== 第二部分：生成虚拟人群 ====================
 print(f"\n{'='*80}")
@@ -225,21 +233,13 @@ def calculate_t2_蓝浩歌(income, contribution, years=30, r=R_INVEST, g=G_WAGE_
 
 def calculate_t3_dual_logistic(t2, income):
     """
-    计算T3双逻辑函数税率
-    """
-    # 第一部分：基于T2的逻辑函数
-    f1 = L2 / (1 + np.exp(-K1 * (t2 - T2_MID)))
-    
-    # 第二部分：基于收入的逻辑函数
-    f2 = L3 / (1 + np.exp(-K2 * (income - W_HIGH)))
+    计算T3双逻辑函数税率（经 policy_utils 的 T3 数组内核，使用本章参数）
     
-    # 合计
-    t3 = L1 + f1 + f2
-    
-    # 限制在[0, 14%]
-    t3 = np.clip(t3, 0.0, 0.14)
-    
-    return t3
+    本章收入项为 L3/(1+exp(-K2×(w - W_HIGH)))，即内核中 k2 = K2×W_HIGH；
+    结果限制在 [0, 14%]，不施加 t3 ≤ t2 约束。
+    """
+    params = {'L1': L1, 'L2': L2, 'L3': L3, 'T2_mid': T2_MID, 'k1': K1, 'w_high': W_HIGH, 'k2': K2 * W_HIGH}
+    return t3_kernel(t2, income, params=params, cap_at_t2=False).rate / 100.0
 
 def calculate_cap_optimized(income, t2):
     """
@@ -267,48 +267,12 @@ def calculate_cap_optimized(income, t2):
 
 def calculate_subsidy_optimized(income, contribution):
     """
-    计算优化方案的精准补贴（两段式）
+    计算优化方案的精准补贴（三段式，支持数组输入）
+
+    直接调用 api.subsidy_calculator 的向量化内核，保证人群模拟与API口径一致。
     """
-    # 判断是否触发补贴（收入<10万）
-    if income >= SUBSIDY_INCOME_HIGH:
-        return 0.0
-    
-    # 首档上限（2%工资）
-    c0 = income * 0.02
-    
-    # 分段计算
-    if contribution <= c0:
-        # 第一段
-        if income < SUBSIDY_INCOME_LOW:
-            # 低收入45%
-            subsidy_match = contribution * SUBSIDY_RATIO_LOW
-        else:
-            # 中收入30%
-            subsidy_match = contribution * SUBSIDY_RATIO_MID
-    else:
-        # 第二段：首档 + 超额
-        if income < SUBSIDY_INCOME_LOW:
-            tier1 = c0 * SUBSIDY_RATIO_LOW
-        else:
-            tier1 = c0 * SUBSIDY_RATIO_MID
-        
-        tier2 = (contribution - c0) * SUBSIDY_RATIO_HIGH
-        subsidy_match = tier1 + tier2
-    
-    # 加上固定补贴
-    subsidy_total = SUBSIDY_BASE + subsidy_match
-    
-    # 收入递减因子
-    if income <= SUBSIDY_INCOME_LOW:
-        taper = 1.0
-    elif income < SUBSIDY_INCOME_HIGH:
-        taper = (SUBSIDY_INCOME_HIGH - income) / (SUBSIDY_INCOME_HIGH - SUBSIDY_INCOME_LOW)
-    else:
-        taper = 0.0
-    
-    subsidy_final = subsidy_total * taper
-    
-    return subsidy_final
+    subsidy = calculate_subsidy_array(income, contribution, SUBSIDY_PARAMS)
+    return float(subsidy) if np.ndim(subsidy) == 0 else subsidy
 
 # ==================== 第四部分：现行政策模拟 ====================
 print(f"\n{'='*80}")
@@ -394,19 +358,17 @@ for i in range(N_SAMPLE):
     income = incomes[i]
     contrib_rate = contrib_rates[i]
     
-    # 计算个性化上限
-    t2_estimate = calculate_t2_蓝浩歌(income, income * contrib_rate, years=CONTRIBUTE_YEARS)
-    cap_individual = calculate_cap_optimized(income, t2_estimate)
-    
-    # 缴费额（受个性化上限约束）
-    contribution_desired = income * contrib_rate
-    contribution_actual = min(contribution_desired, cap_individual)
-    
-    # 重新计算T2
-    t2 = calculate_t2_蓝浩歌(income, contribution_actual, years=CONTRIBUTE_YEARS)
-    
-    # T3双逻辑函数
-    t3 = calculate_t3_dual_logistic(t2, income)
+    # 缴费额（受个性化上限约束）、T2、上限、T3双逻辑函数自洽求解
+    consistent = solve_fixed_point(
+        income, income * contrib_rate,
+        t2_fn=lambda w, c: calculate_t2_蓝浩歌(w, c, years=CONTRIBUTE_YEARS),
+        cap_fn=calculate_cap_optimized,
+        t3_fn=lambda t2, w, age: calculate_t3_dual_logistic(t2, w)
+    )
+    contribution_actual = float(consistent.contribution)
+    cap_individual = float(consistent.cap)
+    t2 = float(consistent.t2)
+    t3 = float(consistent.t3)
     
     # 精准补贴
     subsidy = calculate_subsidy_optimized(income, contribution_actual)
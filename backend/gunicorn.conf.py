@@ -0,0 +1,24 @@
+"""
+gunicorn 配置（gunicorn -w 4 -b 0.0.0.0:8000 main:app 时自动加载）
+
+- 把 worker 数导出为 WEB_CONCURRENCY，各 worker 的计算进程池按此均分 CPU 核数（api/compute_pool.py）
+- worker 加载应用后立即预热计算进程池，首个请求不承担进程启动开销
+- 启用政策参数共享状态文件（POLICY_STATE_FILE），使切换/重载传播到全部 worker；
+  主进程启动时清除上次部署留下的状态，新部署总是从 default（或 $POLICY_VERSION）开始
+"""
+
+import os
+
+DEFAULT_POLICY_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'policy_state.json')
+
+
+def on_starting(server):
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+    state_file = os.environ.setdefault('POLICY_STATE_FILE', DEFAULT_POLICY_STATE_FILE)
+    if os.path.exists(state_file):
+        os.remove(state_file)
+
+
+def post_worker_init(worker):
+    from main import COMPUTE_POOL
+    COMPUTE_POOL.start()
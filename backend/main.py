@@ -1,38 +1,256 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response, stream_with_context, make_response
+from functools import wraps
+import json
 from flask_cors import CORS
 import os
+import hmac
+import time
 from dotenv import load_dotenv
 
 # 导入计算模块
-from api.wage_growth_prediction import predict_wage_growth
 from api.t2_calculator import calculate_t2
-from api.policy_utils import calculate_t3
+from api.policy_utils import calculate_t3, calculate_t3_batch
 from api.cap_calculator import calculate_contribution_cap
-from api.contribution_optimizer import optimize_contribution
 from api.npv_calculator import calculate_npv
+from api.return_process import parse_return_process
+from api.npv_curve import calculate_npv_curve
 from api.history_diagnosis import diagnose_history
 from api.ai_diagnosis import generate_ai_suggestions
-from api.contribution_suggestions import generate_5tier_suggestions
+from api.contribution_suggestions import generate_5tier_suggestions, parse_tier_fractions
 from api.lifecycle_visualization import generate_lifecycle_data, generate_comparison_scenarios
 from api.risk_monitoring import assess_t3_risk, calculate_optimal_cap
 from api.fiscal_neutral_npv import calculate_government_cash_flow, optimize_fiscal_neutral_contribution
 from api.subsidy_calculator import calculate_subsidy, get_subsidy_explanation, get_subsidy_tier_info
 from api.accumulated_t2_calculator import calculate_accumulated_t2
+from api.policy_whatif import run_policy_whatif, count_evaluations, MAX_EVALUATIONS
+from api.path_reports import (
+    wage_growth_report, optimization_report,
+    iter_path_a_report, build_path_a_report, iter_path_b_report, build_path_b_report
+)
+from api.policy_registry import get_registry, set_current_parameter_set, reset_current_parameter_set
+from api.profiling import (
+    RequestProfiler, profiling_authorized, write_profile_artifacts,
+    PROFILE_HEADER, PROFILE_INLINE_HEADER
+)
+from api.response_cache import cache_key, create_response_cache
+from api.fast_json import FastJSONProvider, compress_response, negotiated_format
+from api.compute_pool import create_compute_pool, ComputePoolSaturated
+from api.policy_registry import current_parameter_set
+from api.metrics import (
+    observe_request, stage_timer, render_metrics, REQUESTS_IN_FLIGHT, RESPONSE_CACHE_EVENTS,
+    CONTENT_TYPE as METRICS_CONTENT_TYPE
+)
 
 # 加载环境变量
 load_dotenv()
 
 # 创建Flask应用
 app = Flask(__name__)
+app.json = FastJSONProvider(app)  # orjson + NumPy 数组直出，可协商 MessagePack
 CORS(app)  # 允许跨域请求
 
 # 配置
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-aippof-2024')
 app.config['DEBUG'] = os.getenv('FLASK_DEBUG', 'True') == 'True'
 
+# 政策参数版本：请求头可指定参数集，响应头回写实际使用的版本
+POLICY_VERSION_HEADER = 'X-Policy-Version'
+
+
+# ==================== 请求钩子 ====================
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """按路由模板记录延迟、请求/响应大小与错误数（/metrics 自身除外）"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        REQUESTS_IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        if route != '/metrics':
+            observe_request(
+                route=route,
+                method=request.method,
+                status=response.status_code,
+                duration=time.perf_counter() - start,
+                request_bytes=request.content_length or 0,
+                response_bytes=None if response.is_streamed else response.content_length
+            )
+    return response
+
+
+@app.after_request
+def compress_large_response(response):
+    """按 Accept-Encoding 压缩较大的 JSON/MessagePack 响应（在剖析与版本标记之后执行）"""
+    return compress_response(response)
+
+
+@app.before_request
+def select_policy_version():
+    """为本次请求固定政策参数集（避免请求中途热切换导致版本混用）"""
+    requested = request.headers.get(POLICY_VERSION_HEADER)
+    registry = get_registry()
+    registry.sync()
+    try:
+        param_set = registry.resolve(requested) if requested else registry.active()
+    except KeyError as e:
+        return jsonify({'error': str(e.args[0])}), 400
+    g.policy_parameter_set = param_set
+    g.policy_token = set_current_parameter_set(param_set)
+
+
+@app.after_request
+def tag_policy_version(response):
+    param_set = g.get('policy_parameter_set')
+    if param_set is not None:
+        response.headers[POLICY_VERSION_HEADER] = param_set.tag
+    return response
+
+
+@app.teardown_request
+def release_policy_version(exc):
+    token = g.pop('policy_token', None)
+    if token is not None:
+        reset_current_parameter_set(token)
+
+
+@app.before_request
+def start_request_profiler():
+    """携带正确的 PROFILE_SECRET 时，对本次请求做确定性剖析（最后注册，只覆盖视图函数）"""
+    provided = request.headers.get(PROFILE_HEADER)
+    if provided and profiling_authorized(provided):
+        g.profiler = RequestProfiler()
+        g.profiler.start()
+
+
+@app.after_request
+def finish_request_profiler(response):
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    profiler.stop()
+    
+    route = request.url_rule.rule if request.url_rule is not None else request.path
+    artifacts = write_profile_artifacts(profiler, route)
+    response.headers['X-Profile-Id'] = artifacts['id']
+    response.headers['X-Profile-Artifact'] = os.path.basename(artifacts['collapsed'])
+    
+    if request.headers.get(PROFILE_INLINE_HEADER) == '1' and response.is_json:
+        payload = response.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload['_profile'] = {
+                **profiler.summary(),
+                'collapsed': profiler.collapsed_lines()
+            }
+            response.set_data(json.dumps(payload, ensure_ascii=False))
+    return response
+
+
+@app.teardown_request
+def abort_request_profiler(exc):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.stop()
+
+
+def _policy_admin_authorized():
+    """切换/重载参数需携带与 POLICY_ADMIN_TOKEN 一致的 X-Admin-Token；未配置令牌时一律拒绝"""
+    expected = os.getenv('POLICY_ADMIN_TOKEN')
+    if not expected:
+        return False
+    return hmac.compare_digest(request.headers.get('X-Admin-Token', ''), expected)
+
+
+def _policy_switch_unshared(registry):
+    """多 worker 部署且未配置共享状态文件时，切换只会影响单个进程，拒绝执行"""
+    return not registry.shared and int(os.getenv('WEB_CONCURRENCY', '1')) > 1
+
+
+# ==================== 响应缓存 ====================
+
+# 确定性端点按 (路由, 规范化请求体, 政策版本) 缓存，RESPONSE_CACHE=off 关闭
+RESPONSE_CACHE = create_response_cache()
+
+
+def cached_response(cacheable=None):
+    """
+    确定性端点的响应缓存与 ETag 装饰器
+    
+    - ETag 即缓存键，If-None-Match 命中时直接返回 304（压缩后的弱 ETag 同样匹配）
+    - 只缓存 200 JSON 响应；流式请求、MessagePack 请求、剖析请求与 cacheable(data) 为假的请求不走缓存
+    - AI建议（ai-suggestions）与响应体较大的 policy-whatif 不使用本装饰器
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            if (RESPONSE_CACHE is None or data is None or _stream_format() or 'profiler' in g
+                    or negotiated_format() != 'json' or (cacheable is not None and not cacheable(data))):
+                return view(*args, **kwargs)
+            
+            key = cache_key(request.path, data, current_parameter_set().tag)
+            etag = f'"{key}"'
+            headers = {
+                'ETag': etag,
+                'Cache-Control': f'private, max-age={int(RESPONSE_CACHE.ttl)}'
+            }
+            
+            if request.if_none_match.contains_weak(key):
+                RESPONSE_CACHE_EVENTS.inc(route=request.path, result='not_modified')
+                return Response(status=304, headers=headers)
+            
+            cached = RESPONSE_CACHE.get(key)
+            if cached is not None:
+                RESPONSE_CACHE_EVENTS.inc(route=request.path, result='hit')
+                body, content_type = cached
+                return Response(body, status=200, content_type=content_type,
+                                headers={**headers, 'X-Cache': 'HIT'})
+            
+            RESPONSE_CACHE_EVENTS.inc(route=request.path, result='miss')
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                RESPONSE_CACHE.set(key, response.get_data(), response.content_type)
+                response.headers.update(headers)
+                response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+# ==================== 计算进程池 ====================
+
+# CPU 密集端点派发到常驻进程池；排队超过 COMPUTE_QUEUE_LIMIT 时返回 429
+COMPUTE_POOL = create_compute_pool()
+
+
+def _offloaded_json(endpoint, func, *args, **kwargs):
+    """在进程池中计算并返回 JSON 响应，Server-Timing 头分别给出排队与计算耗时"""
+    result, timing = COMPUTE_POOL.run(endpoint, func, *args, **kwargs)
+    response = jsonify(result)
+    response.headers['Server-Timing'] = timing.server_timing()
+    return response
+
+
+def _saturated_response(e: ComputePoolSaturated):
+    response = jsonify({'error': str(e), 'retryAfter': e.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
 
 # ==================== 路由定义 ====================
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus 指标（文本格式）"""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
 @app.route('/')
 def index():
     """API根路径"""
@@ -46,6 +264,7 @@ def index():
             '/api/calculate-t3',
             '/api/optimize-contribution',
             '/api/calculate-npv',
+            '/api/npv-curve',
             '/api/diagnose-history',
             '/api/ai-suggestions',
             '/api/5tier-suggestions',
@@ -54,7 +273,11 @@ def index():
             '/api/risk-assessment',
             '/api/optimal-cap',
             '/api/fiscal-analysis',
-            '/api/fiscal-optimize'
+            '/api/fiscal-optimize',
+            '/api/path-a/report',
+            '/api/path-b/report',
+            '/api/policy-whatif',
+            '/api/policy-versions'
         ]
     })
 
@@ -87,30 +310,14 @@ def api_predict_wage_growth():
             if field not in data:
                 return jsonify({'error': f'缺少必填字段: {field}'}), 400
         
-        # 调用预测函数
-        result = predict_wage_growth(
+        # 调用预测函数（响应字段名已规范化）
+        response = wage_growth_report(
             age=data['age'],
             annual_salary=data['annualSalary'],
             industry=data['industry'],
             job_level=data['jobLevel']
         )
         
-        # 规范化响应字段名
-        response = {
-            'predicted_growth_rate': result['predictedGrowth'],
-            'confidence': result['confidence'],
-            'industry_average': result['industryAverage'],
-            'methodology': result['methodology'],
-            'factors': {
-                'base_growth': result['baseGrowth'],
-                'ai_adjusted_growth': result['aiAdjustedGrowth'],
-                'web_search_growth': result['webSearchGrowth']
-            },
-            'ai_insights': result['aiInsights'],
-            'web_sources': result['webSources'],
-            'details': result['details']
-        }
-        
         return jsonify(response)
     
     except Exception as e:
@@ -118,6 +325,7 @@ def api_predict_wage_growth():
 
 
 @app.route('/api/calculate-t2', methods=['POST'])
+@cached_response()
 def api_calculate_t2():
     """
     T2平均节税率计算API
@@ -152,6 +360,7 @@ def api_calculate_t2():
 
 
 @app.route('/api/calculate-cap', methods=['POST'])
+@cached_response()
 def api_calculate_cap():
     """
     缴费上限计算API
@@ -184,6 +393,7 @@ def api_calculate_cap():
 
 
 @app.route('/api/calculate-t3', methods=['POST'])
+@cached_response()
 def api_calculate_t3():
     """
     T3领取期税率计算API
@@ -192,8 +402,12 @@ def api_calculate_t3():
     {
         "t2": 1.4,
         "annualSalary": 150000,
-        "age": 30
+        "age": 30,
+        "lean": true    // 可选,不回显完整参数(details.params_used)
     }
+    
+    t2 / annualSalary / age 任一为数组时按批量计算（数组按 NumPy 广播规则组合），
+    返回 {"t3": [...], "components": {...: [...]}, "count": n}
     """
     try:
         data = request.get_json()
@@ -203,21 +417,36 @@ def api_calculate_t3():
         for field in required_fields:
             if field not in data:
                 return jsonify({'error': f'缺少必填字段: {field}'}), 400
+        lean = data.get('lean', False)
+        if not isinstance(lean, bool):
+            return jsonify({'error': 'lean 必须为布尔值 true/false'}), 400
+        
+        if any(isinstance(data[field], list) for field in required_fields):
+            result = calculate_t3_batch(
+                t2=data['t2'],
+                annual_salary=data['annualSalary'],
+                age=data['age']
+            )
+            return jsonify(result)
         
         # 调用计算函数
         result = calculate_t3(
             t2=data['t2'],
             annual_salary=data['annualSalary'],
-            age=data['age']
+            age=data['age'],
+            lean=lean
         )
         
         return jsonify(result)
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/optimize-contribution', methods=['POST'])
+@cached_response()
 def api_optimize_contribution():
     """
     推荐缴费额优化API - 返回多方案含T2
@@ -240,51 +469,11 @@ def api_optimize_contribution():
             if field not in data:
                 return jsonify({'error': f'缺少必填字段: {field}'}), 400
         
-        # 1. 计算T2（基于个人属性）
-        t2_result = calculate_t2(
+        optimization_result = optimization_report(
             age=data['age'],
             annual_salary=data['annualSalary'],
             wage_growth_rate=data['wageGrowthRate']
         )
-        t2 = t2_result['t2']
-        
-        # 2. 计算T3（基于个人属性）
-        t3_result = calculate_t3(
-            t2=t2,
-            annual_salary=data['annualSalary'],
-            age=data['age']
-        )
-        # T3计算器返回的是百分比数值（例如0.21表示0.21%）
-        # 需要转换为小数形式（0.0021）以便前端使用
-        t3 = t3_result['t3'] / 100.0
-        
-        # 3. 调用优化函数获取多方案
-        optimization_result = optimize_contribution(
-            age=data['age'],
-            annual_salary=data['annualSalary'],
-            t2=t2,
-            t3=t3,
-            wage_growth_rate=data['wageGrowthRate']
-        )
-        
-        # 4. 为每个方案添加T2和精准补贴计算
-        for scenario in optimization_result['scenarios']:
-            scenario['predictedT2'] = t2
-            
-            # 计算精准补贴
-            subsidy_result = calculate_subsidy(
-                annual_salary=data['annualSalary'],
-                contribution_amount=scenario['contribution']
-            )
-            scenario['subsidy'] = subsidy_result['subsidy']
-            scenario['subsidyRatio'] = subsidy_result['ratio']
-            scenario['subsidyTriggered'] = subsidy_result['triggered']
-            scenario['subsidyBreakdown'] = subsidy_result['breakdown']
-        
-        # 5. 添加全局T2、T3和补贴档位信息到结果中
-        optimization_result['t2'] = t2
-        optimization_result['t3'] = t3
-        optimization_result['subsidyTierInfo'] = get_subsidy_tier_info(data['annualSalary'])
         
         return jsonify(optimization_result)
     
@@ -293,6 +482,7 @@ def api_optimize_contribution():
 
 
 @app.route('/api/calculate-npv', methods=['POST'])
+@cached_response()
 def api_calculate_npv():
     """
     NPV净现值计算API
@@ -304,8 +494,11 @@ def api_calculate_npv():
         "contributionAmount": 9500,
         "t2": 1.4,
         "t3": 1.2,
-        "wageGrowthRate": 3.9
+        "wageGrowthRate": 3.9,
+        "returnProcess": {"model": "lognormal", "mean": 1.75, "volatility": 4.0, "paths": 5000}  // 可选
     }
+    
+    提供 returnProcess 时响应附加 stochastic：账户余额与NPV的 P5/P50/P95
     """
     try:
         data = request.get_json()
@@ -323,16 +516,74 @@ def api_calculate_npv():
             contribution_amount=data['contributionAmount'],
             t2=data['t2'],
             t3=data['t3'],
-            wage_growth_rate=data['wageGrowthRate']
+            wage_growth_rate=data['wageGrowthRate'],
+            return_process=parse_return_process(data.get('returnProcess'))
         )
         
         return jsonify(result)
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/npv-curve', methods=['POST'])
+@cached_response()
+def api_npv_curve():
+    """
+    缴费额 → NPV 连续响应曲线API
+    
+    请求体:
+    {
+        "age": 30,
+        "annualSalary": 150000,
+        "t2": 1.4,
+        "t3": 1.2,
+        "wageGrowthRate": 3.9,      // 可选,默认3.5
+        "cap": 12000,               // 可选,默认混合动态上限
+        "points": 201,              // 可选,等距取点数
+        "subsidyRule": "tiered"     // 可选,tiered / match_taper / linear
+    }
+    
+    返回:
+    {
+        "contributions": [...], "npv": [...], "subsidyPV": [...], "taxSavingPV": [...], "t3TaxPV": [...],
+        "kinks": [{"contribution", "type", "name", "npv"}],
+        "segments": [{"from", "to", "marginalNPV"}],
+        "cap": 12000
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        # 参数验证
+        required_fields = ['age', 'annualSalary', 't2', 't3']
+        for field in required_fields:
+            if field not in data:
+                return jsonify({'error': f'缺少必填字段: {field}'}), 400
+        
+        result = calculate_npv_curve(
+            annual_salary=data['annualSalary'],
+            age=data['age'],
+            t2=data['t2'],
+            t3=data['t3'],
+            wage_growth_rate=data.get('wageGrowthRate', 3.5),
+            cap=data.get('cap'),
+            points=data.get('points', 201),
+            subsidy_rule=data.get('subsidyRule', 'tiered')
+        )
+        
+        return jsonify(result)
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/diagnose-history', methods=['POST'])
+@cached_response()
 def api_diagnose_history():
     """
     历史数据诊断API
@@ -355,10 +606,11 @@ def api_diagnose_history():
             return jsonify({'error': '缺少必填字段: historyData 或 age'}), 400
         
         # 调用诊断函数
-        result = diagnose_history(
-            history_data=data['historyData'],
-            age=data['age']
-        )
+        with stage_timer('diagnose-history', 'diagnosis'):
+            result = diagnose_history(
+                history_data=data['historyData'],
+                age=data['age']
+            )
         
         return jsonify(result)
     
@@ -396,18 +648,20 @@ def api_ai_suggestions():
             diagnosis_result = data['diagnosisResult']
         elif 'historyData' in data:
             # 从历史数据计算诊断结果
-            diagnosis_result = diagnose_history(
-                history_data=data['historyData'],
-                age=data['currentAge']
-            )
+            with stage_timer('ai-suggestions', 'diagnosis'):
+                diagnosis_result = diagnose_history(
+                    history_data=data['historyData'],
+                    age=data['currentAge']
+                )
         else:
             return jsonify({'error': '需要提供 diagnosisResult 或 historyData'}), 400
         
         # 生成AI建议
-        ai_suggestions = generate_ai_suggestions(
-            diagnosis_result=diagnosis_result,
-            current_age=data['currentAge']
-        )
+        with stage_timer('ai-suggestions', 'ai_suggestions'):
+            ai_suggestions = generate_ai_suggestions(
+                diagnosis_result=diagnosis_result,
+                current_age=data['currentAge']
+            )
         
         return jsonify(ai_suggestions)
     
@@ -416,6 +670,7 @@ def api_ai_suggestions():
 
 
 @app.route('/api/5tier-suggestions', methods=['POST'])
+@cached_response()
 def api_5tier_suggestions():
     """
     5档缴费方案建议API
@@ -426,7 +681,8 @@ def api_5tier_suggestions():
         "currentAge": 35,
         "currentContribution": 8000,  // 可选
         "t2Rate": 10.0,  // 可选
-        "wageGrowthRate": 4.0  // 可选,默认3.5
+        "wageGrowthRate": 4.0,  // 可选,默认3.5
+        "fractions": [0, 0.01, ..., 1]  // 可选,上限比例,附加连续响应曲线
     }
     
     返回:
@@ -448,7 +704,8 @@ def api_5tier_suggestions():
         ],
         "recommended": "balanced",
         "comparison": {对比分析},
-        "parameters": {输入参数}
+        "parameters": {输入参数},
+        "curve": {"fractions": [...], "contributions": [...], "totalNpv": [...], ...}  // 仅在提供 fractions 时
     }
     """
     try:
@@ -461,22 +718,27 @@ def api_5tier_suggestions():
         if not current_age or not annual_salary:
             return jsonify({'error': '缺少必填字段: currentAge/age 和 annualSalary/currentSalary'}), 400
         
-        # 生成5档方案
-        result = generate_5tier_suggestions(
+        # 生成5档方案（进程池）
+        return _offloaded_json(
+            '5tier-suggestions', generate_5tier_suggestions,
             current_salary=annual_salary,
             current_age=current_age,
             current_contribution=data.get('currentContribution'),
             t2_rate=data.get('t2Rate'),
-            wage_growth_rate=data.get('wageGrowthRate', 3.5)
+            wage_growth_rate=data.get('wageGrowthRate', 3.5),
+            fractions=parse_tier_fractions(data.get('fractions'))
         )
-        
-        return jsonify(result)
     
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ComputePoolSaturated as e:
+        return _saturated_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/lifecycle-data', methods=['POST'])
+@cached_response()
 def api_lifecycle_data():
     """
     全生命周期数据生成API
@@ -488,18 +750,24 @@ def api_lifecycle_data():
         "contributionAmount": 9500,
         "t2": 1.4,
         "t3": 1.2,
-        "wageGrowthRate": 3.9
+        "wageGrowthRate": 3.9,
+        "returnProcess": {"model": "lognormal", "mean": 1.75, "volatility": 4.0, "paths": 5000}  // 可选
     }
+    
+    提供 returnProcess 时响应附加 stochastic：逐年账户余额与NPV的 P5/P50/P95
     """
     try:
         data = request.get_json()
         result = generate_lifecycle_data(data)
         return jsonify(result)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/comparison-scenarios', methods=['POST'])
+@cached_response()
 def api_comparison_scenarios():
     """
     缴费额对比场景API
@@ -508,13 +776,15 @@ def api_comparison_scenarios():
     """
     try:
         data = request.get_json()
-        result = generate_comparison_scenarios(data)
-        return jsonify(result)
+        return _offloaded_json('comparison-scenarios', generate_comparison_scenarios, data)
+    except ComputePoolSaturated as e:
+        return _saturated_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/risk-assessment', methods=['POST'])
+@cached_response()
 def api_risk_assessment():
     """
     T3风险评估API
@@ -537,15 +807,17 @@ def api_risk_assessment():
 
 
 @app.route('/api/optimal-cap', methods=['POST'])
+@cached_response()
 def api_optimal_cap():
     """
-    最优缴费上限API
+    最优缴费上限API（NPV > 0 且 T3 ≤ maxT3 的最大缴费额）
     
     请求体:
     {
         "annualSalary": 150000,
         "t2": 1.4,
-        "age": 30
+        "age": 30,
+        "maxT3": 3.0  // 可选，默认3%
     }
     """
     try:
@@ -557,6 +829,7 @@ def api_optimal_cap():
 
 
 @app.route('/api/fiscal-analysis', methods=['POST'])
+@cached_response()
 def api_fiscal_analysis():
     """
     财政影响分析API
@@ -572,6 +845,7 @@ def api_fiscal_analysis():
 
 
 @app.route('/api/fiscal-optimize', methods=['POST'])
+@cached_response()
 def api_fiscal_optimize():
     """
     财政中性优化API
@@ -593,6 +867,7 @@ def api_fiscal_optimize():
 
 
 @app.route('/api/calculate-subsidy', methods=['POST'])
+@cached_response()
 def api_calculate_subsidy():
     """
     精准补贴计算API
@@ -651,6 +926,7 @@ def api_calculate_subsidy():
 
 
 @app.route('/api/calculate-accumulated-t2', methods=['POST'])
+@cached_response()
 def api_calculate_accumulated_t2():
     """
     累计T2计算API（已参与者专用）
@@ -697,6 +973,262 @@ def api_calculate_accumulated_t2():
         return jsonify({'error': str(e)}), 500
 
 
+# ==================== 组合报告 ====================
+
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+
+
+def _stream_format():
+    """流式格式：?stream=ndjson|sse 或 Accept 头，未要求流式时返回 None"""
+    requested = request.args.get('stream')
+    if requested in STREAM_CONTENT_TYPES:
+        return requested
+    accept = request.headers.get('Accept', '')
+    for fmt, content_type in STREAM_CONTENT_TYPES.items():
+        if content_type in accept:
+            return fmt
+    return None
+
+
+def _stream_sections(sections, fmt):
+    """把 (section, payload) 迭代器逐个写出；中途出错时以 error 版块结束"""
+    def encode(section, payload):
+        body = app.json.dumps(payload)
+        if fmt == 'sse':
+            return f'event: {section}\ndata: {body}\n\n'
+        return app.json.dumps({'section': section, 'data': payload}) + '\n'
+    
+    def generate():
+        try:
+            for section, payload in sections:
+                yield encode(section, payload)
+        except Exception as e:
+            yield encode('error', {'error': str(e)})
+    
+    return Response(stream_with_context(generate()), content_type=STREAM_CONTENT_TYPES[fmt],
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/path-a/report', methods=['POST'])
+@cached_response(cacheable=lambda data: 'wageGrowthRate' in data)
+def api_path_a_report():
+    """
+    Path A 组合报告API（一次请求返回报告页全部版块）
+    
+    请求体:
+    {
+        "age": 30,
+        "annualSalary": 150000,
+        "industry": "it",              // 与 wageGrowthRate 二选一
+        "jobLevel": "intermediate",
+        "wageGrowthRate": 3.9,         // 可选，提供时跳过工资增长预测
+        "currentContribution": 8000,   // 可选，5档方案使用
+        "contributionAmount": 9500     // 可选，默认使用推荐缴费额
+    }
+    
+    返回: wageGrowth / optimization / fiveTier / lifecycle / comparison / risk / meta
+    流式: ?stream=ndjson 或 ?stream=sse（也可通过 Accept 头），每个版块就绪即发送
+    """
+    try:
+        data = request.get_json()
+        
+        # 参数验证
+        for field in ['age', 'annualSalary']:
+            if field not in data:
+                return jsonify({'error': f'缺少必填字段: {field}'}), 400
+        if 'wageGrowthRate' not in data:
+            for field in ['industry', 'jobLevel']:
+                if field not in data:
+                    return jsonify({'error': f'缺少必填字段: {field}（或提供 wageGrowthRate）'}), 400
+        
+        fmt = _stream_format()
+        if fmt:
+            return _stream_sections(iter_path_a_report(data), fmt)
+        
+        return jsonify(build_path_a_report(data))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/path-b/report', methods=['POST'])
+@cached_response()
+def api_path_b_report():
+    """
+    Path B 组合报告API（历史诊断 + AI建议 + 累计T2 + 5档方案，共享同一计算上下文）
+    
+    请求体:
+    {
+        "historyData": [
+            {"year": 2022, "salary": 120000, "contribution": 8000}
+        ],
+        "age": 35,                    // 或 currentAge
+        "discountRate": 0.0175,       // 可选
+        "wageGrowthRate": 3.5,        // 可选
+        "currentContribution": 8000   // 可选，默认最近一年缴费
+    }
+    
+    返回: diagnosis / aiSuggestions / accumulatedT2 / fiveTier / meta
+    流式: ?stream=ndjson 或 ?stream=sse（也可通过 Accept 头）
+    """
+    try:
+        data = request.get_json()
+        
+        # 参数验证
+        if 'historyData' not in data:
+            return jsonify({'error': '缺少必填字段: historyData'}), 400
+        if not isinstance(data['historyData'], list) or len(data['historyData']) == 0:
+            return jsonify({'error': 'historyData必须是非空数组'}), 400
+        for i, record in enumerate(data['historyData']):
+            if 'year' not in record or 'salary' not in record or 'contribution' not in record:
+                return jsonify({'error': f'第{i+1}条记录缺少必要字段'}), 400
+        
+        age = data.get('age') or data.get('currentAge')
+        if age is None:
+            return jsonify({'error': '缺少必填字段: age'}), 400
+        params = dict(data, age=age)
+        
+        fmt = _stream_format()
+        if fmt:
+            return _stream_sections(iter_path_b_report(params), fmt)
+        
+        return jsonify(build_path_b_report(params))
+    
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/policy-whatif', methods=['POST'])
+def api_policy_whatif():
+    """
+    补贴政策参数情景分析API（参数网格 × 人群批量评估）
+    
+    请求体:
+    {
+        "grid": {
+            "alpha_1": [0.3, 0.45, 0.6],
+            "c_bar_1": {"min": 800, "max": 2400, "num": 5},
+            "taper_w_high": [80000, 100000, 150000]
+        },
+        "samples": 1000,                 // 可选，在grid范围内随机抽样（1 ~ 5000）
+        "population": {"size": 100000},  // 可选，合成对数正态人群
+        "incomes": [...],                // 可选，上传收入分布（优先）
+        "contributions": [...],          // 可选
+        "weights": [...]                 // 可选
+    }
+    
+    返回:
+    {
+        "grid": 参数矩阵,
+        "metrics": 成本/覆盖率/分配指标,
+        "paretoFront": 成本-覆盖率帕累托前沿
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if 'grid' not in data:
+            return jsonify({'error': '缺少必填字段: grid'}), 400
+        
+        # 单次请求的 参数组数 × 人群规模有上限，派发到进程池前检查
+        evaluations = count_evaluations(data)
+        if evaluations > MAX_EVALUATIONS:
+            return jsonify({
+                'error': f'参数组数×人群规模为{evaluations}，超过上限{MAX_EVALUATIONS}，请减少参数组合或人群规模'
+            }), 400
+        
+        return _offloaded_json('policy-whatif', run_policy_whatif, data)
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except ComputePoolSaturated as e:
+        return _saturated_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/policy-versions', methods=['GET'])
+def api_policy_versions():
+    """
+    政策参数集列表API
+    
+    返回:
+    {
+        "active": 当前活动参数集（含各分组参数）,
+        "versions": [{"name", "version", "tag", "source", "active"}]
+    }
+    """
+    try:
+        registry = get_registry()
+        return jsonify({
+            'active': registry.active().to_dict(),
+            'versions': registry.list()
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/policy-versions/activate', methods=['POST'])
+def api_policy_versions_activate():
+    """
+    切换活动参数集API（原子切换，无需重启）
+    
+    需携带与 POLICY_ADMIN_TOKEN 一致的 X-Admin-Token；多进程部署经 POLICY_STATE_FILE 同步到全部 worker
+    
+    请求体:
+    {
+        "version": "calibrated-v002"  // 名称、版本哈希或 name@hash
+    }
+    """
+    try:
+        if not _policy_admin_authorized():
+            return jsonify({'error': '无权限切换政策参数'}), 403
+        
+        registry = get_registry()
+        if _policy_switch_unshared(registry):
+            return jsonify({'error': '多进程部署需配置 POLICY_STATE_FILE 才能切换政策参数'}), 409
+        
+        data = request.get_json()
+        if 'version' not in data:
+            return jsonify({'error': '缺少必填字段: version'}), 400
+        
+        try:
+            param_set = registry.activate(data['version'])
+        except KeyError as e:
+            return jsonify({'error': str(e.args[0])}), 404
+        
+        return jsonify({'success': True, 'active': param_set.tag})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/policy-versions/reload', methods=['POST'])
+def api_policy_versions_reload():
+    """
+    热重载参数文件API（重新读取已修改的文件并注册新增的校准文件）
+    """
+    try:
+        if not _policy_admin_authorized():
+            return jsonify({'error': '无权限重载政策参数'}), 403
+        
+        registry = get_registry()
+        if _policy_switch_unshared(registry):
+            return jsonify({'error': '多进程部署需配置 POLICY_STATE_FILE 才能重载政策参数'}), 409
+        
+        changed = registry.reload()
+        registry.publish()
+        return jsonify({
+            'success': True,
+            'changed': changed,
+            'active': registry.active().tag
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 # ==================== 错误处理 ====================
 
 @app.errorhandler(404)